@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Alert tracker - exponentially decaying per-sensor alert scores in bounded LRU state."""
+
+import math
+from collections import OrderedDict
+
+class AlertTracker:
+    """Decides which sensors to reset from their recent alert rate.
+
+    Each alert adds 1 to the sensor's score, which halves every `half_life`
+    seconds, so only alerts that arrive close together can cross
+    `threshold`. Per-sensor state lives in an LRU ordered by last alert:
+    entries idle for `ttl` seconds are dropped and at most `max_sensors`
+    are kept, so memory stays fixed however many sensor ids appear.
+    Resets are queued, deduplicated, until the owner takes them.
+    """
+
+    def __init__(self, threshold=3.0, half_life=60.0, cooldown=30.0, max_sensors=10000, ttl=None):
+        if max_sensors < 1:
+            raise ValueError("max_sensors must be at least 1")
+        self.threshold = threshold
+        self.decay = math.log(2) / half_life
+        self.cooldown = cooldown
+        self.max_sensors = max_sensors
+        self.ttl = max(10 * half_life, cooldown) if ttl is None else ttl
+        self.state = OrderedDict()  # {sensor_id: [score, last_alert, last_reset]}, oldest alert first
+        self.pending = {}  # Sensor ids awaiting reset, in request order
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.state)
+
+    def alert(self, sensor_id, now):
+        """Account one alert; returns the sensor's score after it."""
+        entry = self.state.get(sensor_id)
+        if entry is None:
+            entry = self.state[sensor_id] = [0.0, now, -math.inf]
+            self._evict(now)
+        else:
+            self.state.move_to_end(sensor_id)
+        score = entry[0] * math.exp(-self.decay * (now - entry[1])) + 1.0
+        entry[0], entry[1] = score, now
+        if score >= self.threshold and now - entry[2] > self.cooldown:
+            entry[0], entry[2] = 0.0, now
+            self.pending[sensor_id] = None
+        return score
+
+    def _evict(self, now):
+        state = self.state
+        while len(state) > self.max_sensors:
+            state.popitem(last=False)
+            self.evicted += 1
+        # Expire at most two idle entries per new sensor: O(1) and still faster than ids arrive
+        for _ in range(2):
+            if not state:
+                break
+            sensor_id, entry = next(iter(state.items()))
+            if now - entry[1] <= self.ttl:
+                break
+            del state[sensor_id]
+            self.evicted += 1
+
+    def take_resets(self):
+        resets = list(self.pending)
+        self.pending.clear()
+        return resets
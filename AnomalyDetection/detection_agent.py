@@ -1,86 +1,188 @@
 #!/usr/bin/env python3
 """Detection agent - monitors readings and detects anomalies."""
 
+import argparse
 import json
-import math
-import threading
+import os
+import sys
 import time
 from collections import defaultdict
 
 import paho.mqtt.client as mqtt
 
-BROKER, PORT = "localhost", 1883
+from scoring import DETECTORS, ScoringEngine
+from window_stats import WindowedStats
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import codec, metrics, pipeline
+from common.metrics import Metrics
+from common.pipeline import Pipeline
+from common.presence import PresenceRegistry
+
+BROKER, PORT = os.environ.get("MQTT_BROKER", "localhost"), int(os.environ.get("MQTT_PORT", 1883))
 WINDOW = 30.0  # Analysis window in seconds
 STD_THRESHOLD = 2.0  # Standard deviations for anomaly
 
+def check_anomaly(stats, group, sensor_id, value, topic, now):
+    """Add a reading to its peer group's WindowedStats; returns the alert dict if its z-score is anomalous."""
+    # Only the sensor's peer group is touched: O(1) amortized per message
+    stats.add(now, sensor_id, value)
+    stats.evict(now)
+    
+    if len(stats) < 5:
+        return None  # Not enough data
+    
+    mean = stats.mean
+    std = stats.std() or 0.001
+    
+    # Check if current value is anomalous
+    z_score = abs(value - mean) / std
+    
+    if z_score > STD_THRESHOLD:
+        return {
+            "sensor_id": sensor_id,
+            "topic": topic,
+            "group": f"/{group[0]}/{group[1]}",
+            "value": value,
+            "mean": round(mean, 2),
+            "std": round(std, 2),
+            "z_score": round(z_score, 2),
+            "ts": now
+        }
+    return None
+
+def publish_alert(target, alert):
+    """Log a z-score alert and publish it on /alerts through a paho client or runtime agent."""
+    print(f"[DETECTOR] ⚠️ ANOMALY: {alert['sensor_id']} value={alert['value']:.2f} (z={alert['z_score']:.2f})")
+    target.publish("/alerts", json.dumps(alert))
+
 class DetectionAgent:
-    def __init__(self):
-        self.readings = defaultdict(list)  # {sensor_id: [(ts, value)]}
-        self.lock = threading.Lock()
+    def __init__(self, engine=None, tick=1.0, pipeline=None):
+        self.groups = defaultdict(lambda: WindowedStats(WINDOW))  # {(zone, type): stats}
+        self.engine = engine  # ScoringEngine scored once per tick, or None to score each message
+        self.tick = tick
+        self.presence = PresenceRegistry()
+        self.metrics = Metrics("detector")
+        self.lock = self.metrics.lock()
+        # The paho callback only enqueues; workers decode, score and publish alerts
+        self.pipeline = Pipeline(self._process, self._emit, name="detector", **(pipeline or {}))
+        self.metrics.add_source("pipeline", self.pipeline.stats)
         
-        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv5)
         self.client.on_connect = self._on_connect
         self.client.on_message = self._on_message
+        self.metrics.instrument(self.client)
     
     def _on_connect(self, client, userdata, flags, rc, props):
-        client.subscribe("/+/+/+")  # All sensor readings
+        client.subscribe("/+/+/+")  # All sensor readings, including /batch/{zone}/{type}
+        self.presence.subscribe(client)
         print("[DETECTOR] Monitoring all sensors...")
     
     def _on_message(self, client, userdata, msg):
+        self.pipeline.submit(msg)
+    
+    def _process(self, msg):
+        """Pipeline worker: apply one message; returns the alerts to emit, if any."""
+        with self.lock:
+            change = self.presence.handle(msg.topic, msg.payload)
+            if change is not None:
+                self._on_presence(*change)
+                return None
+        
         parts = msg.topic.split("/")
         if len(parts) < 4:
-            return
-        
-        sensor_id = parts[3]  # /{zone}/{type}/{sensor_id}
+            return None
         
         try:
-            data = json.loads(msg.payload.decode())
-            value = data["value"]
+            data = codec.decode(msg)
             
+            if parts[1] == "batch":  # /batch/{zone}/{type}
+                group = (parts[2], parts[3])
+                with self.lock:
+                    if self.engine:
+                        self.engine.add_many(group, data["ids"], data["values"])
+                        return None
+                    alerts = [self._check_anomaly(group, sensor_id, value, f"/{group[0]}/{group[1]}/{sensor_id}")
+                              for sensor_id, value in zip(data["ids"], data["values"])]
+                return [a for a in alerts if a]
+            
+            group = (parts[1], parts[2])  # /{zone}/{type}/{sensor_id}
             with self.lock:
-                self.readings[sensor_id].append((time.time(), value))
-                self._check_anomaly(sensor_id, value, msg.topic)
-        except (json.JSONDecodeError, KeyError):
-            pass
+                if self.engine:
+                    self.engine.add(group, parts[3], data["value"])
+                    return None
+                alert = self._check_anomaly(group, parts[3], data["value"], msg.topic)
+            return [alert] if alert else None
+        except (ValueError, KeyError):
+            return None
+    
+    def _emit(self, alerts):
+        # Outside the lock: publishing never delays other workers' state updates
+        for alert in alerts:
+            publish_alert(self.client, alert)
+    
+    def _on_presence(self, joined, left):
+        # Drop departed sensors' readings so they stop skewing their peer group
+        for zone, mtype, sensor_id in left:
+            group = (zone, mtype)
+            if group in self.groups:
+                self.groups[group].discard(sensor_id)
+            if self.engine:
+                self.engine.remove(group, sensor_id)
+        if left:
+            print(f"[DETECTOR] {len(left)} sensor(s) left, {len(self.presence)} live")
     
-    def _check_anomaly(self, sensor_id, value, topic):
+    def _check_anomaly(self, group, sensor_id, value, topic):
+        """Add a reading to its peer group; returns an alert if it is anomalous. Call with the lock held."""
+        return check_anomaly(self.groups[group], group, sensor_id, value, topic, time.time())
+    
+    def score_tick(self):
+        with self.lock:
+            anomalies = self.engine.score()
         now = time.time()
-        
-        # Gather all readings within window
-        all_values = []
-        for sid, readings in self.readings.items():
-            # Clean old readings
-            self.readings[sid] = [(t, v) for t, v in readings if now - t <= WINDOW]
-            all_values.extend([v for t, v in self.readings[sid]])
-        
-        if len(all_values) < 5:
-            return  # Not enough data
-        
-        # Calculate mean and std
-        mean = sum(all_values) / len(all_values)
-        variance = sum((v - mean) ** 2 for v in all_values) / len(all_values)
-        std = math.sqrt(variance) if variance > 0 else 0.001
-        
-        # Check if current value is anomalous
-        z_score = abs(value - mean) / std
-        
-        if z_score > STD_THRESHOLD:
+        for a in anomalies:
+            zone, mtype = a["group"]
             alert = {
-                "sensor_id": sensor_id,
-                "topic": topic,
-                "value": value,
-                "mean": round(mean, 2),
-                "std": round(std, 2),
-                "z_score": round(z_score, 2),
+                "sensor_id": a["sensor_id"],
+                "topic": f"/{zone}/{mtype}/{a['sensor_id']}",
+                "group": f"/{zone}/{mtype}",
+                "value": a["value"],
+                "mean": round(a["center"], 2),
+                "std": round(a["spread"], 2),
+                "z_score": round(a["score"], 2),
+                "detector": self.engine.detector,
                 "ts": now
             }
-            print(f"[DETECTOR] ⚠️ ANOMALY: {sensor_id} value={value:.2f} (z={z_score:.2f})")
+            print(f"[DETECTOR] ⚠️ ANOMALY ({self.engine.detector}): {a['sensor_id']} value={a['value']:.2f} (score={a['score']:.2f})")
             self.client.publish("/alerts", json.dumps(alert))
     
     def run(self):
+        self.pipeline.start()
         self.client.connect(BROKER, PORT, 60)
-        self.client.loop_forever()
+        if self.engine is None:
+            self.client.loop_forever()
+            return
+        self.client.loop_start()
+        try:
+            while True:
+                time.sleep(self.tick)
+                self.score_tick()
+        except KeyboardInterrupt:
+            self.client.disconnect()
 
 if __name__ == "__main__":
-    DetectionAgent().run()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--detector", choices=sorted(DETECTORS),
+                        help="Score with the vectorized engine (requires NumPy); default: per-message z-score")
+    parser.add_argument("--threshold", type=float, help="Alert score threshold (default depends on the detector)")
+    parser.add_argument("--depth", type=int, default=32, help="Readings kept per sensor by the engine")
+    parser.add_argument("--tick", type=float, default=1.0, help="Seconds between engine scoring passes")
+    pipeline.add_arguments(parser)
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    
+    engine = ScoringEngine(args.detector, args.depth, args.threshold) if args.detector else None
+    agent = DetectionAgent(engine, args.tick, pipeline.options_from_args(args))
+    agent.metrics.start_from_args(args)
+    agent.run()
 
@@ -3,27 +3,41 @@
 
 import argparse
 import json
+import os
 import random
+import sys
 import time
 
 import paho.mqtt.client as mqtt
 
-BROKER, PORT = "localhost", 1883
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import metrics, presence, publisher
+from common.metrics import Metrics
+from common.publisher import FlowPublisher
+
+BROKER, PORT = os.environ.get("MQTT_BROKER", "localhost"), int(os.environ.get("MQTT_PORT", 1883))
 
 class FaultySensor:
-    def __init__(self, zone, measure_type, sensor_id, fault_magnitude=50):
+    def __init__(self, zone, measure_type, sensor_id, fault_magnitude=50, flow=None):
         self.topic = f"/{zone}/{measure_type}/{sensor_id}"
         self.sensor_id = sensor_id
         self.fault_magnitude = fault_magnitude
         self.reset_topic = f"/reset/{sensor_id}"
         self.faulty = True
+        self.presence_topic = presence.SENSOR_TOPIC.format(zone, measure_type, sensor_id)
         
         self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
         self.client.on_connect = self._on_connect
         self.client.on_message = self._on_message
+        presence.register(self.client, self.presence_topic)  # Killing it evicts its readings from the detector
+        self.metrics = Metrics(f"sensor-{sensor_id}")
+        self.metrics.instrument(self.client)
+        self.publisher = FlowPublisher(self.client, **(flow or {}))
+        self.metrics.add_source("publisher", self.publisher.stats)  # Queue depth and drops on /metrics
     
     def _on_connect(self, client, userdata, flags, rc, props):
         client.subscribe(self.reset_topic)
+        presence.announce(client, self.presence_topic, {"sensor_id": self.sensor_id, "interval": 2})
         print(f"[FAULTY {self.sensor_id}] Started (will send bad readings)")
     
     def _on_message(self, client, userdata, msg):
@@ -44,11 +58,17 @@ class FaultySensor:
             while True:
                 value = self.generate_reading()
                 payload = json.dumps({"value": round(value, 2), "ts": time.time()})
-                self.client.publish(self.topic, payload)
+                self.publisher.publish(self.topic, payload)
+                self.publisher.flush()
                 status = "FAULTY" if self.faulty else "normal"
-                print(f"[FAULTY {self.sensor_id}] ({status}) Published: {value:.2f}")
+                dropped = f" [{self.publisher.dropped} dropped]" if self.publisher.dropped else ""
+                print(f"[FAULTY {self.sensor_id}] ({status}) Published: {value:.2f}{dropped}")
                 time.sleep(2)
         except KeyboardInterrupt:
+            pass
+        finally:
+            self.publisher.drain()
+            presence.withdraw(self.client, self.presence_topic)
             self.client.disconnect()
 
 if __name__ == "__main__":
@@ -56,7 +76,11 @@ if __name__ == "__main__":
     parser.add_argument("--zone", default="living_room")
     parser.add_argument("--type", default="temperature", dest="measure_type")
     parser.add_argument("--id", default="faulty_1", dest="sensor_id")
+    publisher.add_arguments(parser)
+    metrics.add_arguments(parser)
     args = parser.parse_args()
     
-    FaultySensor(args.zone, args.measure_type, args.sensor_id).run()
+    sensor = FaultySensor(args.zone, args.measure_type, args.sensor_id, flow=publisher.flow_from_args(args))
+    sensor.metrics.start_from_args(args)
+    sensor.run()
 
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Hosted detector - the per-message z-score detector for `common/runtime.py`.
+
+Same subscriptions and /alerts payloads as detection_agent.py without
+--detector, without a client or thread of its own; scoring and alerts come
+from detection_agent.py.
+"""
+
+import os
+import sys
+import time
+from collections import defaultdict
+
+from detection_agent import WINDOW, check_anomaly, publish_alert
+from window_stats import WindowedStats
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import codec
+from common.presence import PresenceRegistry
+from common.runtime import Agent
+
+class Detector(Agent):
+    def __init__(self, id="detector", zone="+", measure_type="+"):
+        super().__init__(id)
+        self.zone = zone
+        self.measure_type = measure_type
+        self.groups = defaultdict(lambda: WindowedStats(WINDOW))  # {(zone, type): stats}
+        self.presence = PresenceRegistry()
+
+    def start(self):
+        self.subscribe(f"/{self.zone}/{self.measure_type}/+", self._on_reading)
+        self.subscribe(f"/batch/{self.zone}/{self.measure_type}", self._on_batch)
+        self.subscribe(f"/sensors/{self.zone}/{self.measure_type}/+", self._on_presence, qos=1)
+        self.subscribe("/hosts/+", self._on_presence, qos=1)
+
+    def _on_reading(self, msg):
+        parts = msg.topic.split("/")
+        if parts[1] == "batch":  # Also matches /+/+/+; handled by _on_batch
+            return
+        try:
+            self._check((parts[1], parts[2]), parts[3], codec.decode(msg)["value"], msg.topic)
+        except (ValueError, KeyError):
+            pass
+
+    def _on_batch(self, msg):
+        parts = msg.topic.split("/")
+        try:
+            data = codec.decode(msg)
+            for sensor_id, value in zip(data["ids"], data["values"]):
+                self._check((parts[2], parts[3]), sensor_id, value, f"/{parts[2]}/{parts[3]}/{sensor_id}")
+        except (ValueError, KeyError):
+            pass
+
+    def _on_presence(self, msg):
+        joined, left = self.presence.handle(msg.topic, msg.payload)
+        for zone, mtype, sensor_id in left:
+            if (zone, mtype) in self.groups:
+                self.groups[(zone, mtype)].discard(sensor_id)
+
+    def _check(self, group, sensor_id, value, topic):
+        alert = check_anomaly(self.groups[group], group, sensor_id, value, topic, time.time())
+        if alert:
+            publish_alert(self, alert)
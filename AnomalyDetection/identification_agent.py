@@ -1,24 +1,42 @@
 #!/usr/bin/env python3
 """Identification agent - requests faulty sensors to reset."""
 
+import argparse
 import json
+import math
+import os
+import sys
 import time
-from collections import defaultdict
 
 import paho.mqtt.client as mqtt
 
-BROKER, PORT = "localhost", 1883
-ALERT_THRESHOLD = 3  # Alerts before requesting reset
+from alert_tracker import AlertTracker
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import metrics
+from common.metrics import Metrics
+
+BROKER, PORT = os.environ.get("MQTT_BROKER", "localhost"), int(os.environ.get("MQTT_PORT", 1883))
+HALF_LIFE = 60.0  # Seconds for an alert's weight to halve
+ALERT_COUNT, ALERT_SPAN = 3, 10.0  # Alerts within this many seconds that trigger a reset
+# Lowest score ALERT_COUNT alerts can reach within ALERT_SPAN, each decayed by at most the span
+ALERT_THRESHOLD = ALERT_COUNT * math.exp(-math.log(2) * ALERT_SPAN / HALF_LIFE)
 RESET_COOLDOWN = 30.0  # Seconds between resets
+MAX_SENSORS = 10000  # Sensors tracked at once
+FLUSH_INTERVAL = 0.5  # Seconds between reset batches
+REPORT_INTERVAL = 10.0  # Seconds between alert-rate reports
 
 class IdentificationAgent:
-    def __init__(self):
-        self.alert_counts = defaultdict(int)
-        self.last_reset = defaultdict(float)
+    def __init__(self, max_sensors=MAX_SENSORS):
+        self.tracker = AlertTracker(ALERT_THRESHOLD, HALF_LIFE, RESET_COOLDOWN, max_sensors)
+        self.alerts = 0
+        self.metrics = Metrics("identifier")
+        self.lock = self.metrics.lock()
         
         self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
         self.client.on_connect = self._on_connect
         self.client.on_message = self._on_message
+        self.metrics.instrument(self.client)
     
     def _on_connect(self, client, userdata, flags, rc, props):
         client.subscribe("/alerts")
@@ -26,29 +44,52 @@ class IdentificationAgent:
     
     def _on_message(self, client, userdata, msg):
         try:
-            data = json.loads(msg.payload.decode())
-            sensor_id = data["sensor_id"]
-            
-            self.alert_counts[sensor_id] += 1
-            count = self.alert_counts[sensor_id]
-            
-            print(f"[IDENTIFIER] Alert #{count} for {sensor_id}")
-            
-            # Check if reset needed
-            if count >= ALERT_THRESHOLD:
-                now = time.time()
-                if now - self.last_reset[sensor_id] > RESET_COOLDOWN:
-                    print(f"[IDENTIFIER] 🔄 Requesting reset for {sensor_id}")
-                    self.client.publish(f"/reset/{sensor_id}", json.dumps({"action": "reset"}))
-                    self.last_reset[sensor_id] = now
-                    self.alert_counts[sensor_id] = 0
-        except (json.JSONDecodeError, KeyError):
-            pass
+            sensor_id = json.loads(msg.payload)["sensor_id"]
+        except (ValueError, KeyError, TypeError):
+            return
+        with self.lock:
+            self.tracker.alert(sensor_id, time.time())
+            self.alerts += 1
+    
+    def flush_resets(self):
+        """Publish the resets requested since the last flush, one message per sensor."""
+        with self.lock:
+            resets = self.tracker.take_resets()
+        if not resets:
+            return
+        payload = json.dumps({"action": "reset"})
+        for sensor_id in resets:
+            self.client.publish(f"/reset/{sensor_id}", payload)
+        more = f" (+{len(resets) - 5} more)" if len(resets) > 5 else ""
+        print(f"[IDENTIFIER] 🔄 Requesting reset for {', '.join(resets[:5])}{more}")
     
     def run(self):
         self.client.connect(BROKER, PORT, 60)
-        self.client.loop_forever()
+        self.client.loop_start()
+        
+        last_report = time.time()
+        try:
+            while True:
+                time.sleep(FLUSH_INTERVAL)
+                self.flush_resets()
+                now = time.time()
+                if now - last_report >= REPORT_INTERVAL:
+                    with self.lock:
+                        alerts, self.alerts = self.alerts, 0
+                        tracked = len(self.tracker)
+                    print(f"[IDENTIFIER] {alerts / (now - last_report):.0f} alerts/s, tracking {tracked} sensors")
+                    last_report = now
+        except KeyboardInterrupt:
+            self.client.disconnect()
 
 if __name__ == "__main__":
-    IdentificationAgent().run()
-
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-sensors", type=int, default=MAX_SENSORS, help="Upper bound on tracked sensors")
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    if args.max_sensors < 1:
+        parser.error("--max-sensors must be at least 1")
+    
+    agent = IdentificationAgent(args.max_sensors)
+    agent.metrics.start_from_args(args)
+    agent.run()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""Scoring engine - vectorized anomaly detectors over per-group NumPy ring buffers.
+
+Readings are written into a (sensors x depth) ring buffer per peer group in
+O(1); once per tick every sensor that reported since the last tick is
+scored in one vectorized pass per group. Detectors:
+
+- `zscore`: distance of the latest reading from the group mean, in group standard deviations.
+- `mad`: robust z-score against the group median and median absolute deviation.
+- `ewma`: residual of the latest reading against the sensor's own exponentially
+  weighted history, in units of its weighted standard deviation.
+- `peer`: deviation of the sensor's recent mean from the median of its peers' means.
+"""
+
+try:
+    import numpy as np
+except ImportError:  # Only needed for the scoring engine
+    np = None
+
+THRESHOLDS = {"zscore": 2.0, "mad": 3.5, "ewma": 3.5, "peer": 3.5}
+MIN_SAMPLES = 5  # Readings (per group, or per sensor for ewma) needed before scoring
+MAD_SCALE = 1.4826  # MAD of a normal distribution -> standard deviation
+
+class GroupBuffer:
+    """Last `depth` readings of every sensor in one peer group."""
+
+    def __init__(self, depth, capacity=8):
+        self.depth = depth
+        self.index = {}  # {sensor_id: row}
+        self.ids = []
+        self.values = np.full((capacity, depth), np.nan)
+        self.cursor = np.zeros(capacity, dtype=np.int64)
+        self.fresh = np.zeros(capacity, dtype=bool)
+
+    def row(self, sensor_id):
+        row = self.index.get(sensor_id)
+        if row is None:
+            row = self.index[sensor_id] = len(self.ids)
+            self.ids.append(sensor_id)
+            if row == len(self.values):
+                grow = len(self.values)
+                self.values = np.vstack([self.values, np.full((grow, self.depth), np.nan)])
+                self.cursor = np.concatenate([self.cursor, np.zeros(grow, dtype=np.int64)])
+                self.fresh = np.concatenate([self.fresh, np.zeros(grow, dtype=bool)])
+        return row
+
+    def remove(self, sensor_id):
+        """Forget a sensor, moving the last row into its slot."""
+        row = self.index.pop(sensor_id, None)
+        if row is None:
+            return
+        last = len(self.ids) - 1
+        moved = self.ids.pop()
+        if row != last:
+            self.ids[row] = moved
+            self.index[moved] = row
+            self.values[row] = self.values[last]
+            self.cursor[row] = self.cursor[last]
+            self.fresh[row] = self.fresh[last]
+        self.values[last] = np.nan
+        self.cursor[last] = 0
+        self.fresh[last] = False
+
+    def add(self, sensor_id, value):
+        row = self.row(sensor_id)
+        self.values[row, self.cursor[row]] = value
+        self.cursor[row] = (self.cursor[row] + 1) % self.depth
+        self.fresh[row] = True
+
+    def add_many(self, sensor_ids, values):
+        index = self.index
+        try:
+            rows = np.array([index[s] for s in sensor_ids], dtype=np.int64)
+        except KeyError:  # New sensors in this batch
+            rows = np.array([self.row(s) for s in sensor_ids], dtype=np.int64)
+        self.values[rows, self.cursor[rows]] = values
+        self.cursor[rows] = (self.cursor[rows] + 1) % self.depth
+        self.fresh[rows] = True
+
+    def take_fresh(self):
+        rows = np.flatnonzero(self.fresh[:len(self.ids)])
+        self.fresh[rows] = False
+        return rows
+
+    def latest(self, rows):
+        return self.values[rows, (self.cursor[rows] - 1) % self.depth]
+
+# Each detector maps (buffer, fresh rows) -> (score, center, spread) arrays; NaN scores are skipped
+
+def zscore(buf, rows):
+    values = buf.values[:len(buf.ids)]
+    latest = buf.latest(rows)
+    if np.count_nonzero(~np.isnan(values)) < MIN_SAMPLES:
+        return np.full(len(rows), np.nan), latest, latest
+    center = np.nanmean(values)
+    spread = max(np.nanstd(values), 0.001)
+    return np.abs(latest - center) / spread, np.full(len(rows), center), np.full(len(rows), spread)
+
+def mad(buf, rows):
+    values = buf.values[:len(buf.ids)]
+    latest = buf.latest(rows)
+    if np.count_nonzero(~np.isnan(values)) < MIN_SAMPLES:
+        return np.full(len(rows), np.nan), latest, latest
+    center = np.nanmedian(values)
+    spread = max(MAD_SCALE * np.nanmedian(np.abs(values - center)), 0.001)
+    return np.abs(latest - center) / spread, np.full(len(rows), center), np.full(len(rows), spread)
+
+def ewma(buf, rows, alpha=0.1):
+    values = buf.values[rows]
+    age = (buf.cursor[rows, None] - 1 - np.arange(buf.depth)) % buf.depth  # 0 = latest reading
+    latest = buf.latest(rows)
+    weights = np.concatenate([[0.0], alpha * (1 - alpha) ** np.arange(buf.depth - 1)])[age]
+    missing = np.isnan(values)
+    weights[missing] = 0.0
+    values = np.where(missing, 0.0, values)
+    total = weights.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        center = (weights * values).sum(axis=1) / total
+        variance = (weights * (values - center[:, None]) ** 2).sum(axis=1) / total
+    spread = np.maximum(np.sqrt(variance), 0.001)
+    score = np.abs(latest - center) / spread
+    score[np.count_nonzero(~missing, axis=1) < MIN_SAMPLES] = np.nan
+    return score, center, spread
+
+def peer(buf, rows):
+    with np.errstate(invalid="ignore"):
+        means = np.nanmean(buf.values[:len(buf.ids)], axis=1)  # NaN only for rows with no data
+    known = means[~np.isnan(means)]
+    if len(known) < 3:
+        return np.full(len(rows), np.nan), means[rows], means[rows]
+    center = np.median(known)
+    spread = max(MAD_SCALE * np.median(np.abs(known - center)), 0.001)
+    return np.abs(means[rows] - center) / spread, np.full(len(rows), center), np.full(len(rows), spread)
+
+DETECTORS = {"zscore": zscore, "mad": mad, "ewma": ewma, "peer": peer}
+
+class ScoringEngine:
+    def __init__(self, detector="zscore", depth=32, threshold=None):
+        if np is None:
+            raise RuntimeError("The scoring engine requires NumPy (pip install numpy)")
+        self.detector = detector
+        self.score_fn = DETECTORS[detector]
+        self.depth = depth
+        self.threshold = THRESHOLDS[detector] if threshold is None else threshold
+        self.groups = {}  # {(zone, type): GroupBuffer}
+
+    def buffer(self, group):
+        buf = self.groups.get(group)
+        if buf is None:
+            buf = self.groups[group] = GroupBuffer(self.depth)
+        return buf
+
+    def add(self, group, sensor_id, value):
+        self.buffer(group).add(sensor_id, value)
+
+    def add_many(self, group, sensor_ids, values):
+        self.buffer(group).add_many(sensor_ids, values)
+
+    def remove(self, group, sensor_id):
+        buf = self.groups.get(group)
+        if buf is not None:
+            buf.remove(sensor_id)
+
+    def score(self):
+        """Score every sensor updated since the last call; returns anomalies as dicts."""
+        anomalies = []
+        for group, buf in self.groups.items():
+            rows = buf.take_fresh()
+            if not len(rows):
+                continue
+            score, center, spread = self.score_fn(buf, rows)
+            latest = buf.latest(rows)
+            for i in np.flatnonzero(score > self.threshold):  # NaN compares False
+                anomalies.append({
+                    "group": group,
+                    "sensor_id": buf.ids[rows[i]],
+                    "value": float(latest[i]),
+                    "center": float(center[i]),
+                    "spread": float(spread[i]),
+                    "score": float(score[i]),
+                })
+        return anomalies
@@ -4,11 +4,16 @@
 import argparse
 import json
 import math
+import os
+import sys
 import time
 
 import paho.mqtt.client as mqtt
 
-BROKER, PORT = "localhost", 1883
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import presence
+
+BROKER, PORT = os.environ.get("MQTT_BROKER", "localhost"), int(os.environ.get("MQTT_PORT", 1883))
 
 class SensorAgent:
     def __init__(self, zone, measure_type, sensor_id, interval=2.0):
@@ -17,10 +22,12 @@ class SensorAgent:
         self.sensor_id = sensor_id
         self.start_time = time.time()
         self.running = True
+        self.presence_topic = presence.SENSOR_TOPIC.format(zone, measure_type, sensor_id)
         
         self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
         self.client.on_connect = self._on_connect
         self.client.on_message = self._on_message
+        presence.register(self.client, self.presence_topic)
         
         # Subscribe to reset commands
         self.reset_topic = f"/reset/{sensor_id}"
@@ -28,6 +35,7 @@ class SensorAgent:
     def _on_connect(self, client, userdata, flags, rc, props):
         print(f"[SENSOR {self.sensor_id}] Connected, publishing on {self.topic}")
         client.subscribe(self.reset_topic)
+        presence.announce(client, self.presence_topic, {"sensor_id": self.sensor_id, "interval": self.interval})
     
     def _on_message(self, client, userdata, msg):
         if msg.topic == self.reset_topic:
@@ -53,6 +61,7 @@ class SensorAgent:
         except KeyboardInterrupt:
             pass
         finally:
+            presence.withdraw(self.client, self.presence_topic)
             self.client.disconnect()
 
 if __name__ == "__main__":
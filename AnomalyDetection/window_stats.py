@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Windowed statistics - Welford mean/variance with incremental add and remove."""
+
+import math
+from collections import deque
+
+
+class WindowedStats:
+    """Mean and variance over a time window, updated in O(1) per sample.
+
+    Samples are added and retired with Welford's update and its inverse,
+    so no pass over the window is ever needed to answer a query.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.samples = deque()  # (ts, sensor_id, value)
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def __len__(self):
+        return self.n
+
+    def add(self, ts, sensor_id, value):
+        self.samples.append((ts, sensor_id, value))
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+
+    def _remove(self, value):
+        self.n -= 1
+        if self.n == 0:
+            self.mean = 0.0
+            self.m2 = 0.0
+            return
+        delta = value - self.mean
+        self.mean -= delta / self.n
+        self.m2 = max(self.m2 - delta * (value - self.mean), 0.0)
+
+    def evict(self, now):
+        cutoff = now - self.window
+        samples = self.samples
+        while samples and samples[0][0] < cutoff:
+            self._remove(samples.popleft()[2])
+
+    def discard(self, sensor_id):
+        """Retire every sample of a departed sensor; O(window)."""
+        kept = deque()
+        for sample in self.samples:
+            if sample[1] == sensor_id:
+                self._remove(sample[2])
+            else:
+                kept.append(sample)
+        self.samples = kept
+
+    def variance(self):
+        return self.m2 / self.n if self.n else 0.0
+
+    def std(self):
+        return math.sqrt(self.variance())
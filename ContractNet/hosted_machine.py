@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Hosted machine - the contract net machine for `common/runtime.py`.
+
+Same registration, bids and completions as machine_agent.py, sharing its
+`JobQueue` with the event loop as the scheduler (it has the same `time()`
+and `call_at()`), so jobs complete as loop timers. The runtime's
+single will cannot clear every machine's retained registration: a clean stop
+withdraws it, but one that dies with its runtime stays registered until it
+is hosted again.
+"""
+
+import os
+import sys
+
+from machine_agent import JobQueue
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import codec
+from common.runtime import Agent
+
+class Machine(Agent):
+    def __init__(self, id, capabilities, fmt="json"):
+        super().__init__(id)
+        self.capabilities = capabilities  # {job_type: time_to_complete}
+        self.jobs = None
+        self.codec = codec.get_codec(fmt)
+        self.registration_topic = f"/machines/{id}"
+
+    def start(self):
+        self.jobs = JobQueue(self.capabilities, self.runtime.loop, self._complete)
+        for job_type in self.capabilities:
+            self.subscribe(f"/cfp/{job_type}", self._on_cfp)  # Shared by every hosted machine with the capability
+        self.subscribe(f"/assign/{self.id}", self._on_assignment)
+
+    def on_connect(self):
+        codec.publish(self, self.registration_topic, {
+            "machine_id": self.id,
+            "capabilities": self.capabilities
+        }, self.codec, retain=True)
+
+    def stop(self):
+        self.publish(self.registration_topic, None, retain=True)
+
+    def _on_cfp(self, msg):
+        data = codec.decode(msg)
+        job_type = data["job_type"]
+        if job_type not in self.capabilities:
+            return
+        backlog = self.jobs.backlog()
+        bid = {
+            "cfp_id": data["cfp_id"],
+            "machine_id": self.id,
+            "bid_time": self.capabilities[job_type],
+            "completion": round(backlog + self.capabilities[job_type], 3),
+            "status": "proposal"
+        }
+        codec.publish(self, "/bids", bid, self.codec)
+
+    def _on_assignment(self, msg):
+        # Either one CFP award or a whole batch: {"jobs": [job_type, ...]}
+        data = codec.decode(msg)
+        job_types = data["jobs"] if "jobs" in data else [data["job_type"]]
+        queued = self.jobs.assign(job_types)
+        print(f"[MACHINE {self.id}] 📥 Queued {', '.join(job_types)} ({queued} in queue)")
+
+    def _complete(self, job_type):
+        print(f"[MACHINE {self.id}] ✅ Completed {job_type}")
+        codec.publish(self, "/job_complete", {"machine_id": self.id, "job_type": job_type}, self.codec)
@@ -1,97 +1,165 @@
 #!/usr/bin/env python3
-"""Machine agent - responds to CFPs, executes jobs."""
+"""Machine agent - responds to CFPs, queues and executes jobs."""
 
 import argparse
 import json
+import os
+import sys
 import threading
-import time
+from collections import deque
 
 import paho.mqtt.client as mqtt
 
-BROKER, PORT = "localhost", 1883
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import codec, metrics
+from common.metrics import Metrics
+from common.scheduler import Clock, Scheduler, positive_speed, shared
+
+BROKER, PORT = os.environ.get("MQTT_BROKER", "localhost"), int(os.environ.get("MQTT_PORT", 1883))
+
+class JobQueue:
+    """A machine's assigned jobs, run one at a time as scheduler timers instead of on a thread.
+
+    Each job's completion is scheduled from the previous one's due time, so
+    `busy_until` stays exact however late the scheduler fires. `on_start` and
+    `on_complete` are called with the job type on the scheduler thread.
+    """
+
+    def __init__(self, capabilities, scheduler, on_complete, on_start=None, lock=None):
+        self.capabilities = capabilities  # {job_type: time_to_complete}
+        self.scheduler = scheduler
+        self.on_complete = on_complete
+        self.on_start = on_start
+        self.lock = lock or threading.Lock()
+        self.pending = deque()
+        self.running = None  # Job type in progress
+        self.busy_until = 0  # When the queued backlog is expected to finish
+    
+    def __len__(self):
+        return len(self.pending) + (self.running is not None)
+    
+    def backlog(self):
+        with self.lock:
+            return max(self.busy_until - self.scheduler.time(), 0)
+    
+    def assign(self, job_types):
+        """Queue jobs; returns how many are queued or running."""
+        with self.lock:
+            now = self.scheduler.time()
+            self.busy_until = max(self.busy_until, now) + sum(self.capabilities[j] for j in job_types)
+            self.pending.extend(job_types)
+            if self.running is None:
+                self._start_next(now)
+            return len(self)
+    
+    def _start_next(self, start):
+        # Called with the lock held
+        if not self.pending:
+            self.running = None
+            return
+        self.running = self.pending.popleft()
+        due = start + self.capabilities[self.running]
+        self.scheduler.call_at(due, self._complete, due)
+        if self.on_start:
+            self.on_start(self.running)
+    
+    def _complete(self, due):
+        with self.lock:
+            job_type = self.running
+            self._start_next(due)
+        self.on_complete(job_type)
 
 class MachineAgent:
-    def __init__(self, machine_id, capabilities):
+    def __init__(self, machine_id, capabilities, fmt="json", scheduler=None):
         self.machine_id = machine_id
         self.capabilities = capabilities  # {job_type: time_to_complete}
-        self.busy_until = 0
-        self.lock = threading.Lock()
+        self.codec = codec.get_codec(fmt)
+        self.metrics = Metrics(f"machine-{machine_id}")
+        self.lock = self.metrics.lock()
+        # Completions fire on the process-wide scheduler thread; no thread per job or machine
+        self.jobs = JobQueue(capabilities, scheduler or shared(), self._on_job_complete, self._on_job_start, self.lock)
         
-        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv5)
         self.client.on_connect = self._on_connect
         self.client.on_message = self._on_message
+        self.metrics.instrument(self.client)
+        
+        # Retained registration, cleared by the will if the machine dies
+        self.registration_topic = f"/machines/{machine_id}"
+        self.client.will_set(self.registration_topic, None, retain=True)
     
     def _on_connect(self, client, userdata, flags, rc, props):
-        client.subscribe("/cfp")  # Call for proposals
+        # Calls for proposals, only for the job types this machine can do
+        client.subscribe([(f"/cfp/{job_type}", 0) for job_type in self.capabilities])
         client.subscribe(f"/assign/{self.machine_id}")  # Job assignments
+        codec.publish(client, self.registration_topic, {
+            "machine_id": self.machine_id,
+            "capabilities": self.capabilities
+        }, self.codec, retain=True)
         print(f"[MACHINE {self.machine_id}] Ready. Capabilities: {self.capabilities}")
     
     def _on_message(self, client, userdata, msg):
-        data = json.loads(msg.payload.decode())
+        data = codec.decode(msg)
         
-        if msg.topic == "/cfp":
+        if msg.topic.startswith("/cfp/"):
             self._handle_cfp(data)
         elif msg.topic == f"/assign/{self.machine_id}":
             self._handle_assignment(data)
     
     def _handle_cfp(self, data):
         job_type = data["job_type"]
-        cfp_id = data["cfp_id"]
-        
-        with self.lock:
-            is_busy = time.time() < self.busy_until
+        if job_type not in self.capabilities:
+            return  # CFPs arrive per job type, so only a mismatched payload gets here
         
-        if is_busy:
-            return  # Don't respond if busy
+        # Busy machines still bid: the estimate includes the queued backlog
+        backlog = self.jobs.backlog()
+        bid = {
+            "cfp_id": data["cfp_id"],
+            "machine_id": self.machine_id,
+            "bid_time": self.capabilities[job_type],
+            "completion": round(backlog + self.capabilities[job_type], 3),
+            "status": "proposal"
+        }
+        print(f"[MACHINE {self.machine_id}] Bidding {bid['bid_time']}s for {job_type} (done in {bid['completion']}s)")
         
-        if job_type in self.capabilities:
-            bid = {
-                "cfp_id": cfp_id,
-                "machine_id": self.machine_id,
-                "bid_time": self.capabilities[job_type],
-                "status": "proposal"
-            }
-            print(f"[MACHINE {self.machine_id}] Bidding {bid['bid_time']}s for {job_type}")
-        else:
-            bid = {
-                "cfp_id": cfp_id,
-                "machine_id": self.machine_id,
-                "status": "reject"
-            }
-            print(f"[MACHINE {self.machine_id}] Rejecting {job_type} (not capable)")
-        
-        self.client.publish("/bids", json.dumps(bid))
+        codec.publish(self.client, "/bids", bid, self.codec)
     
     def _handle_assignment(self, data):
-        job_type = data["job_type"]
-        duration = self.capabilities[job_type]
-        
-        with self.lock:
-            self.busy_until = time.time() + duration
-        
-        print(f"[MACHINE {self.machine_id}] 🔧 Executing {job_type} for {duration}s")
-        
-        # Simulate job execution in background
-        def complete_job():
-            time.sleep(duration)
-            print(f"[MACHINE {self.machine_id}] ✅ Completed {job_type}")
-            self.client.publish("/job_complete", json.dumps({
-                "machine_id": self.machine_id,
-                "job_type": job_type
-            }))
-        
-        threading.Thread(target=complete_job, daemon=True).start()
+        # Either one CFP award or a whole batch: {"jobs": [job_type, ...]}
+        job_types = data["jobs"] if "jobs" in data else [data["job_type"]]
+        queued = self.jobs.assign(job_types)
+        print(f"[MACHINE {self.machine_id}] 📥 Queued {', '.join(job_types)} ({queued} in queue)")
+    
+    def _on_job_start(self, job_type):
+        print(f"[MACHINE {self.machine_id}] 🔧 Executing {job_type} for {self.capabilities[job_type]}s")
+    
+    def _on_job_complete(self, job_type):
+        print(f"[MACHINE {self.machine_id}] ✅ Completed {job_type}")
+        codec.publish(self.client, "/job_complete", {
+            "machine_id": self.machine_id,
+            "job_type": job_type
+        }, self.codec)
     
     def run(self):
         self.client.connect(BROKER, PORT, 60)
-        self.client.loop_forever()
+        try:
+            self.client.loop_forever()
+        except KeyboardInterrupt:
+            self.client.publish(self.registration_topic, None, retain=True).wait_for_publish(1)
+            self.client.disconnect()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--id", required=True)
     parser.add_argument("--capabilities", required=True)  # JSON string
+    parser.add_argument("--format", choices=("json", "msgpack"), default="json")
+    parser.add_argument("--speed", type=positive_speed, default=1.0, help="Simulated seconds per wall second for job durations")
+    metrics.add_arguments(parser)
     args = parser.parse_args()
     
     caps = json.loads(args.capabilities)
-    MachineAgent(args.id, caps).run()
+    scheduler = Scheduler(Clock(args.speed)) if args.speed != 1.0 else None
+    agent = MachineAgent(args.id, caps, args.format, scheduler)
+    agent.metrics.start_from_args(args)
+    agent.run()
 
@@ -1,44 +1,74 @@
 #!/usr/bin/env python3
 """Master - spawns machines and supervisor."""
 
+import argparse
 import json
+import os
 import signal
 import subprocess
 import sys
 import time
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.launcher import Launcher
+
 processes = []
+launcher = None  # Launcher when prefork is enabled
 
 def cleanup(sig=None, frame=None):
     for p in processes:
         p.terminate()
+    if launcher:
+        launcher.shutdown()
     sys.exit(0)
 
 signal.signal(signal.SIGINT, cleanup)
+signal.signal(signal.SIGTERM, cleanup)
+
+def launch(name, script, *args):
+    if launcher:
+        launcher.spawn(name, script, args)
+    else:
+        processes.append(subprocess.Popen(["python3", script, *args]))
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--no-prefork", action="store_true", help="Start every agent as a fresh python3 process")
+    parser.add_argument("--pin", action="store_true", help="Pin prefork agents to CPUs round-robin")
+    args = parser.parse_args()
+
+    global launcher
+    if hasattr(os, "fork") and not args.no_prefork:
+        launcher = Launcher(["machine_agent.py", "supervisor.py"], pin=args.pin).start()
+
     machines = [
         ("M1", {"assembly": 5, "welding": 8}),
         ("M2", {"assembly": 6, "painting": 4}),
         ("M3", {"welding": 7, "testing": 3}),
         ("M4", {"painting": 5, "testing": 4, "packaging": 2}),
     ]
-    
+
     # Spawn machines
     for mid, caps in machines:
-        cmd = ["python3", "machine_agent.py", "--id", mid, "--capabilities", json.dumps(caps)]
-        processes.append(subprocess.Popen(cmd))
+        launch(mid, "machine_agent.py", "--id", mid, "--capabilities", json.dumps(caps))
         print(f"[MASTER] Spawned {mid}")
-    
-    time.sleep(2)
-    
+
+    if launcher:
+        report = launcher.wait_ready(30)
+        print(f"[MASTER] {report['ready']} machines connected in {report['elapsed']:.2f}s")
+    else:
+        time.sleep(2)
+
     # Spawn supervisor
-    processes.append(subprocess.Popen(["python3", "supervisor.py"]))
-    
+    launch("supervisor", "supervisor.py")
+
     # Wait for completion
+    if launcher:
+        while launcher.status():
+            time.sleep(1)
+        launcher.shutdown()
     for p in processes:
         p.wait()
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""Batch scheduling - assigns a whole job queue to machines in one pass."""
+
+def lpt_schedule(jobs, machines, free_at=None):
+    """Longest-processing-time-first list scheduling on unrelated machines.
+
+    `machines` maps machine_id -> {job_type: duration}. Jobs are taken in
+    decreasing order of their fastest duration and each goes to the machine
+    that would finish it earliest. Returns (assignment, finish, unassigned)
+    where assignment maps machine_id -> [job_type, ...] in execution order
+    and finish maps machine_id -> time its list completes.
+    """
+    finish = {mid: (free_at or {}).get(mid, 0.0) for mid in machines}
+    assignment = {mid: [] for mid in machines}
+    capable = {}  # {job_type: [(duration, machine_id)]}, fastest first
+    for mid, caps in machines.items():
+        for job_type, duration in caps.items():
+            capable.setdefault(job_type, []).append((duration, mid))
+    for options in capable.values():
+        options.sort()
+
+    unassigned = [job for job in jobs if job not in capable]
+    for job in sorted((j for j in jobs if j in capable), key=lambda j: -capable[j][0][0]):
+        duration, mid = min(capable[job], key=lambda o: finish[o[1]] + o[0])
+        assignment[mid].append(job)
+        finish[mid] += duration
+    return assignment, finish, unassigned
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Contract net simulation - compares award policies by makespan and utilization.
+
+A discrete-event model of the CFP protocol with no broker involved:
+
+- `fastest`: the original protocol. Busy machines stay silent, idle capable
+  machines bid their raw duration and the lowest wins; a job nobody can take
+  is re-announced after the CFP deadline.
+- `earliest`: queue-aware protocol. Every capable machine bids its estimated
+  completion (backlog + duration) and the earliest wins; jobs queue up.
+"""
+
+import argparse
+import heapq
+import random
+
+from supervisor import DEADLINE
+
+# Same fleet as master.py
+MACHINES = [
+    ("M1", {"assembly": 5, "welding": 8}),
+    ("M2", {"assembly": 6, "painting": 4}),
+    ("M3", {"welding": 7, "testing": 3}),
+    ("M4", {"painting": 5, "testing": 4, "packaging": 2}),
+]
+
+def simulate(policy, machines, jobs, arrival, retry=DEADLINE):
+    """Run `jobs` arriving every `arrival` seconds; returns summary statistics."""
+    free_at = {mid: 0.0 for mid, _ in machines}
+    busy = {mid: 0.0 for mid, _ in machines}
+    events = [(i * arrival, i, job) for i, job in enumerate(jobs)]  # (cfp time, seq, job_type)
+    heapq.heapify(events)
+    retries = dropped = 0
+    flow = []  # Arrival-to-completion time per job
+
+    while events:
+        t, seq, job = heapq.heappop(events)
+        capable = [(mid, caps[job]) for mid, caps in machines if job in caps]
+        if not capable:
+            dropped += 1
+            continue
+        if policy == "fastest":
+            idle = [(mid, d) for mid, d in capable if free_at[mid] <= t]
+            if not idle:
+                retries += 1
+                heapq.heappush(events, (t + retry, seq, job))
+                continue
+            mid, duration = min(idle, key=lambda b: b[1])
+        else:
+            mid, duration = min(capable, key=lambda b: max(free_at[b[0]] - t, 0) + b[1])
+        start = max(free_at[mid], t)
+        free_at[mid] = start + duration
+        busy[mid] += duration
+        flow.append(free_at[mid] - seq * arrival)
+
+    makespan = max(free_at.values())
+    return {
+        "makespan": makespan,
+        "utilization": sum(busy.values()) / (len(machines) * makespan) if makespan else 0.0,
+        "mean_flow": sum(flow) / len(flow) if flow else 0.0,
+        "retries": retries,
+        "dropped": dropped,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--arrival", type=float, default=1.0, help="Seconds between job arrivals")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    job_types = sorted({job for _, caps in MACHINES for job in caps})
+    rng = random.Random(args.seed)
+    jobs = [rng.choice(job_types) for _ in range(args.jobs)]
+
+    print(f"{args.jobs} jobs, one every {args.arrival}s, {len(MACHINES)} machines")
+    print(f"{'policy':<10} {'makespan':>10} {'utilization':>12} {'mean flow':>10} {'retries':>8} {'dropped':>8}")
+    for policy in ("fastest", "earliest"):
+        r = simulate(policy, MACHINES, jobs, args.arrival)
+        print(f"{policy:<10} {r['makespan']:>9.1f}s {r['utilization']:>11.1%} {r['mean_flow']:>9.1f}s "
+              f"{r['retries']:>8} {r['dropped']:>8}")
+
+if __name__ == "__main__":
+    main()
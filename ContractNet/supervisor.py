@@ -1,100 +1,247 @@
 #!/usr/bin/env python3
 """Supervisor agent - issues CFPs, assigns jobs."""
 
-import json
+import argparse
+import heapq
+import os
 import random
+import sys
 import threading
 import time
+from collections import defaultdict
 
 import paho.mqtt.client as mqtt
 
-BROKER, PORT = "localhost", 1883
+from scheduling import lpt_schedule
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import codec, metrics
+from common.metrics import Histogram, Metrics
+
+BROKER, PORT = os.environ.get("MQTT_BROKER", "localhost"), int(os.environ.get("MQTT_PORT", 1883))
 DEADLINE = 3.0  # Seconds to wait for bids
+POLICIES = ("earliest", "fastest")  # Earliest estimated completion, or shortest raw duration among idle machines
 
 class SupervisorAgent:
-    def __init__(self, job_queue):
+    def __init__(self, job_queue, fmt="json", max_outstanding=8, policy="earliest"):
         self.job_queue = job_queue
-        self.current_cfp = None
-        self.bids = []
-        self.lock = threading.Lock()
+        self.policy = policy
+        self.committed = {}  # {machine_id: expected end of the work awarded to it}
+        self.max_outstanding = max_outstanding
+        self.rounds = {}  # {cfp_id: {"job_type", "issued", "expected": {machine_id}, "bids": {machine_id: bid}}}
+        self.machines = {}  # {machine_id: capabilities}, from the retained registrations
+        self.capable = defaultdict(set)  # {job_type: {machine_id}}; a round closes early once all have bid
+        self.award_latency = Histogram()  # CFP issued to round closed, ns
+        self.awarded = 0  # Closed rounds that drew a proposal and assigned the job
+        self.deadlines = []  # Heap of (deadline, cfp_id)
+        self.pending = 0  # Rounds issued but not yet awarded
+        self.metrics = Metrics("supervisor")
+        self.lock = self.metrics.lock()
+        self.cond = threading.Condition(self.lock)
         self.cfp_counter = 0
+        self.codec = codec.get_codec(fmt)
         
-        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv5)
         self.client.on_connect = self._on_connect
         self.client.on_message = self._on_message
+        self.metrics.instrument(self.client)
+        self.metrics.add_source("rounds", self.stats)
     
     def _on_connect(self, client, userdata, flags, rc, props):
         client.subscribe("/bids")
         client.subscribe("/job_complete")
+        client.subscribe("/machines/+")  # Retained registrations
         print("[SUPERVISOR] Connected and ready")
     
     def _on_message(self, client, userdata, msg):
-        data = json.loads(msg.payload.decode())
+        if msg.topic.startswith("/machines/"):
+            machine_id = msg.topic.split("/")[2]
+            capabilities = codec.decode(msg)["capabilities"] if msg.payload else None
+            with self.lock:
+                for job_type in self.machines.pop(machine_id, None) or ():
+                    self.capable[job_type].discard(machine_id)
+                if capabilities is not None:
+                    self.machines[machine_id] = capabilities
+                    for job_type in capabilities:
+                        self.capable[job_type].add(machine_id)
+                    return
+                # Registration cleared: the machine left, so open rounds stop waiting for its bid
+                complete = []
+                for cfp_id, rnd in self.rounds.items():
+                    if machine_id in rnd["expected"]:
+                        rnd["expected"].discard(machine_id)
+                        if rnd["expected"] <= rnd["bids"].keys():
+                            complete.append(cfp_id)
+            for cfp_id in complete:
+                self._close_round(cfp_id)
+            return
+        
+        data = codec.decode(msg)
         
         if msg.topic == "/bids":
+            cfp_id = data.get("cfp_id")
             with self.lock:
-                if self.current_cfp and data.get("cfp_id") == self.current_cfp["cfp_id"]:
-                    self.bids.append(data)
+                rnd = self.rounds.get(cfp_id)
+                if rnd is None:
+                    return  # Late bid for a closed round
+                rnd["bids"][data["machine_id"]] = data
+                complete = rnd["expected"] and rnd["expected"] <= rnd["bids"].keys()
+            if complete:
+                self._close_round(cfp_id)
         elif msg.topic == "/job_complete":
             print(f"[SUPERVISOR] Job completed by {data['machine_id']}")
     
     def issue_cfp(self, job_type):
-        self.cfp_counter += 1
-        cfp = {"cfp_id": self.cfp_counter, "job_type": job_type}
+        """Open a CFP round and return its id without waiting for the award."""
+        with self.cond:
+            while self.pending >= self.max_outstanding:
+                self.cond.wait()
+            self.pending += 1
+            self.cfp_counter += 1
+            cfp_id = self.cfp_counter
+            # Only machines registered for the job type receive the CFP; with none known, wait for the deadline
+            expected = set(self.capable[job_type])
+            self.rounds[cfp_id] = {"job_type": job_type, "issued": time.time(), "expected": expected, "bids": {}}
+            heapq.heappush(self.deadlines, (time.time() + DEADLINE, cfp_id))
+            self.cond.notify_all()
         
+        print(f"\n[SUPERVISOR] 📢 CFP #{cfp_id}: {job_type} ({len(expected)} capable)")
+        codec.publish(self.client, f"/cfp/{job_type}", {"cfp_id": cfp_id, "job_type": job_type}, self.codec)
+        return cfp_id
+    
+    def _deadline_loop(self):
+        while True:
+            with self.cond:
+                while not self.deadlines or self.deadlines[0][0] > time.time():
+                    self.cond.wait(self.deadlines[0][0] - time.time() if self.deadlines else None)
+                _, cfp_id = heapq.heappop(self.deadlines)
+            self._close_round(cfp_id)  # No-op if the round already closed early
+    
+    def _close_round(self, cfp_id):
+        # Reached from both the paho thread (last bid) and the deadline thread
         with self.lock:
-            self.current_cfp = cfp
-            self.bids = []
-        
-        print(f"\n[SUPERVISOR] 📢 CFP #{self.cfp_counter}: {job_type}")
-        self.client.publish("/cfp", json.dumps(cfp))
+            rnd = self.rounds.pop(cfp_id, None)
+            if rnd is None:
+                return
+            ns = time.time_ns() - int(rnd["issued"] * 1e9)
+            self.award_latency.counts[ns.bit_length()] += 1
+            self.award_latency.total += ns
+        try:
+            if self._award(cfp_id, rnd):
+                with self.lock:
+                    self.awarded += 1
+        finally:
+            with self.cond:
+                self.pending -= 1
+                self.cond.notify_all()
+    
+    def _award(self, cfp_id, rnd):
+        job_type = rnd["job_type"]
+        proposals = [b for b in rnd["bids"].values() if b.get("status") == "proposal"]
         
-        # Wait for deadline
-        time.sleep(DEADLINE)
+        print(f"[SUPERVISOR] CFP #{cfp_id} closed after {time.time() - rnd['issued']:.2f}s: "
+              f"{len(proposals)} proposals from {len(rnd['expected'])} capable machines")
         
         with self.lock:
-            proposals = [b for b in self.bids if b.get("status") == "proposal"]
-            rejections = [b for b in self.bids if b.get("status") == "reject"]
-        
-        print(f"[SUPERVISOR] Received {len(proposals)} proposals, {len(rejections)} rejections")
-        
-        if proposals:
-            # Select best bid (lowest time)
-            best = min(proposals, key=lambda x: x["bid_time"])
-            print(f"[SUPERVISOR] ✓ Selected {best['machine_id']} (bid: {best['bid_time']}s)")
+            best = self._select(proposals, time.time()) if proposals else None
+        if best is not None:
+            print(f"[SUPERVISOR] ✓ Selected {best['machine_id']} for CFP #{cfp_id} "
+                  f"(bid: {best['bid_time']}s, done in {best.get('completion', best['bid_time'])}s)")
             
-            # Send assignment to winner
-            self.client.publish(f"/assign/{best['machine_id']}", json.dumps({
+            # Send assignment to winner; losers simply are not assigned
+            codec.publish(self.client, f"/assign/{best['machine_id']}", {
                 "job_type": job_type,
-                "cfp_id": self.cfp_counter
-            }))
-            
-            # Notify losers
-            for bid in proposals:
-                if bid["machine_id"] != best["machine_id"]:
-                    self.client.publish(f"/reject/{bid['machine_id']}", json.dumps({
-                        "cfp_id": self.cfp_counter
-                    }))
+                "cfp_id": cfp_id
+            }, self.codec)
             
             return True
         else:
-            print(f"[SUPERVISOR] ✗ No proposals received for {job_type}")
+            print(f"[SUPERVISOR] ✗ No {'idle machine bid' if proposals else 'proposals received'} for {job_type}")
             return False
     
-    def run(self):
+    def _select(self, proposals, now):
+        """Winning bid under the policy, or None if none qualifies. Call with the lock held."""
+        if self.policy == "fastest":
+            # The original protocol only heard from idle machines: skip bids with a backlog,
+            # queued at the machine or awarded here since it bid
+            idle = [b for b in proposals if b.get("completion", b["bid_time"]) <= b["bid_time"]
+                    and self.committed.get(b["machine_id"], 0) <= now]
+            if not idle:
+                return None
+            best = min(idle, key=lambda b: b["bid_time"])
+            self.committed[best["machine_id"]] = now + best["bid_time"]
+            return best
+        
+        def completion(bid):
+            # Concurrent rounds: awards made after the machine bid are not in its estimate yet
+            committed = max(self.committed.get(bid["machine_id"], 0) - now, 0) + bid["bid_time"]
+            return max(bid.get("completion", bid["bid_time"]), committed)
+        
+        best = min(proposals, key=completion)
+        self.committed[best["machine_id"]] = now + completion(best)
+        return best
+    
+    def stats(self):
+        with self.lock:
+            summary = self.award_latency.summary()
+            return {
+                "open": len(self.rounds),
+                "closed": summary["count"],
+                "awarded": self.awarded,
+                "award_mean_us": summary["mean_us"],
+                "award_p50_us": summary["p50_us"],
+                "award_p99_us": summary["p99_us"],
+            }
+    
+    def dispatch_batch(self, jobs):
+        """Assign a whole job list at once from registered capabilities; returns the jobs left for CFPs."""
+        now = time.time()
+        with self.lock:
+            machines = {mid: caps for mid, caps in self.machines.items() if caps}
+            free_at = {mid: max(self.committed.get(mid, 0) - now, 0) for mid in machines}
+            assignment, finish, unassigned = lpt_schedule(jobs, machines, free_at)
+            for mid in machines:
+                self.committed[mid] = now + finish[mid]
+        
+        print(f"\n[SUPERVISOR] 📦 Batch of {len(jobs)} jobs over {len(machines)} machines, "
+              f"estimated makespan {max(finish.values(), default=0):.1f}s")
+        for mid, job_list in assignment.items():
+            if job_list:
+                print(f"[SUPERVISOR] ✓ {mid}: {', '.join(job_list)}")
+                codec.publish(self.client, f"/assign/{mid}", {"jobs": job_list}, self.codec)
+        if unassigned:
+            print(f"[SUPERVISOR] {len(unassigned)} jobs have no registered machine, falling back to CFPs")
+        return unassigned
+    
+    def run(self, batch=False):
         self.client.connect(BROKER, PORT, 60)
         self.client.loop_start()
+        threading.Thread(target=self._deadline_loop, daemon=True).start()
         time.sleep(1)  # Wait for machines
         
-        for job in self.job_queue:
+        jobs = self.dispatch_batch(self.job_queue) if batch else self.job_queue
+        for job in jobs:
             self.issue_cfp(job)
-            time.sleep(1)  # Gap between CFPs
+        
+        with self.cond:
+            while self.pending:
+                self.cond.wait()
         
         print("\n[SUPERVISOR] All jobs dispatched. Waiting for completion...")
         time.sleep(10)
         self.client.disconnect()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--format", choices=("json", "msgpack"), default="json")
+    parser.add_argument("--max-outstanding", type=int, default=8, help="CFP rounds open at the same time")
+    parser.add_argument("--policy", choices=POLICIES, default="earliest")
+    parser.add_argument("--batch", action="store_true", help="Schedule the whole queue at once instead of one CFP per job")
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    
     jobs = ["assembly", "welding", "painting", "testing", "assembly", "welding", "packaging"]
-    SupervisorAgent(jobs).run()
+    agent = SupervisorAgent(jobs, args.format, args.max_outstanding, args.policy)
+    agent.metrics.start_from_args(args)
+    agent.run(args.batch)
 
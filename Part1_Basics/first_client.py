@@ -2,10 +2,11 @@
 """First MQTT client - connects, subscribes, publishes messages."""
 
 import paho.mqtt.client as mqtt
+import os
 import time
 
-BROKER = "localhost"
-PORT = 1883
+BROKER = os.environ.get("MQTT_BROKER", "localhost")
+PORT = int(os.environ.get("MQTT_PORT", 1883))
 TOPIC = "hello"
 
 def on_connect(client, userdata, flags, rc, properties):
@@ -3,9 +3,10 @@
 
 import paho.mqtt.client as mqtt
 import argparse
+import os
 import time
 
-BROKER, PORT, TOPIC = "localhost", 1883, "pingpong"
+BROKER, PORT, TOPIC = os.environ.get("MQTT_BROKER", "localhost"), int(os.environ.get("MQTT_PORT", 1883)), "pingpong"
 
 def create_client(mode):
     respond_to = "pong" if mode == "ping" else "ping"
@@ -2,64 +2,170 @@
 """Averaging agent - computes averages over time window."""
 
 import argparse
-import json
-import threading
+import os
+import sys
 import time
 
 import paho.mqtt.client as mqtt
 
-BROKER, PORT = "localhost", 1883
+from event_window import PaneWindow
+from partials import summarize
+from sliding_window import SlidingWindow
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import codec, metrics, pipeline
+from common.metrics import Metrics
+from common.pipeline import Pipeline
+from common.presence import PresenceRegistry
+
+BROKER, PORT = os.environ.get("MQTT_BROKER", "localhost"), int(os.environ.get("MQTT_PORT", 1883))
+EVENT_TICK = 0.5  # Seconds between watermark checks in event-time mode
+
+def readings(msg, data, batch_topic):
+    """(sensor_id, value) pairs carried by a decoded reading or /batch message."""
+    if msg.topic == batch_topic:
+        return zip(data["ids"], data["values"])
+    return ((msg.topic.rsplit("/", 1)[1], data["value"]),)
+
+class AverageOutput:
+    """Publishes a zone/type window as its /average summary and /partial/zone partial."""
+
+    def __init__(self, zone, measure_type, track_std=False, fmt="json"):
+        self.label = f"{zone}/{measure_type}"
+        self.track_std = track_std
+        self.codec = codec.get_codec(fmt, "average")
+        self.partial_codec = codec.get_codec(fmt, "partial")
+        self.average_topic = f"/average/{zone}/{measure_type}"
+        self.partial_topic = f"/partial/zone/{zone}/{measure_type}"  # Consumed by rollup_agent.py
+
+    def publish(self, target, partial, **window):
+        """Publish a non-empty partial through `target`, a paho client or a runtime agent."""
+        now = time.time()
+        stats = summarize(partial)
+        payload = {k: round(v, 2) for k, v in stats.items() if k != "std" or self.track_std}
+        payload.update(window, ts=now)
+        codec.publish(target, self.average_topic, payload, self.codec)
+        codec.publish(target, self.partial_topic, dict(partial, ts=now, **window), self.partial_codec)
+        span = f" [{window['start']:.0f}, {window['end']:.0f})" if window else ""
+        print(f"[AVG {self.label}] Published average: {stats['average']:.2f} (n={stats['count']}){span}")
 
 class AveragingAgent:
-    def __init__(self, zone, measure_type, window=10.0, pub_interval=5.0):
+    def __init__(self, zone, measure_type, window=10.0, pub_interval=5.0, track_std=False, fmt="json",
+                 group=None, worker_id=None, event_window=None, pipeline=None):
         self.zone = zone
         self.measure_type = measure_type
         self.window = window
         self.pub_interval = pub_interval
+        self.output = AverageOutput(zone, measure_type, track_std, fmt)
         
         self.subscribe_topic = f"/{zone}/{measure_type}/+"
-        self.publish_topic = f"/average/{zone}/{measure_type}"
+        self.batch_topic = f"/batch/{zone}/{measure_type}"
+        self.late_topic = f"/late/{zone}/{measure_type}"
+        
+        # Worker mode: share the input with the rest of the group and leave /average to combiner_agent.py
+        self.group = group
+        self.share_prefix = f"$share/{group}/" if group else ""
+        if group:
+            self.worker_id = worker_id or str(os.getpid())
+            self.worker_topic = f"/partial/worker/{zone}/{measure_type}/{self.worker_id}"
         
-        self.readings = []  # List of (timestamp, value)
-        self.lock = threading.Lock()
+        self.readings = SlidingWindow(window)
+        self.events = event_window  # PaneWindow keyed on payload ts, or None for arrival-time windows
+        self.presence = PresenceRegistry()
+        self.metrics = Metrics(f"avg-{zone}-{measure_type}" + (f"-{self.worker_id}" if group else ""))
+        self.lock = self.metrics.lock()
+        self.pipeline = Pipeline(self._process, name="avg", **(pipeline or {}))  # Decodes off the network thread
+        self.metrics.add_source("pipeline", self.pipeline.stats)
         
-        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv5)
         self.client.on_connect = self._on_connect
         self.client.on_message = self._on_message
+        self.metrics.instrument(self.client)
     
     def _on_connect(self, client, userdata, flags, rc, props):
-        print(f"[AVG {self.zone}/{self.measure_type}] Subscribed to {self.subscribe_topic}")
-        client.subscribe(self.subscribe_topic)
+        print(f"[AVG {self.zone}/{self.measure_type}] Subscribed to {self.share_prefix}{self.subscribe_topic}")
+        client.subscribe(self.share_prefix + self.subscribe_topic)
+        client.subscribe(self.share_prefix + self.batch_topic)
+        self.presence.subscribe(client, self.zone, self.measure_type)  # Not shared: every worker evicts
     
     def _on_message(self, client, userdata, msg):
+        self.pipeline.submit(msg)
+    
+    def _process(self, msg):
+        with self.lock:
+            change = self.presence.handle(msg.topic, msg.payload)
+        if change is not None:
+            self._on_presence(*change)
+            return
         try:
-            data = json.loads(msg.payload.decode())
+            data = codec.decode(msg)
+            now = time.time()
+            pairs = readings(msg, data, self.batch_topic)
             with self.lock:
-                self.readings.append((time.time(), data["value"]))
-        except (json.JSONDecodeError, KeyError):
+                if self.events:
+                    # Panes are pre-aggregated: a departed sensor simply stops contributing
+                    ts = data.get("ts", now)
+                    for _, value in pairs:
+                        self.events.add(ts, value, now)
+                    return
+                for sensor_id, value in pairs:
+                    self.readings.add(now, value, sensor_id)
+        except (ValueError, KeyError):
             pass
     
+    def _on_presence(self, joined, left):
+        for zone, mtype, sensor_id in left:
+            if (zone, mtype) != (self.zone, self.measure_type):
+                continue
+            with self.lock:
+                dropped = self.readings.discard(sensor_id)
+            print(f"[AVG {self.zone}/{self.measure_type}] Sensor {sensor_id} left, dropped {dropped} readings")
+    
+    def compute_stats(self):
+        with self.lock:
+            return self.readings.stats(time.time())
+    
+    def compute_partial(self):
+        with self.lock:
+            return self.readings.partial(time.time())
+    
     def compute_average(self):
-        now = time.time()
+        stats = self.compute_stats()
+        return stats["average"] if stats else None
+    
+    def publish_partial(self, partial, **window):
+        if self.group:
+            # Publish even when empty so the combiner forgets this worker's old window
+            empty = {"sum": 0.0, "count": 0, "m2": 0.0}
+            codec.publish(self.client, self.worker_topic, dict(partial or empty, ts=time.time(), **window),
+                          self.output.partial_codec)
+            return
+        if partial is not None:
+            self.output.publish(self.client, partial, **window)
+    
+    def fire_windows(self):
         with self.lock:
-            # Keep only readings within window
-            self.readings = [(t, v) for t, v in self.readings if now - t <= self.window]
-            if not self.readings:
-                return None
-            return sum(v for _, v in self.readings) / len(self.readings)
+            fired = self.events.advance(time.time())
+            late = {"late_updates": self.events.late_updates, "late_dropped": self.events.late_dropped,
+                    "watermark": self.events.last_watermark}
+        for start, end, partial in fired:
+            self.publish_partial(partial, start=start, end=end)
+        if fired:
+            codec.publish(self.client, self.late_topic, dict(late, ts=time.time()))
     
     def run(self):
+        self.pipeline.start()
         self.client.connect(BROKER, PORT, 60)
         self.client.loop_start()
         
         try:
             while True:
+                if self.events is not None:
+                    time.sleep(EVENT_TICK)
+                    self.fire_windows()
+                    continue
                 time.sleep(self.pub_interval)
-                avg = self.compute_average()
-                if avg is not None:
-                    payload = json.dumps({"average": round(avg, 2), "ts": time.time()})
-                    self.client.publish(self.publish_topic, payload)
-                    print(f"[AVG {self.zone}/{self.measure_type}] Published average: {avg:.2f}")
+                self.publish_partial(self.compute_partial())
         except KeyboardInterrupt:
             self.client.disconnect()
 
@@ -69,8 +175,22 @@ if __name__ == "__main__":
     parser.add_argument("--type", required=True, dest="measure_type")
     parser.add_argument("--window", type=float, default=10.0)
     parser.add_argument("--interval", type=float, default=5.0)
+    parser.add_argument("--stddev", action="store_true", help="Also publish the window standard deviation")
+    parser.add_argument("--format", choices=codec.FORMATS, default="json")
+    parser.add_argument("--group", help="Run as a worker in this $share group; pair with combiner_agent.py")
+    parser.add_argument("--worker-id", help="Worker name in --group mode (default: pid)")
+    parser.add_argument("--event-time", action="store_true", help="Window on the payload ts with watermarks")
+    parser.add_argument("--slide", type=float, help="Event-time hop in seconds (default: --window, tumbling)")
+    parser.add_argument("--delay", type=float, default=1.0, help="Watermark delay behind the newest event ts")
+    parser.add_argument("--lateness", type=float, default=0.0, help="Seconds past the watermark late data is still applied")
+    pipeline.add_arguments(parser)
+    metrics.add_arguments(parser)
     args = parser.parse_args()
     
-    agent = AveragingAgent(args.zone, args.measure_type, args.window, args.interval)
+    events = PaneWindow(args.window, args.slide, args.delay, args.lateness) if args.event_time else None
+    agent = AveragingAgent(args.zone, args.measure_type, args.window, args.interval, args.stddev, args.format,
+                           args.group, args.worker_id, events,
+                           pipeline.options_from_args(args))
+    agent.metrics.start_from_args(args)
     agent.run()
 
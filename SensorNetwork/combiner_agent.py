@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Combiner agent - merges the partials of sharded averaging workers into /average."""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+from partials import merge, summarize
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import codec
+
+BROKER, PORT = os.environ.get("MQTT_BROKER", "localhost"), int(os.environ.get("MQTT_PORT", 1883))
+
+class CombinerAgent:
+    def __init__(self, zone, measure_type, pub_interval=5.0, ttl=15.0, track_std=False, fmt="json"):
+        self.zone = zone
+        self.measure_type = measure_type
+        self.pub_interval = pub_interval
+        self.ttl = ttl
+        self.track_std = track_std
+        self.codec = codec.get_codec(fmt, "average")
+        self.partial_codec = codec.get_codec(fmt, "partial")
+
+        self.subscribe_topic = f"/partial/worker/{zone}/{measure_type}/+"
+        self.publish_topic = f"/average/{zone}/{measure_type}"
+        self.partial_topic = f"/partial/zone/{zone}/{measure_type}"
+        self.workers = {}  # {worker_id: (partial, received_at)}
+        self.lock = threading.Lock()
+
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv5)
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+
+    def _on_connect(self, client, userdata, flags, rc, props):
+        print(f"[COMBINE {self.zone}/{self.measure_type}] Subscribed to {self.subscribe_topic}")
+        client.subscribe(self.subscribe_topic)
+
+    def _on_message(self, client, userdata, msg):
+        try:
+            partial = codec.decode(msg)
+        except ValueError:
+            return
+        worker_id = msg.topic.rsplit("/", 1)[1]
+        with self.lock:
+            self.workers[worker_id] = (partial, time.time())
+
+    def compute_partial(self, now):
+        with self.lock:
+            for worker_id in [w for w, (_, at) in self.workers.items() if now - at > self.ttl]:
+                del self.workers[worker_id]
+            return merge(p for p, _ in self.workers.values()), len(self.workers)
+
+    def run(self):
+        self.client.connect(BROKER, PORT, 60)
+        self.client.loop_start()
+
+        try:
+            while True:
+                time.sleep(self.pub_interval)
+                now = time.time()
+                partial, workers = self.compute_partial(now)
+                if partial is None:
+                    continue
+                stats = summarize(partial)
+                payload = {k: round(v, 2) for k, v in stats.items() if k != "std" or self.track_std}
+                payload["ts"] = now
+                codec.publish(self.client, self.publish_topic, payload, self.codec)
+                codec.publish(self.client, self.partial_topic, dict(partial, ts=now), self.partial_codec)
+                print(f"[COMBINE {self.zone}/{self.measure_type}] Published average: {stats['average']:.2f} "
+                      f"(n={stats['count']}, workers={workers})")
+        except KeyboardInterrupt:
+            self.client.disconnect()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--zone", required=True)
+    parser.add_argument("--type", required=True, dest="measure_type")
+    parser.add_argument("--interval", type=float, default=5.0)
+    parser.add_argument("--ttl", type=float, default=15.0, help="Seconds before a silent worker is dropped")
+    parser.add_argument("--stddev", action="store_true", help="Also publish the window standard deviation")
+    parser.add_argument("--format", choices=codec.FORMATS, default="json")
+    args = parser.parse_args()
+
+    agent = CombinerAgent(args.zone, args.measure_type, args.interval, args.ttl, args.stddev, args.format)
+    agent.run()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Event-time windows - tumbling/hopping windows over payload timestamps with watermarks.
+
+Samples are pre-aggregated into panes of width `slide` (one mergeable
+partial per pane), so firing a window of `size` merges size/slide panes
+whatever the sample rate. The watermark trails the newest event time by
+`delay`; a window [start, end) fires once the watermark reaches `end`.
+When nothing has arrived for `idle` seconds of wall-clock time, the
+watermark also moves on by that gap so the last windows still fire.
+A sample older than the watermark is late: within `lateness` it still
+updates its panes and the windows it belongs to fire again, beyond that
+it is dropped. Both cases are counted.
+"""
+
+import math
+
+from partials import merge
+
+class PaneWindow:
+    def __init__(self, size, slide=None, delay=1.0, lateness=0.0, idle=None):
+        slide = slide or size
+        if size < slide or abs(size / slide - round(size / slide)) > 1e-9:
+            raise ValueError("Window size must be a multiple of the slide")
+        self.size = size
+        self.slide = slide
+        self.n_panes = round(size / slide)
+        self.delay = delay
+        self.lateness = lateness
+        self.idle = size if idle is None else idle  # Seconds without arrivals before the watermark moves on its own
+        self.last_arrival = None  # Wall-clock time of the last add() given `now`
+        self.panes = {}  # {pane index: partial}
+        self.max_ts = -math.inf
+        self.last_watermark = -math.inf  # As of the last advance(), including the idle fallback
+        self.next_pane = None  # Last pane of the next window to fire
+        self.refire = set()  # Last panes of fired windows updated by late samples
+        self.late_updates = 0
+        self.late_dropped = 0
+
+    def watermark(self, now=None):
+        event_time = self.max_ts
+        if now is not None and self.last_arrival is not None and now - self.last_arrival >= self.idle:
+            # Advance from the newest event by the quiet gap, not to `now`: a backlog whose
+            # ts trails wall-clock time must not be made late by it
+            event_time += now - self.last_arrival
+        return event_time - self.delay
+
+    def add(self, ts, value, now=None):
+        if now is not None:
+            self.last_arrival = now
+        pane = math.floor(ts / self.slide)
+        if self.next_pane is not None and pane < self.next_pane:
+            # Every window containing this pane up to next_pane - 1 has fired already;
+            # lateness is judged on event time alone, whatever the idle fallback fired
+            if ts < self.watermark() - self.lateness:
+                self.late_dropped += 1
+                return
+            self.late_updates += 1
+            self.refire.update(range(pane, min(pane + self.n_panes, self.next_pane)))
+        if ts > self.max_ts:
+            self.max_ts = ts
+        p = self.panes.get(pane)
+        if p is None:
+            self.panes[pane] = {"sum": value, "count": 1, "m2": 0.0, "min": value, "max": value}
+            return
+        delta = value - p["sum"] / p["count"]  # Welford update of the pane's M2
+        p["sum"] += value
+        p["count"] += 1
+        p["m2"] += delta * (value - p["sum"] / p["count"])
+        if value < p["min"]:
+            p["min"] = value
+        if value > p["max"]:
+            p["max"] = value
+
+    def _window(self, last):
+        partial = merge(self.panes.get(i) for i in range(last - self.n_panes + 1, last + 1))
+        return (last + 1 - self.n_panes) * self.slide, (last + 1) * self.slide, partial
+
+    def advance(self, now=None):
+        """Fire every window the watermark has passed; returns [(start, end, partial)].
+
+        Re-fired windows (late updates) come first; empty windows are skipped.
+        """
+        if not self.panes:
+            return []
+        watermark = self.last_watermark = max(self.watermark(now), self.last_watermark)
+        if self.next_pane is None:
+            self.next_pane = min(self.panes)
+        fired = [self._window(last) for last in sorted(self.refire)]
+        self.refire.clear()
+        last_full = math.floor(watermark / self.slide) - 1  # Last pane whose end <= watermark
+        if last_full >= self.next_pane:
+            # Only windows holding a pane: gaps with no data (or a long idle) cost nothing
+            due = {last for pane in self.panes for last in range(pane, pane + self.n_panes)
+                   if self.next_pane <= last <= last_full}
+            fired += [self._window(last) for last in sorted(due)]
+            self.next_pane = last_full + 1
+        # Keep panes that an accepted late sample could still reach
+        horizon = math.floor((self.watermark() - self.lateness) / self.slide) - self.n_panes + 1
+        for pane in [p for p in self.panes if p < horizon]:
+            del self.panes[pane]
+        return [w for w in fired if w[2] is not None]
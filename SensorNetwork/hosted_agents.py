@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Hosted sensor network agents - sensor and averager for `common/runtime.py`.
+
+Same topics and payloads as sensor_agent.py and averaging_agent.py (in its
+default arrival-time, single-instance mode), without a client or thread of
+their own: the waveform, reading parsing and publishing come from those
+modules.
+"""
+
+import os
+import sys
+import time
+
+from averaging_agent import AverageOutput, readings
+from sensor_agent import generate_reading
+from sliding_window import SlidingWindow
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import codec
+from common.presence import PresenceRegistry
+from common.runtime import Agent
+
+class Sensor(Agent):
+    def __init__(self, id, zone, measure_type, interval=2.0, fmt="json"):
+        super().__init__(id)
+        self.topic = f"/{zone}/{measure_type}/{id}"
+        self.presence_key = (zone, measure_type, id)
+        self.interval = interval
+        self.start_time = time.time()
+        self.codec = codec.get_codec(fmt, "reading")
+
+    def start(self):
+        self.subscribe(f"/reset/{self.id}", self._on_reset)
+        self.every(self.interval, self.publish_reading)
+
+    def _on_reset(self, msg):
+        print(f"[SENSOR {self.id}] Received RESET command")
+        self.start_time = time.time()
+
+    def publish_reading(self):
+        value = generate_reading(self.start_time, time.time())
+        codec.publish(self, self.topic, {"value": round(value, 2), "ts": time.time()}, self.codec)
+
+class Averager(Agent):
+    def __init__(self, zone, measure_type, id=None, window=10.0, interval=5.0, track_std=False, fmt="json"):
+        super().__init__(id or f"avg-{zone}-{measure_type}")
+        self.zone = zone
+        self.measure_type = measure_type
+        self.interval = interval
+        self.output = AverageOutput(zone, measure_type, track_std, fmt)
+        self.readings = SlidingWindow(window)
+        self.presence = PresenceRegistry()
+        self.batch_topic = f"/batch/{zone}/{measure_type}"
+
+    def start(self):
+        self.subscribe(f"/{self.zone}/{self.measure_type}/+", self._on_reading)
+        self.subscribe(self.batch_topic, self._on_reading)
+        self.subscribe(f"/sensors/{self.zone}/{self.measure_type}/+", self._on_presence, qos=1)
+        self.subscribe("/hosts/+", self._on_presence, qos=1)
+        self.every(self.interval, self.publish_average)
+
+    def _on_reading(self, msg):
+        try:
+            now = time.time()
+            for sensor_id, value in readings(msg, codec.decode(msg), self.batch_topic):
+                self.readings.add(now, value, sensor_id)
+        except (ValueError, KeyError):
+            pass
+
+    def _on_presence(self, msg):
+        joined, left = self.presence.handle(msg.topic, msg.payload)
+        for zone, mtype, sensor_id in left:
+            if (zone, mtype) == (self.zone, self.measure_type):
+                self.readings.discard(sensor_id)
+
+    def publish_average(self):
+        partial = self.readings.partial(time.time())
+        if partial is not None:
+            self.output.publish(self, partial)
@@ -1,53 +1,148 @@
 #!/usr/bin/env python3
 """Interface agent - displays averages grouped by zone/type."""
 
-import json
+import argparse
 import os
+import sys
+import threading
+import time
 
 import paho.mqtt.client as mqtt
 from collections import defaultdict
 
-BROKER, PORT = "localhost", 1883
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import codec, metrics, pipeline
+from common.metrics import Metrics
+from common.pipeline import Pipeline
+
+BROKER, PORT = os.environ.get("MQTT_BROKER", "localhost"), int(os.environ.get("MQTT_PORT", 1883))
+STALE_AFTER = 15.0  # Seconds without an update before a cell is marked stale
+LOST_AFTER = 60.0  # Seconds without an update before a cell is marked lost
+
+# ANSI escape sequences
+CLEAR, HIDE_CURSOR, SHOW_CURSOR, CLEAR_EOL = "\x1b[2J", "\x1b[?25l", "\x1b[?25h", "\x1b[K"
+STATUS = {"live": "\x1b[32m●\x1b[0m", "stale": "\x1b[33m◐ stale\x1b[0m", "lost": "\x1b[31m○ lost\x1b[0m"}
+
+def move(row):
+    return f"\x1b[{row};1H"
+
+def positive_float(value):
+    """argparse type for rates: a refresh rate of 0 or less has no frame period."""
+    value = float(value)
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"must be positive, got {value:g}")
+    return value
 
 class InterfaceAgent:
-    def __init__(self):
-        self.data = defaultdict(dict)  # {zone: {type: value}}
-        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    def __init__(self, fps=4.0, pipeline=None):
+        self.fps = fps
+        self.data = defaultdict(dict)  # {zone: {type: (value, received_at)}}
+        self.dirty = set()  # {(zone, type)} updated since the last frame
+        self.layout_changed = True
+        self.metrics = Metrics("interface")
+        self.lock = self.metrics.lock()
+        # Keyed by topic: each zone/type cell keeps its updates in order
+        self.pipeline = Pipeline(self._process, key=lambda msg: msg.topic, name="interface", **(pipeline or {}))
+        self.metrics.add_source("pipeline", self.pipeline.stats)
+        
+        # Render-thread state: screen row and last drawn status per cell
+        self.rows = {}
+        self.shown = {}
+        self.height = 0
+        
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv5)
         self.client.on_connect = self._on_connect
         self.client.on_message = self._on_message
+        self.metrics.instrument(self.client)
     
     def _on_connect(self, client, userdata, flags, rc, props):
         client.subscribe("/average/#")
         print("[INTERFACE] Subscribed to /average/#")
     
     def _on_message(self, client, userdata, msg):
+        self.pipeline.submit(msg)
+    
+    def _process(self, msg):
         # Parse topic: /average/{zone}/{type}
         parts = msg.topic.split("/")
         if len(parts) >= 4:
             zone, mtype = parts[2], parts[3]
             try:
-                data = json.loads(msg.payload.decode())
-                self.data[zone][mtype] = data["average"]
-                self._display()
-            except (json.JSONDecodeError, KeyError):
+                data = codec.decode(msg)
+                # Only record the update; the render thread coalesces them into frames
+                with self.lock:
+                    if mtype not in self.data[zone]:
+                        self.layout_changed = True
+                    self.data[zone][mtype] = (data["average"], time.time())
+                    self.dirty.add((zone, mtype))
+            except (ValueError, KeyError):
                 pass
     
-    def _display(self):
-        os.system('clear' if os.name == 'posix' else 'cls')
-        print("=" * 50)
-        print("       SENSOR NETWORK DASHBOARD")
-        print("=" * 50)
-        for zone in sorted(self.data.keys()):
-            print(f"\n📍 Zone: {zone}")
-            print("-" * 30)
-            for mtype, value in sorted(self.data[zone].items()):
-                print(f"   {mtype}: {value:.2f}")
-        print("\n" + "=" * 50)
+    def _status(self, received_at, now):
+        age = now - received_at
+        if age < STALE_AFTER:
+            return "live"
+        return "stale" if age < LOST_AFTER else "lost"
+    
+    def _layout(self, data):
+        """Full redraw: frame, zone headers and empty cells; records each cell's row."""
+        lines = ["=" * 50, "       SENSOR NETWORK DASHBOARD", "=" * 50]
+        self.rows = {}
+        for zone in sorted(data):
+            lines += ["", f"📍 Zone: {zone}", "-" * 30]
+            for mtype in sorted(data[zone]):
+                lines.append("")
+                self.rows[(zone, mtype)] = len(lines)  # 1-based terminal row
+        lines += ["", "=" * 50]
+        self.height = len(lines)
+        return CLEAR + move(1) + "\n".join(lines)
+    
+    def _render(self, now):
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+            layout_changed, self.layout_changed = self.layout_changed, False
+            out = []
+            if layout_changed:
+                out.append(self._layout(self.data))
+                dirty = set(self.rows)
+            # Cells whose staleness level changed need a redraw too
+            for cell, row in self.rows.items():
+                value, received_at = self.data[cell[0]][cell[1]]
+                status = self._status(received_at, now)
+                if cell in dirty or self.shown.get(cell) != status:
+                    self.shown[cell] = status
+                    out.append(f"{move(row)}   {cell[1]}: {value:.2f} {STATUS[status]}{CLEAR_EOL}")
+        if out:
+            out.append(move(self.height + 1))  # Park the cursor below the frame
+            sys.stdout.write("".join(out))
+            sys.stdout.flush()
+    
+    def _render_loop(self):
+        period = 1.0 / self.fps
+        while True:
+            start = time.time()
+            self._render(start)
+            time.sleep(max(period - (time.time() - start), 0))
     
     def run(self):
+        self.pipeline.start()
         self.client.connect(BROKER, PORT, 60)
-        self.client.loop_forever()
+        threading.Thread(target=self._render_loop, daemon=True).start()
+        sys.stdout.write(HIDE_CURSOR)
+        try:
+            self.client.loop_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sys.stdout.write(SHOW_CURSOR)
 
 if __name__ == "__main__":
-    InterfaceAgent().run()
-
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fps", type=positive_float, default=4.0, help="Maximum dashboard refresh rate")
+    pipeline.add_arguments(parser)
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    
+    agent = InterfaceAgent(args.fps, pipeline.options_from_args(args))
+    agent.metrics.start_from_args(args)
+    agent.run()
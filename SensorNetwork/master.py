@@ -1,65 +1,165 @@
 #!/usr/bin/env python3
 """Master process - spawns and manages agents dynamically."""
 
+import argparse
+import os
 import random
 import signal
 import subprocess
 import sys
+import threading
 import time
 
-processes = []
+import paho.mqtt.client as mqtt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.launcher import Launcher
+from common.presence import PresenceRegistry
+
+BROKER, PORT = os.environ.get("MQTT_BROKER", "localhost"), int(os.environ.get("MQTT_PORT", 1883))
+
+AGENTS = ["sensor_agent.py", "sensor_host.py", "averaging_agent.py", "combiner_agent.py", "interface_agent.py"]
+
+processes = []  # (type, name, Popen), or None instead of Popen for agents forked by the launcher
+sensors = set()  # Sensor ids this master spawned and has not removed
+presence = PresenceRegistry()
+presence_lock = threading.Lock()
+launcher = None  # Launcher when prefork is enabled
+
+def launch(ptype, name, script, *args):
+    """Fork the agent from the warm launcher, or start a fresh interpreter with --no-prefork."""
+    if launcher:
+        launcher.spawn(f"{ptype} {name}", script, args)
+        processes.append((ptype, name, None))
+    else:
+        processes.append((ptype, name, subprocess.Popen(["python3", script, *args])))
+
+def stop(ptype, name):
+    for i, (pt, n, p) in enumerate(processes):
+        if (pt, n) == (ptype, name):
+            del processes[i]
+            if p is None:
+                launcher.stop(f"{ptype} {name}")
+            else:
+                p.terminate()
+            return
 
 def spawn_sensor(zone, mtype, sid):
-    cmd = ["python3", "sensor_agent.py", "--zone", zone, "--type", mtype, "--id", sid]
-    p = subprocess.Popen(cmd)
-    processes.append(("sensor", sid, p))
+    launch("sensor", sid, "sensor_agent.py", "--zone", zone, "--type", mtype, "--id", sid)
+    sensors.add(sid)
     print(f"[MASTER] Spawned sensor {sid}")
-    return p
 
-def spawn_averaging(zone, mtype):
-    cmd = ["python3", "averaging_agent.py", "--zone", zone, "--type", mtype]
-    p = subprocess.Popen(cmd)
-    processes.append(("avg", f"{zone}/{mtype}", p))
+def spawn_averaging(zone, mtype, workers=1):
+    if workers > 1:
+        spawn_workers(zone, mtype, workers)
+        return
+    launch("avg", f"{zone}/{mtype}", "averaging_agent.py", "--zone", zone, "--type", mtype)
     print(f"[MASTER] Spawned averaging agent for {zone}/{mtype}")
 
+def spawn_workers(zone, mtype, workers):
+    for i in range(workers):
+        launch("avg", f"{zone}/{mtype}#{i}", "averaging_agent.py", "--zone", zone, "--type", mtype,
+               "--group", "avg", "--worker-id", str(i))
+    launch("combiner", f"{zone}/{mtype}", "combiner_agent.py", "--zone", zone, "--type", mtype)
+    print(f"[MASTER] Spawned {workers} averaging workers and a combiner for {zone}/{mtype}")
+
+def spawn_host(zones, types, per_group, batch=False):
+    args = ["--zones", ",".join(zones), "--types", ",".join(types), "--per-group", str(per_group)]
+    if batch:
+        args.append("--batch")
+    launch("host", "sensor_host", "sensor_host.py", *args)
+    print(f"[MASTER] Spawned sensor host with {per_group * len(zones) * len(types)} sensors")
+
+def watch_presence():
+    """Track live sensors from their retained birth/will messages rather than process state."""
+    def on_message(client, userdata, msg):
+        with presence_lock:
+            presence.handle(msg.topic, msg.payload)
+    
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    client.on_connect = lambda client, userdata, flags, rc, props: presence.subscribe(client)
+    client.on_message = on_message
+    client.connect(BROKER, PORT, 60)
+    client.loop_start()
+    return client
+
+def wait_started(label):
+    """Report how long the agents spawned since the last call took to connect to the broker."""
+    report = launcher.wait_ready(30)
+    pending = f", {report['pending']} still pending" if report["pending"] else ""
+    print(f"[MASTER] {label}: {report['ready']} agents connected in {report['elapsed']:.2f}s "
+          f"(slowest {report['slowest'] * 1e3:.0f} ms after fork){pending}")
+
 def cleanup(sig=None, frame=None):
     for ptype, name, p in processes:
-        p.terminate()
+        if p is not None:
+            p.terminate()
+    if launcher:
+        launcher.shutdown()
     sys.exit(0)
 
 signal.signal(signal.SIGINT, cleanup)
+signal.signal(signal.SIGTERM, cleanup)
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", action="store_true", help="Run all sensors in one sensor_host.py process")
+    parser.add_argument("--per-group", type=int, default=2, help="Sensors per zone/type pair")
+    parser.add_argument("--batch", action="store_true", help="With --host, publish batched readings")
+    parser.add_argument("--workers", type=int, default=1, help="Averaging workers per zone/type ($share group)")
+    parser.add_argument("--no-prefork", action="store_true", help="Start every agent as a fresh python3 process")
+    parser.add_argument("--pin", action="store_true", help="Pin prefork agents to CPUs round-robin")
+    args = parser.parse_args()
+    
+    global launcher
+    if hasattr(os, "fork") and not args.no_prefork:
+        launcher = Launcher(AGENTS, pin=args.pin).start()  # Before any thread is started
+    
     zones = ["living_room", "bedroom", "kitchen"]
     types = ["temperature", "humidity"]
+    watch_presence()
     
     # Spawn averaging agents
     for z in zones:
         for t in types:
-            spawn_averaging(z, t)
-    time.sleep(1)
+            spawn_averaging(z, t, args.workers)
+    if launcher:
+        wait_started("Averaging tier")
+    else:
+        time.sleep(1)
     
     # Spawn initial sensors
     sensor_id = 0
-    for z in zones:
-        for t in types:
-            for _ in range(2):
-                spawn_sensor(z, t, f"sensor_{sensor_id}")
-                sensor_id += 1
+    if args.host:
+        spawn_host(zones, types, args.per_group, args.batch)
+    else:
+        for z in zones:
+            for t in types:
+                for _ in range(args.per_group):
+                    spawn_sensor(z, t, f"sensor_{sensor_id}")
+                    sensor_id += 1
     
     # Spawn interface
-    subprocess.Popen(["python3", "interface_agent.py"])
+    launch("interface", "dashboard", "interface_agent.py")
+    if launcher:
+        wait_started("Sensors and interface")
     
     # Dynamic behavior: add/remove sensors
     try:
         while True:
             time.sleep(15)
-            # Randomly kill a sensor
-            sensors = [(i, p) for i, (pt, n, p) in enumerate(processes) if pt == "sensor" and p.poll() is None]
-            if sensors and random.random() < 0.3:
-                idx, p = random.choice(sensors)
-                p.terminate()
-                print(f"[MASTER] Removed sensor")
+            with presence_lock:
+                live = [sid for zone, mtype, sid in presence.live()]
+            print(f"[MASTER] {len(live)} live sensors")
+            if args.host:
+                continue  # Hosted fleet is fixed-size
+            # Randomly kill a live sensor that this master owns
+            owned = [sid for sid in live if sid in sensors]
+            if owned and random.random() < 0.3:
+                sid = random.choice(owned)
+                sensors.discard(sid)
+                stop("sensor", sid)
+                print(f"[MASTER] Removed sensor {sid}")
             # Randomly add a sensor
             if random.random() < 0.4:
                 z = random.choice(zones)
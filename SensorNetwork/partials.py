@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Mergeable partial aggregates - window summaries that combine without raw samples.
+
+A partial is {"sum", "count", "m2", "min", "max"}, where m2 is the sum of
+squared deviations from the partial's own mean. Partials merge with Chan's
+pairwise formula, so any tier can combine its children's partials in
+O(children) and derive the mean and standard deviation afterwards without
+the cancellation of a raw sum of squares.
+"""
+
+import math
+
+def merge(partials):
+    """Combine partials into one, or None if there is nothing to merge."""
+    merged = None
+    for p in partials:
+        if not p or not p["count"]:
+            continue
+        if merged is None:
+            merged = {k: p[k] for k in ("sum", "count", "m2", "min", "max")}
+            continue
+        n_a, n_b = merged["count"], p["count"]
+        delta = p["sum"] / n_b - merged["sum"] / n_a
+        merged["m2"] += p["m2"] + delta * delta * n_a * n_b / (n_a + n_b)
+        merged["sum"] += p["sum"]
+        merged["count"] += n_b
+        merged["min"] = min(merged["min"], p["min"])
+        merged["max"] = max(merged["max"], p["max"])
+    return merged
+
+def summarize(partial):
+    """Average, count, min, max and population std of a partial."""
+    n = partial["count"]
+    mean = partial["sum"] / n
+    return {
+        "average": mean,
+        "count": n,
+        "min": partial["min"],
+        "max": partial["max"],
+        "std": math.sqrt(partial["m2"] / n),
+    }
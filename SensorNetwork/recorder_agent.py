@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Recorder agent - persists raw readings into the column-file time-series store."""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+from tsstore import TimeSeriesStore
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import codec
+
+BROKER, PORT = os.environ.get("MQTT_BROKER", "localhost"), int(os.environ.get("MQTT_PORT", 1883))
+
+class RecorderAgent:
+    def __init__(self, zones, types, root="tsdata", flush_interval=5.0):
+        self.topics = [f"/{z}/{t}/+" for z in zones for t in types]
+        self.topics += [f"/batch/{z}/{t}" for z in zones for t in types]
+        self.flush_interval = flush_interval
+        self.store = TimeSeriesStore(root)
+        self.lock = threading.Lock()
+
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv5)
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+
+    def _on_connect(self, client, userdata, flags, rc, props):
+        print(f"[RECORDER] Subscribed to {len(self.topics)} topics, writing to {self.store.root}")
+        for topic in self.topics:
+            client.subscribe(topic)
+
+    def _on_message(self, client, userdata, msg):
+        parts = msg.topic.split("/")
+        try:
+            data = codec.decode(msg)
+            ts = data.get("ts", time.time())
+            with self.lock:
+                if parts[1] == "batch":
+                    group = f"{parts[2]}/{parts[3]}"
+                    for sensor_id, value in zip(data["ids"], data["values"]):
+                        self.store.append(f"{group}/{sensor_id}", ts, value)
+                else:
+                    self.store.append(f"{parts[1]}/{parts[2]}/{parts[3]}", ts, data["value"])
+        except (ValueError, KeyError):
+            pass
+
+    def flush(self, final=False):
+        with self.lock:
+            taken = self.store.take(final)
+        # Disk writes happen outside the lock so the network thread never waits on them
+        return self.store.write(taken)
+
+    def run(self):
+        self.client.connect(BROKER, PORT, 60)
+        self.client.loop_start()
+
+        try:
+            while True:
+                time.sleep(self.flush_interval)
+                rows = self.flush()
+                print(f"[RECORDER] Flushed {rows} readings ({len(self.store.writers)} series)")
+        except KeyboardInterrupt:
+            self.client.disconnect()
+            self.flush(final=True)
+            self.store.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--zones", default="living_room,bedroom,kitchen")
+    parser.add_argument("--types", default="temperature,humidity")
+    parser.add_argument("--dir", default="tsdata", help="Store root directory")
+    parser.add_argument("--flush", type=float, default=5.0, help="Seconds between appends to disk")
+    args = parser.parse_args()
+
+    agent = RecorderAgent(args.zones.split(","), args.types.split(","), args.dir, args.flush)
+    agent.run()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Rollup agent - merges child window partials into one tier of the aggregation tree."""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import paho.mqtt.client as mqtt
+
+from partials import merge, summarize
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import codec
+
+BROKER, PORT = os.environ.get("MQTT_BROKER", "localhost"), int(os.environ.get("MQTT_PORT", 1883))
+
+class RollupAgent:
+    def __init__(self, source, level, mapping=None, pub_interval=5.0, ttl=15.0, fmt="json"):
+        self.source = source
+        self.level = level
+        self.mapping = mapping  # {child: parent}; None rolls every child up into "all"
+        self.pub_interval = pub_interval
+        self.ttl = ttl
+        self.codec = codec.get_codec(fmt, "partial")
+        self.summary_codec = codec.get_codec(fmt, "average")
+
+        self.subscribe_topic = f"/partial/{source}/+/+"
+        self.children = defaultdict(dict)  # {(parent, type): {child: (partial, received_at)}}
+        self.lock = threading.Lock()
+
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv5)
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+
+    def parent_of(self, child):
+        if self.mapping is None:
+            return "all"
+        return self.mapping.get(child)
+
+    def _on_connect(self, client, userdata, flags, rc, props):
+        print(f"[ROLLUP {self.level}] Subscribed to {self.subscribe_topic}")
+        client.subscribe(self.subscribe_topic)
+
+    def _on_message(self, client, userdata, msg):
+        _, _, _, child, measure_type = msg.topic.split("/")
+        parent = self.parent_of(child)
+        if parent is None:
+            return
+        try:
+            partial = codec.decode(msg)
+        except ValueError:
+            return
+        if not partial.get("count"):
+            return
+        with self.lock:
+            self.children[(parent, measure_type)][child] = (partial, time.time())
+
+    def collect(self, now):
+        """Merge the fresh children of every (parent, type); stale children are dropped."""
+        merged = {}
+        with self.lock:
+            for key, children in self.children.items():
+                for child in [c for c, (_, at) in children.items() if now - at > self.ttl]:
+                    del children[child]
+                partial = merge(p for p, _ in children.values())
+                if partial is not None:
+                    merged[key] = (partial, len(children))
+        return merged
+
+    def run(self):
+        self.client.connect(BROKER, PORT, 60)
+        self.client.loop_start()
+
+        try:
+            while True:
+                time.sleep(self.pub_interval)
+                now = time.time()
+                for (parent, measure_type), (partial, children) in self.collect(now).items():
+                    stats = summarize(partial)
+                    payload = {k: round(v, 2) for k, v in stats.items()}
+                    payload["ts"] = now
+                    codec.publish(self.client, f"/partial/{self.level}/{parent}/{measure_type}",
+                                  dict(partial, ts=now), self.codec)
+                    codec.publish(self.client, f"/rollup/{self.level}/{parent}/{measure_type}",
+                                  payload, self.summary_codec)
+                    print(f"[ROLLUP {self.level}/{parent}/{measure_type}] Average: {stats['average']:.2f} "
+                          f"(n={stats['count']}, children={children})")
+        except KeyboardInterrupt:
+            self.client.disconnect()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", default="zone", help="Level of the child partials (zone, floor, ...)")
+    parser.add_argument("--level", default="building", help="Level name this agent publishes as")
+    parser.add_argument("--map", help='JSON {"child": "parent"}, e.g. {"kitchen": "floor1"}; default rolls all children into "all"')
+    parser.add_argument("--interval", type=float, default=5.0)
+    parser.add_argument("--ttl", type=float, default=15.0, help="Seconds before a silent child is dropped")
+    parser.add_argument("--format", choices=codec.FORMATS, default="json")
+    args = parser.parse_args()
+
+    mapping = json.loads(args.map) if args.map else None
+    agent = RollupAgent(args.source, args.level, mapping, args.interval, args.ttl, args.format)
+    agent.run()
@@ -2,25 +2,51 @@
 """Sensor agent - publishes readings on configured topic."""
 
 import argparse
-import json
 import math
+import os
+import sys
 import time
 
 import paho.mqtt.client as mqtt
 
-BROKER, PORT = "localhost", 1883
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import codec, metrics, presence, publisher
+from common.metrics import Metrics
+from common.publisher import FlowPublisher
+
+BROKER, PORT = os.environ.get("MQTT_BROKER", "localhost"), int(os.environ.get("MQTT_PORT", 1883))
+BASE, AMPLITUDE, PERIOD = 20.0, 5.0, 30.0  # Sinusoidal readings: base 20, amplitude 5, period 30s
+
+def generate_reading(start_time, now):
+    """Reading at `now` of a sensor started (or last reset) at `start_time`."""
+    return BASE + AMPLITUDE * math.sin(2 * math.pi * (now - start_time) / PERIOD)
 
 class SensorAgent:
-    def __init__(self, zone, measure_type, sensor_id, interval=2.0):
+    def __init__(self, zone, measure_type, sensor_id, interval=2.0, client=None, fmt="json", publisher=None, flow=None):
+        self.zone = zone
+        self.measure_type = measure_type
         self.topic = f"/{zone}/{measure_type}/{sensor_id}"
         self.interval = interval
         self.sensor_id = sensor_id
         self.start_time = time.time()
         self.running = True
+        self.codec = codec.get_codec(fmt, "reading")
+        self.presence_topic = presence.SENSOR_TOPIC.format(zone, measure_type, sensor_id)
         
-        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
-        self.client.on_connect = self._on_connect
-        self.client.on_message = self._on_message
+        # A shared client means the sensor is hosted (see sensor_host.py), which owns presence,
+        # the publisher and the metrics
+        self.metrics = None
+        if client is None:
+            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv5)
+            client.on_connect = self._on_connect
+            client.on_message = self._on_message
+            presence.register(client, self.presence_topic)
+            self.metrics = Metrics(f"sensor-{sensor_id}")
+            self.metrics.instrument(client)
+            publisher = FlowPublisher(client, **(flow or {}))
+            self.metrics.add_source("publisher", publisher.stats)
+        self.client = client
+        self.publisher = publisher  # Readings are buffered here and flushed by the owner's loop
         
         # Subscribe to reset commands
         self.reset_topic = f"/reset/{sensor_id}"
@@ -28,16 +54,23 @@ class SensorAgent:
     def _on_connect(self, client, userdata, flags, rc, props):
         print(f"[SENSOR {self.sensor_id}] Connected, publishing on {self.topic}")
         client.subscribe(self.reset_topic)
+        presence.announce(client, self.presence_topic, {"sensor_id": self.sensor_id, "interval": self.interval})
     
     def _on_message(self, client, userdata, msg):
         if msg.topic == self.reset_topic:
             print(f"[SENSOR {self.sensor_id}] Received RESET command")
-            self.start_time = time.time()  # Reset phase
+            self.reset()
+    
+    def reset(self):
+        self.start_time = time.time()  # Reset phase
     
     def generate_reading(self):
-        elapsed = time.time() - self.start_time
-        # Sinusoidal value: base 20, amplitude 5, period 30s
-        return 20 + 5 * math.sin(2 * math.pi * elapsed / 30)
+        return generate_reading(self.start_time, time.time())
+    
+    def publish_reading(self):
+        value = self.generate_reading()
+        codec.publish(self.publisher, self.topic, {"value": round(value, 2), "ts": time.time()}, self.codec)
+        return value
     
     def run(self):
         self.client.connect(BROKER, PORT, 60)
@@ -45,14 +78,15 @@ class SensorAgent:
         
         try:
             while self.running:
-                value = self.generate_reading()
-                payload = json.dumps({"value": round(value, 2), "ts": time.time()})
-                self.client.publish(self.topic, payload)
+                value = self.publish_reading()
+                self.publisher.flush()
                 print(f"[SENSOR {self.sensor_id}] Published: {value:.2f}")
                 time.sleep(self.interval)
         except KeyboardInterrupt:
             pass
         finally:
+            self.publisher.drain()
+            presence.withdraw(self.client, self.presence_topic)
             self.client.disconnect()
 
 if __name__ == "__main__":
@@ -61,8 +95,13 @@ if __name__ == "__main__":
     parser.add_argument("--type", required=True, dest="measure_type")
     parser.add_argument("--id", required=True, dest="sensor_id")
     parser.add_argument("--interval", type=float, default=2.0)
+    parser.add_argument("--format", choices=codec.FORMATS, default="json")
+    publisher.add_arguments(parser)
+    metrics.add_arguments(parser)
     args = parser.parse_args()
     
-    sensor = SensorAgent(args.zone, args.measure_type, args.sensor_id, args.interval)
+    sensor = SensorAgent(args.zone, args.measure_type, args.sensor_id, args.interval, fmt=args.format,
+                         flow=publisher.flow_from_args(args))
+    sensor.metrics.start_from_args(args)
     sensor.run()
 
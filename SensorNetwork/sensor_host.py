@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""Sensor host - runs many logical sensor agents on a single MQTT connection."""
+
+import argparse
+import heapq
+import json
+import os
+import random
+import sys
+import time
+
+import paho.mqtt.client as mqtt
+
+try:
+    import numpy as np
+except ImportError:  # Only needed for --batch
+    np = None
+
+from sensor_agent import AMPLITUDE, BASE, PERIOD, SensorAgent
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import codec, metrics, presence, publisher
+from common.metrics import Metrics
+from common.publisher import FlowPublisher
+
+BROKER, PORT = os.environ.get("MQTT_BROKER", "localhost"), int(os.environ.get("MQTT_PORT", 1883))
+REPORT_INTERVAL = 10.0  # Seconds between throughput reports
+
+class SensorBatch:
+    """All sensors of one zone/type, generated in one vectorized pass per tick.
+
+    Readings go out as a single message on /batch/{zone}/{type} carrying
+    parallel `ids` and `values` arrays and the tick timestamp `ts`.
+    """
+
+    def __init__(self, zone, measure_type, sensors, interval, publisher):
+        self.topic = f"/batch/{zone}/{measure_type}"
+        self.interval = interval
+        self.publisher = publisher
+        self.ids = [s.sensor_id for s in sensors]
+        self.index = {sid: i for i, sid in enumerate(self.ids)}
+        self.start_times = np.array([s.start_time for s in sensors])
+
+    def reset(self, sensor_id):
+        self.start_times[self.index[sensor_id]] = time.time()
+
+    def generate_readings(self):
+        elapsed = time.time() - self.start_times
+        # sensor_agent.generate_reading, vectorized over the whole group
+        return BASE + AMPLITUDE * np.sin(2 * np.pi * elapsed / PERIOD)
+
+    def publish_reading(self):
+        values = self.generate_readings()
+        payload = json.dumps({"ids": self.ids, "values": np.round(values, 2).tolist(), "ts": time.time()})
+        self.publisher.publish(self.topic, payload)
+        return values
+
+class SensorHost:
+    def __init__(self, zones, types, per_group, interval=2.0, prefix="hsensor", first_id=0, batch=False,
+                 fmt="json", flow=None):
+        if batch and np is None:
+            raise RuntimeError("Batch mode requires numpy (pip install numpy)")
+        self.interval = interval
+        self.sensors = {}  # {sensor_id: SensorAgent}
+        self.batch_of = {}  # {sensor_id: SensorBatch}, batch mode only
+        self.published = 0
+
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv5)
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+        self.presence_topic = presence.HOST_TOPIC.format(f"{prefix}-{os.getpid()}")
+        presence.register(self.client, self.presence_topic)
+        self.publisher = FlowPublisher(self.client, **(flow or {}))  # Shared by every hosted sensor
+        self.metrics = Metrics(f"host-{prefix}-{os.getpid()}")
+        self.metrics.instrument(self.client)
+        self.metrics.add_source("publisher", self.publisher.stats)
+
+        tasks = []
+        n = first_id
+        for zone in zones:
+            for mtype in types:
+                group = []
+                for _ in range(per_group):
+                    sid = f"{prefix}_{n}"
+                    group.append(SensorAgent(zone, mtype, sid, interval, self.client, fmt, self.publisher))
+                    n += 1
+                self.sensors.update((s.sensor_id, s) for s in group)
+                if batch:
+                    sensor_batch = SensorBatch(zone, mtype, group, interval, self.publisher)
+                    self.batch_of.update((s.sensor_id, sensor_batch) for s in group)
+                    tasks.append(sensor_batch)
+                else:
+                    tasks.extend(group)
+        if not tasks:
+            raise ValueError("Nothing to host: need at least one zone, one type and one sensor per group")
+
+        # Timer heap of (due, seq, task) where a task is a sensor or a batch;
+        # start times are staggered over one interval to avoid lockstep
+        now = time.time()
+        self.timers = [(now + random.uniform(0, t.interval), i, t) for i, t in enumerate(tasks)]
+        heapq.heapify(self.timers)
+
+    def _on_connect(self, client, userdata, flags, rc, props):
+        client.subscribe("/reset/+")  # One wildcard for every hosted sensor
+        fleet = {}
+        for s in self.sensors.values():
+            fleet.setdefault(f"{s.zone}/{s.measure_type}", []).append(s.sensor_id)
+        presence.announce(client, self.presence_topic, {"sensors": fleet})
+        print(f"[HOST] Connected, hosting {len(self.sensors)} sensors")
+
+    def _on_message(self, client, userdata, msg):
+        sid = msg.topic.split("/")[-1]
+        if sid not in self.sensors:
+            return
+        print(f"[HOST] RESET for {sid}")
+        if sid in self.batch_of:
+            self.batch_of[sid].reset(sid)
+        else:
+            self.sensors[sid].reset()
+
+    def run_due(self, now):
+        """Publish every task whose timer has expired and reschedule it."""
+        timers = self.timers
+        while timers and timers[0][0] <= now:
+            due, seq, task = timers[0]
+            task.publish_reading()
+            self.published += 1
+            due += task.interval
+            if due <= now:
+                due = now + task.interval  # Fell behind: skip missed ticks
+            heapq.heapreplace(timers, (due, seq, task))
+
+    def run(self):
+        self.client.connect(BROKER, PORT, 60)
+        self.client.loop_start()
+
+        last_report, last_count = time.time(), 0
+        try:
+            while True:
+                now = time.time()
+                self.run_due(now)
+                self.publisher.flush()
+                if now - last_report >= REPORT_INTERVAL:
+                    rate = (self.published - last_count) / (now - last_report)
+                    stats = self.publisher.stats()
+                    print(f"[HOST] {len(self.sensors)} sensors, {rate:.0f} msg/s, {stats['pending']} queued, "
+                          f"{stats['inflight']} in flight, {stats['dropped']} dropped, {stats['coalesced']} coalesced")
+                    last_report, last_count = now, self.published
+                wait = self.timers[0][0] - time.time()
+                if self.publisher.pending:
+                    wait = min(wait, 0.001)  # Window full: retry the flush soon
+                time.sleep(max(wait, 0))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.publisher.drain()
+            presence.withdraw(self.client, self.presence_topic)
+            self.client.disconnect()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--zones", default="living_room,bedroom,kitchen", help="Comma-separated zones")
+    parser.add_argument("--types", default="temperature,humidity", help="Comma-separated measure types")
+    parser.add_argument("--per-group", type=int, default=100, help="Sensors per zone/type pair")
+    parser.add_argument("--interval", type=float, default=2.0)
+    parser.add_argument("--prefix", default="hsensor", help="Sensor id prefix")
+    parser.add_argument("--first-id", type=int, default=0)
+    parser.add_argument("--batch", action="store_true", help="Publish one NumPy-generated batch per zone/type")
+    parser.add_argument("--format", choices=codec.FORMATS, default="json", help="Per-sensor reading format")
+    publisher.add_arguments(parser, inflight=1000, max_queue=10000)
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    zones, types = [z for z in args.zones.split(",") if z], [t for t in args.types.split(",") if t]
+    if not zones or not types or args.per_group < 1:
+        parser.error("need at least one zone, one type and --per-group >= 1")
+
+    host = SensorHost(zones, types, args.per_group,
+                      args.interval, args.prefix, args.first_id, args.batch, args.format,
+                      publisher.flow_from_args(args))
+    host.metrics.start_from_args(args)
+    host.run()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Sliding-window aggregator - O(1) amortized windowed statistics."""
+
+from collections import deque
+
+from partials import summarize
+
+class SlidingWindow:
+    """Time-based window with Welford mean/M2 and monotonic min/max.
+
+    Each sample is appended once and evicted once (Welford's update and its
+    inverse, as in AnomalyDetection/window_stats.py), so the cost of keeping
+    the statistics current is O(1) amortized per sample instead of a full
+    rescan of the window on every query.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self._reset()
+
+    def _reset(self):
+        self.samples = deque()  # (ts, value, key)
+        self.mins = deque()  # (seq, value), values increasing
+        self.maxs = deque()  # (seq, value), values decreasing
+        self.head_seq = 0  # seq of samples[0]
+        self.next_seq = 0
+        self.avg = 0.0
+        self.m2 = 0.0  # Sum of squared deviations from avg
+
+    def __len__(self):
+        return len(self.samples)
+
+    def add(self, ts, value, key=None):
+        seq = self.next_seq
+        self.next_seq += 1
+        self.samples.append((ts, value, key))
+        delta = value - self.avg
+        self.avg += delta / len(self.samples)
+        self.m2 += delta * (value - self.avg)
+        while self.mins and self.mins[-1][1] >= value:
+            self.mins.pop()
+        self.mins.append((seq, value))
+        while self.maxs and self.maxs[-1][1] <= value:
+            self.maxs.pop()
+        self.maxs.append((seq, value))
+        self.evict(ts)
+
+    def evict(self, now):
+        cutoff = now - self.window
+        samples = self.samples
+        while samples and samples[0][0] < cutoff:
+            _, value, _ = samples.popleft()
+            self._remove(value, len(samples))
+            if self.mins[0][0] == self.head_seq:
+                self.mins.popleft()
+            if self.maxs[0][0] == self.head_seq:
+                self.maxs.popleft()
+            self.head_seq += 1
+
+    def _remove(self, value, n):
+        """Retire `value`, leaving `n` samples."""
+        if n == 0:
+            self.avg = 0.0
+            self.m2 = 0.0
+            return
+        delta = value - self.avg
+        self.avg -= delta / n
+        self.m2 = max(self.m2 - delta * (value - self.avg), 0.0)
+
+    def discard(self, key):
+        """Drop every sample added under `key` (e.g. a departed sensor); O(window)."""
+        if not any(s[2] == key for s in self.samples):
+            return 0
+        kept = [s for s in self.samples if s[2] != key]
+        dropped = len(self.samples) - len(kept)
+        self._reset()
+        for ts, value, k in kept:
+            self.add(ts, value, k)
+        return dropped
+
+    def mean(self):
+        if not self.samples:
+            return None
+        return self.avg
+
+    def min(self):
+        return self.mins[0][1] if self.mins else None
+
+    def max(self):
+        return self.maxs[0][1] if self.maxs else None
+
+    def partial(self, now):
+        """Evict expired samples and return the mergeable partial, or None if empty."""
+        self.evict(now)
+        if not self.samples:
+            return None
+        return {
+            "sum": self.avg * len(self.samples),
+            "count": len(self.samples),
+            "m2": self.m2,
+            "min": self.min(),
+            "max": self.max(),
+        }
+
+    def stats(self, now):
+        """Evict expired samples and return the window summary, or None if empty."""
+        partial = self.partial(now)
+        return summarize(partial) if partial else None
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""Time-series store - append-only column files with 1s/1min/1h downsampled tiers.
+
+Each series (zone/type/sensor_id) is a directory with one file per tier and
+column, e.g. kitchen/temperature/sensor_0/1m.mean. A column is a run of
+fixed-size float64 records in native byte order, so row n of a tier is the
+n-th 8 bytes of each of its column files. Writers buffer rows in array('d')
+and append them in bulk through column files the store keeps open; readers
+map the files read-only and hand out memoryview slices, so a range scan
+copies nothing (numpy.frombuffer turns a column into an array, again
+without a copy).
+"""
+
+import argparse
+import bisect
+import mmap
+import os
+import time
+from array import array
+from collections import OrderedDict
+
+TIERS = {"1s": 1, "1m": 60, "1h": 3600}  # Downsampled tier -> bucket width in seconds
+RAW_COLUMNS = ("ts", "value")
+TIER_COLUMNS = ("ts", "min", "mean", "max", "count")
+MAX_OPEN_FILES = 512  # Column files kept open between flushes, least recently written closed first
+
+def columns_of(tier):
+    return RAW_COLUMNS if tier == "raw" else TIER_COLUMNS
+
+def _map(path):
+    """Read-only float64 view of a column file; empty if it does not exist yet."""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return memoryview(b"").cast("d")
+    with f:
+        size = os.fstat(f.fileno()).st_size // 8 * 8  # Ignore a record still being written
+        if not size:
+            return memoryview(b"").cast("d")
+        return memoryview(mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)).cast("d")
+
+class SeriesWriter:
+    """Buffers raw rows for one series and folds them into the downsampled tiers.
+
+    A bucket is closed when the first sample of a later bucket arrives; a
+    late sample is folded into the currently open bucket.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.pending = {tier: {c: array("d") for c in columns_of(tier)} for tier in ("raw", *TIERS)}
+        self.buckets = dict.fromkeys(TIERS)  # {tier: [start, min, max, sum, count]}
+
+    def append(self, ts, value):
+        raw = self.pending["raw"]
+        raw["ts"].append(ts)
+        raw["value"].append(value)
+        for tier, width in TIERS.items():
+            bucket = self.buckets[tier]
+            start = ts - ts % width
+            if bucket is None or start > bucket[0]:
+                if bucket is not None:
+                    self._close(tier, bucket)
+                self.buckets[tier] = [start, value, value, value, 1]
+                continue
+            if value < bucket[1]:
+                bucket[1] = value
+            if value > bucket[2]:
+                bucket[2] = value
+            bucket[3] += value
+            bucket[4] += 1
+
+    def _close(self, tier, bucket):
+        start, lo, hi, total, count = bucket
+        for column, v in zip(TIER_COLUMNS, (start, lo, total / count, hi, count)):
+            self.pending[tier][column].append(v)
+
+    def take(self, final=False):
+        """Swap out the buffered rows for write(); `final` also closes the open buckets."""
+        if final:
+            for tier, bucket in self.buckets.items():
+                if bucket is not None:
+                    self._close(tier, bucket)
+            self.buckets = dict.fromkeys(TIERS)
+        taken = {tier: columns for tier, columns in self.pending.items() if columns["ts"]}
+        for tier in taken:
+            self.pending[tier] = {c: array("d") for c in columns_of(tier)}
+        return taken
+
+    def write(self, taken, open_file):
+        """Append rows from take() through `open_file(path)`; returns the raw readings written."""
+        rows = 0
+        for tier, columns in taken.items():
+            if tier == "raw":
+                rows = len(columns["ts"])
+            # The ts column goes last so readers never see a timestamp without its values
+            for column in (*columns_of(tier)[1:], "ts"):
+                f = open_file(os.path.join(self.path, f"{tier}.{column}"))
+                columns[column].tofile(f)
+                f.flush()
+        return rows
+
+class TimeSeriesStore:
+    def __init__(self, root):
+        self.root = root
+        self.writers = {}  # {series: SeriesWriter}
+        self.files = OrderedDict()  # {path: column file open for append}, used by write() only
+
+    def append(self, series, ts, value):
+        writer = self.writers.get(series)
+        if writer is None:
+            if any(part in ("", ".", "..") for part in series.split("/")):
+                raise ValueError(f"Invalid series name: {series!r}")
+            writer = self.writers[series] = SeriesWriter(os.path.join(self.root, series))
+        writer.append(ts, value)
+
+    def take(self, final=False):
+        """Swap out every writer's buffered rows; only this step must exclude append()."""
+        return [(w, w.take(final)) for w in self.writers.values()]
+
+    def write(self, taken):
+        """Append rows from take() to disk; returns the number of raw readings written."""
+        return sum(w.write(rows, self._file) for w, rows in taken if rows)
+
+    def flush(self, final=False):
+        """Write every buffered row; returns the number of raw readings written."""
+        return self.write(self.take(final))
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        self.files.clear()
+
+    def _file(self, path):
+        f = self.files.get(path)
+        if f is not None:
+            self.files.move_to_end(path)
+            return f
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        f = self.files[path] = open(path, "ab")
+        if len(self.files) > MAX_OPEN_FILES:
+            self.files.popitem(last=False)[1].close()
+        return f
+
+    def series(self):
+        """Names (zone/type/sensor_id) of every series on disk."""
+        found = []
+        for path, _, files in os.walk(self.root):
+            if "raw.ts" in files:
+                found.append(os.path.relpath(path, self.root).replace(os.sep, "/"))
+        return sorted(found)
+
+    def columns(self, series, tier="raw"):
+        """Zero-copy views of all rows of a tier, trimmed to the rows every column has."""
+        path = os.path.join(self.root, series)
+        views = {c: _map(os.path.join(path, f"{tier}.{c}")) for c in columns_of(tier)}
+        n = min(len(v) for v in views.values())
+        return {c: v[:n] for c, v in views.items()}
+
+    def query(self, series, start=None, end=None, tier="raw"):
+        """Rows with start <= ts < end as {column: memoryview}, found by binary search on ts."""
+        views = self.columns(series, tier)
+        ts = views["ts"]
+        lo = 0 if start is None else bisect.bisect_left(ts, start)
+        hi = len(ts) if end is None else bisect.bisect_left(ts, end, lo)
+        return {c: v[lo:hi] for c, v in views.items()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List series or print a range of one")
+    parser.add_argument("root")
+    parser.add_argument("--series", help="zone/type/sensor_id; omit to list series")
+    parser.add_argument("--tier", choices=("raw", *TIERS), default="1m")
+    parser.add_argument("--last", type=float, help="Only the last N seconds")
+    args = parser.parse_args()
+
+    store = TimeSeriesStore(args.root)
+    if not args.series:
+        for name in store.series():
+            print(name)
+    else:
+        start = time.time() - args.last if args.last else None
+        rows = store.query(args.series, start, tier=args.tier)
+        columns = columns_of(args.tier)
+        print("  ".join(f"{c:>12}" for c in columns))
+        for row in zip(*(rows[c] for c in columns)):
+            print("  ".join(f"{v:>12.2f}" for v in row))
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Codec micro-benchmark - encode/decode cost and bytes on the wire per payload kind."""
+
+import argparse
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import codec
+
+SAMPLES = {
+    "reading": ({"value": 21.37, "ts": 1700000000.123}, codec.READING),
+    "average": ({"average": 21.37, "count": 42, "min": 18.2, "max": 24.9, "ts": 1700000000.123}, codec.AVERAGE),
+    "cfp": ({"cfp_id": 1234, "job_type": "assembly"}, codec.MSGPACK),
+    "bid": ({"cfp_id": 1234, "machine_id": "M1", "bid_time": 5, "status": "proposal"}, codec.MSGPACK),
+}
+
+def time_per_op(fn, arg, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn(arg)
+    return (time.perf_counter() - start) / n * 1e9
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=200000, help="Iterations per measurement")
+    args = parser.parse_args()
+
+    print(f"{'kind':<8} {'codec':<34} {'bytes':>6} {'encode ns':>10} {'decode ns':>10}")
+    for kind, (data, compact) in SAMPLES.items():
+        for c in (codec.JSON, compact):
+            if c is codec.MSGPACK and codec.msgpack is None:
+                print(f"{kind:<8} {c.content_type:<34} (msgpack not installed)")
+                continue
+            payload = c.encode(data)
+            msg = SimpleNamespace(payload=payload, properties=codec.properties_for(c))
+            enc = time_per_op(c.encode, data, args.n)
+            dec = time_per_op(codec.decode, msg, args.n)  # Includes content-type dispatch
+            print(f"{kind:<8} {c.content_type:<34} {len(payload):>6} {enc:>10.0f} {dec:>10.0f}")
+
+if __name__ == "__main__":
+    main()
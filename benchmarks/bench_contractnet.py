@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Contract net scaling benchmark - CFP traffic and award latency over machine counts.
+
+For each --machines count, starts that many machines with random
+capabilities (--caps of --job-types job types each) in one `common/runtime.py`
+process, waits until the supervisor has all their registrations, then issues
+--cfps CFPs for random job types that some machine can do through
+`SupervisorAgent.issue_cfp`. A probe
+counts the CFP, bid and assignment messages. The supervisor's award latency
+(CFP issued to round closed) is the histogram it reports in /metrics.
+
+`broadcast` is the number of bids the old single /cfp topic drew, when
+every machine answered every CFP, even if only to reject it.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "ContractNet"))
+sys.path.insert(0, ROOT)
+from bench_pipeline import free_port
+from supervisor import DEADLINE, SupervisorAgent
+
+class Probe:
+    def __init__(self, port):
+        self.counts = {"cfp": 0, "bids": 0, "assign": 0}
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv5)
+        self.client.on_connect = lambda c, u, f, rc, p: c.subscribe([("/cfp/#", 0), ("/bids", 0), ("/assign/+", 0)])
+        self.client.on_message = self._on_message
+        self.client.connect("localhost", port, 60)
+        self.client.loop_start()
+
+    def _on_message(self, client, userdata, msg):
+        self.counts[msg.topic.split("/")[1]] += 1
+
+def run(n, args, port, config_path, rng):
+    job_types = [f"job{i}" for i in range(args.job_types)]
+    config = {"agents": [{"agent": "machine", "id": f"bench_m{i}",
+                          "capabilities": {j: 0.01 for j in rng.sample(job_types, args.caps)}} for i in range(n)]}
+    with open(config_path, "w") as f:
+        json.dump(config, f)
+    offered = sorted({j for agent in config["agents"] for j in agent["capabilities"]})  # CFPs someone can bid on
+    runtime = subprocess.Popen([sys.executable, "-m", "common.runtime", config_path, "--metrics-interval", "0"],
+                               cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    supervisor = SupervisorAgent([], max_outstanding=args.max_outstanding)
+    with contextlib.redirect_stdout(io.StringIO()):  # The supervisor prints every round
+        supervisor.client.connect("localhost", port, 60)
+        supervisor.client.loop_start()
+        deadline = time.time() + args.timeout
+        while sum(1 for m in supervisor.machines if m.startswith("bench_m")) < n and time.time() < deadline:
+            time.sleep(0.1)
+        probe = Probe(port)
+        time.sleep(0.5)
+
+        threading.Thread(target=supervisor._deadline_loop, daemon=True).start()
+        start = time.perf_counter()
+        for _ in range(args.cfps):
+            supervisor.issue_cfp(rng.choice(offered))
+        with supervisor.cond:
+            while supervisor.pending:
+                supervisor.cond.wait()
+        elapsed = time.perf_counter() - start
+        time.sleep(0.5)  # Let the probe see the last assignments
+
+    runtime.send_signal(signal.SIGINT)
+    runtime.wait()
+    supervisor.client.disconnect()
+    probe.client.disconnect()
+
+    counts, latency = probe.counts, supervisor.award_latency
+    summary = latency.summary()
+    at_deadline = sum(latency.counts[int(DEADLINE * 1e9).bit_length():])
+    print(f"{n:>8} {counts['cfp']:>6} {counts['bids']:>8} {counts['bids'] / max(counts['cfp'], 1):>8.1f} "
+          f"{n * counts['cfp']:>10} {counts['assign']:>7} {summary['p50_us'] / 1e3:>9.1f} "
+          f"{summary['p99_us'] / 1e3:>9.1f} {at_deadline:>9} {args.cfps / elapsed:>8.0f}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--machines", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--cfps", type=int, default=200)
+    parser.add_argument("--job-types", type=int, default=10)
+    parser.add_argument("--caps", type=int, default=2, help="Job types each machine can do")
+    parser.add_argument("--max-outstanding", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for registrations")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    port = free_port()
+    os.environ.update(MQTT_BROKER="localhost", MQTT_PORT=str(port))
+    broker = subprocess.Popen([sys.executable, "-m", "common.broker", "--port", str(port)], cwd=ROOT,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    config_dir = tempfile.TemporaryDirectory()
+    rng = random.Random(args.seed)
+    try:
+        print(f"{args.cfps} CFPs over {args.job_types} job types, {args.caps} per machine")
+        print(f"{'machines':>8} {'CFPs':>6} {'bids':>8} {'bids/CFP':>8} {'broadcast':>10} {'assigns':>7} "
+              f"{'p50 ms':>9} {'p99 ms':>9} {'deadline':>9} {'CFP/s':>8}")
+        for n in args.machines:
+            run(n, args, port, os.path.join(config_dir.name, "machines.json"), rng)
+    finally:
+        broker.terminate()
+        broker.wait()
+        config_dir.cleanup()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Job execution benchmark - threads and time for 10k concurrent jobs on one scheduler.
+
+Builds --machines `JobQueue`s (ContractNet/machine_agent.py) with random
+capabilities, assigns --jobs jobs across them at once and runs them to
+completion, no broker involved:
+- `virtual`: simulated time (`Clock(None)`), fast-forwarded from one
+  completion to the next;
+- `realtime`: wall time sped up by --speed, on one scheduler thread;
+- `thread-per-job` (with --baseline): one sleeping thread per job, for
+  comparison.
+
+Reports completions, peak thread count, RSS growth, wall time and, for the
+timed modes, how late (in simulated seconds) the last completion was. Thread
+per job is measured against the ideal makespan, so its thread start-up
+counts as lateness.
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "ContractNet"))
+sys.path.insert(0, ROOT)
+from common.scheduler import Clock, Scheduler, positive_speed
+from machine_agent import JobQueue
+
+JOB_TYPES = {"assembly": 5.0, "welding": 8.0, "painting": 4.0, "testing": 3.0, "packaging": 2.0}
+
+def rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+class Fleet:
+    def __init__(self, machines, jobs, seed):
+        rng = random.Random(seed)
+        self.capabilities = [dict(rng.sample(sorted(JOB_TYPES.items()), 2)) for _ in range(machines)]
+        # Round-robin over machines, each job one of its machine's capabilities
+        self.assignments = [[] for _ in range(machines)]
+        for i in range(jobs):
+            caps = self.capabilities[i % machines]
+            self.assignments[i % machines].append(rng.choice(sorted(caps)))
+        self.makespan = max(sum(caps[j] for j in jobs)
+                            for caps, jobs in zip(self.capabilities, self.assignments))
+
+class Counter:
+    def __init__(self, target):
+        self.target = target
+        self.count = 0
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.peak_threads = threading.active_count()
+
+    def __call__(self, job_type):
+        with self.lock:
+            self.count += 1
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            if self.count >= self.target:
+                self.done.set()
+
+def run_scheduled(fleet, jobs, speed, timeout):
+    scheduler = Scheduler(Clock(speed))
+    counter = Counter(jobs)
+    queues = [JobQueue(caps, scheduler, counter) for caps in fleet.capabilities]
+    rss = rss_kb()
+    start = time.perf_counter()
+    for queue, assigned in zip(queues, fleet.assignments):
+        queue.assign(assigned)
+    counter.peak_threads = max(counter.peak_threads, threading.active_count())
+    if speed is None:
+        scheduler.run()
+    else:
+        counter.done.wait(timeout)
+    wall = time.perf_counter() - start
+    # Against the last queue's expected finish, which already accounts for when it was assigned
+    lateness = scheduler.time() - max(q.busy_until for q in queues) if speed else 0.0
+    return counter.count, counter.peak_threads, rss_kb() - rss, wall, lateness
+
+def run_threads(fleet, jobs, speed, timeout):
+    counter = Counter(jobs)
+    rss = rss_kb()
+    start = time.perf_counter()
+
+    def job(delay, job_type):
+        time.sleep(delay)
+        counter(job_type)
+
+    for caps, assigned in zip(fleet.capabilities, fleet.assignments):
+        at = 0.0
+        for job_type in assigned:  # The machine's jobs still run back to back
+            at += caps[job_type]
+            threading.Thread(target=job, args=(at / speed, job_type), daemon=True).start()
+    counter.peak_threads = max(counter.peak_threads, threading.active_count())
+    grown = rss_kb() - rss
+    counter.done.wait(timeout)
+    wall = time.perf_counter() - start
+    return counter.count, counter.peak_threads, grown, wall, wall * speed - fleet.makespan
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jobs", type=int, default=10000)
+    parser.add_argument("--machines", type=int, default=10000, help="Jobs run concurrently on up to this many machines")
+    parser.add_argument("--speed", type=positive_speed, default=100.0, help="Simulated seconds per wall second (realtime)")
+    parser.add_argument("--baseline", action="store_true", help="Also run one thread per job")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    fleet = Fleet(args.machines, args.jobs, args.seed)
+    print(f"{args.jobs} jobs on {args.machines} machines, makespan {fleet.makespan:.0f}s simulated, "
+          f"--speed {args.speed:g}")
+    print(f"{'mode':<15} {'completed':>10} {'threads':>8} {'RSS +':>9} {'wall':>8} {'late':>8}")
+    modes = [("virtual", run_scheduled, None), ("realtime", run_scheduled, args.speed)]
+    if args.baseline:
+        modes.append(("thread-per-job", run_threads, args.speed))
+    for name, run, speed in modes:
+        done, peak, rss, wall, late = run(fleet, args.jobs, speed, args.timeout)
+        late = f"{late:>7.2f}s" if speed else f"{'-':>8}"
+        print(f"{name:<15} {done:>10} {peak:>8} {rss / 1024:>6.1f} MB {wall:>7.2f}s {late}")
+
+if __name__ == "__main__":
+    main()
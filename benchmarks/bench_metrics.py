@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Metrics benchmark - per-message cost of `common/metrics.py` instrumentation.
+
+Times a no-op on_message callback, a publish on a disconnected client and a
+lock round trip, each bare and instrumented, and reports the difference in
+nanoseconds. Best of --repeat runs, to keep scheduler noise out.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import timeit
+
+import paho.mqtt.client as mqtt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.metrics import Metrics, TimedLock
+
+class Message:
+    topic = "/kitchen/temperature/sensor_0"
+    payload = b'{"value": 21.5, "ts": 0}'
+
+def best(stmt, n, repeat):
+    return min(timeit.repeat(stmt, number=n, repeat=repeat)) / n * 1e9
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    def handler(client, userdata, msg):
+        pass
+
+    bare = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    bare.on_message = handler
+    timed = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    timed.on_message = handler
+    Metrics("bench").instrument(timed)
+    lock, timed_lock = threading.Lock(), TimedLock()
+
+    def locked(l):
+        with l:
+            pass
+
+    cases = [
+        ("on_message", lambda: bare.on_message(bare, None, Message), lambda: timed.on_message(timed, None, Message)),
+        ("publish", lambda: bare.publish("/x", b"1"), lambda: timed.publish("/x", b"1")),
+        ("lock (MQTT_METRICS_LOCKS=1)", lambda: locked(lock), lambda: locked(timed_lock)),
+    ]
+    print(f"{'path':<28} {'bare':>9} {'metrics':>9} {'overhead':>9}  (ns per call)")
+    for name, plain, instrumented in cases:
+        a, b = best(plain, args.n, args.repeat), best(instrumented, args.n, args.repeat)
+        print(f"{name:<28} {a:>9.0f} {b:>9.0f} {b - a:>9.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Pipeline benchmark - sensors -> averaging -> interface against the local broker.
+
+Starts `common/broker.py` on a free port, a `sensor_host.py` fleet, one
+averaging agent per zone/type and the interface agent, then measures
+throughput and end-to-end latency from a probe subscriber and per-agent
+CPU from /proc.
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from common import codec
+
+SENSOR_DIR = os.path.join(ROOT, "SensorNetwork")
+CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+def cpu_seconds(pid):
+    """User+system CPU time of a live process, or None where /proc is unavailable."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / CLK_TCK
+    except OSError:
+        return None
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(int(len(sorted_values) * p), len(sorted_values) - 1)]
+
+class Probe:
+    """Subscriber that counts readings and averages and samples their latency."""
+
+    def __init__(self, port):
+        self.lock = threading.Lock()
+        self.measuring = False
+        self.readings = self.averages = 0
+        self.reading_lat, self.average_lat = [], []
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv5)
+        self.client.on_connect = lambda c, u, f, rc, p: c.subscribe("#")
+        self.client.on_message = self._on_message
+        self.client.connect("localhost", port, 60)
+        self.client.loop_start()
+
+    def _on_message(self, client, userdata, msg):
+        if not self.measuring:
+            return
+        now = time.time()
+        try:
+            data = codec.decode(msg)
+            with self.lock:
+                if msg.topic.startswith("/average/"):
+                    self.averages += 1
+                    self.average_lat.append(now - data["ts"])
+                elif msg.topic.startswith("/batch/"):
+                    self.readings += len(data["ids"])
+                    self.reading_lat.append(now - data["ts"])
+                elif "value" in data:
+                    self.readings += 1
+                    self.reading_lat.append(now - data["ts"])
+        except (ValueError, KeyError, TypeError):
+            pass
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--zones", default="living_room,bedroom,kitchen")
+    parser.add_argument("--types", default="temperature,humidity")
+    parser.add_argument("--per-group", type=int, default=200, help="Sensors per zone/type pair")
+    parser.add_argument("--interval", type=float, default=1.0, help="Sensor publish interval")
+    parser.add_argument("--avg-interval", type=float, default=1.0, help="Averaging publish interval")
+    parser.add_argument("--format", choices=codec.FORMATS, default="json")
+    parser.add_argument("--batch", action="store_true")
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    port = free_port()
+    env = dict(os.environ, MQTT_BROKER="localhost", MQTT_PORT=str(port))
+    quiet = {"stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL, "env": env}
+    zones, types = args.zones.split(","), args.types.split(",")
+
+    agents = [("broker", subprocess.Popen([sys.executable, "-m", "common.broker", "--port", str(port)], cwd=ROOT, **quiet))]
+    time.sleep(0.5)
+    for z in zones:
+        for t in types:
+            cmd = [sys.executable, "averaging_agent.py", "--zone", z, "--type", t,
+                   "--interval", str(args.avg_interval), "--format", args.format]
+            agents.append((f"avg {z}/{t}", subprocess.Popen(cmd, cwd=SENSOR_DIR, **quiet)))
+    agents.append(("interface", subprocess.Popen([sys.executable, "interface_agent.py"], cwd=SENSOR_DIR, **quiet)))
+    cmd = [sys.executable, "sensor_host.py", "--zones", args.zones, "--types", args.types,
+           "--per-group", str(args.per_group), "--interval", str(args.interval), "--format", args.format]
+    if args.batch:
+        cmd.append("--batch")
+    agents.append(("sensor_host", subprocess.Popen(cmd, cwd=SENSOR_DIR, **quiet)))
+
+    probe = Probe(port)
+    try:
+        time.sleep(args.warmup)
+        cpu_start = {name: cpu_seconds(p.pid) for name, p in agents}
+        probe.measuring = True
+        start = time.time()
+        time.sleep(args.duration)
+        probe.measuring = False
+        elapsed = time.time() - start
+        cpu_end = {name: cpu_seconds(p.pid) for name, p in agents}
+    finally:
+        probe.client.disconnect()
+        for _, p in agents:
+            p.terminate()
+        for _, p in agents:
+            p.wait()
+
+    n_sensors = args.per_group * len(zones) * len(types)
+    print(f"Sensors: {n_sensors} ({'batched' if args.batch else 'per-sensor'}, {args.format}), "
+          f"expected {n_sensors / args.interval:.0f} readings/s")
+    print(f"Readings: {probe.readings / elapsed:.0f}/s   Averages: {probe.averages / elapsed:.1f}/s")
+    for label, lat in (("reading", probe.reading_lat), ("average", probe.average_lat)):
+        lat.sort()
+        print(f"Latency {label:<8} p50={percentile(lat, 0.5) * 1e3:.1f}ms p90={percentile(lat, 0.9) * 1e3:.1f}ms "
+              f"p99={percentile(lat, 0.99) * 1e3:.1f}ms max={(lat[-1] if lat else float('nan')) * 1e3:.1f}ms")
+    print("CPU per agent:")
+    for name, _ in agents:
+        if cpu_start[name] is None or cpu_end[name] is None:
+            print(f"  {name:<28} n/a")
+        else:
+            print(f"  {name:<28} {(cpu_end[name] - cpu_start[name]) / elapsed * 100:5.1f}%")
+
+if __name__ == "__main__":
+    main()
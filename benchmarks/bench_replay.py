@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""Replay benchmark - runs one agent against a captured traffic log.
+
+Starts `common/broker.py` on a free port and the agent under test, replays
+a log recorded with `python -m common.traffic capture` at the requested
+speed, and reports input/output throughput, output delivery latency, drain
+time and agent CPU. Payload `ts` fields are rebased onto the replay time
+and `averaging_agent.py` runs with --event-time, so its windows depend on
+the log alone. Outputs are saved with wall-clock `ts` fields removed,
+window bounds in log time and only the last version of a re-fired window,
+so a later run at any speed can be diffed against them with --baseline.
+Other agents window on arrival time; for them --baseline needs --speed 1.
+"""
+
+import argparse
+import difflib
+import json
+import os
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import paho.mqtt.client as mqtt
+
+from bench_pipeline import ROOT, cpu_seconds, free_port, percentile
+from common import codec, traffic
+
+class OutputProbe:
+    """Subscriber that records every output of the agent under test."""
+
+    def __init__(self, port, topics):
+        self.lock = threading.Lock()
+        self.outputs = []  # (arrival, topic, data)
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv5)
+        self.client.on_connect = lambda c, u, f, rc, p: c.subscribe([(t, 0) for t in topics])
+        self.client.on_message = self._on_message
+        self.client.connect("localhost", port, 60)
+        self.client.loop_start()
+
+    def _on_message(self, client, userdata, msg):
+        try:
+            data = codec.decode(msg)
+        except ValueError:
+            data = {"raw": msg.payload.hex()}
+        with self.lock:
+            self.outputs.append((time.time(), msg.topic, data))
+
+def normalize(outputs, shift=0.0):
+    """{topic: [canonical JSON line]} with wall-clock timestamps stripped.
+
+    Windowed outputs (with `start` and `end`) are moved back by the replay
+    `shift`, ordered by window and keep only their last version, so late
+    updates give the same result however the window firing was timed.
+    """
+    by_topic, windows = defaultdict(list), defaultdict(dict)
+    for _, topic, data in outputs:
+        if isinstance(data, dict):
+            data = {k: v for k, v in data.items() if k != "ts"}
+            if "start" in data and "end" in data:
+                data["start"], data["end"] = round(data["start"] - shift, 6), round(data["end"] - shift, 6)
+                windows[topic][data["start"], data["end"]] = data
+                continue
+        by_topic[topic].append(json.dumps(data, sort_keys=True))
+    for topic, latest in windows.items():
+        by_topic[topic] += [json.dumps(latest[key], sort_keys=True) for key in sorted(latest)]
+    return by_topic
+
+def diff(baseline, current, context=5):
+    same = 0
+    for topic in sorted(set(baseline) | set(current)):
+        old, new = baseline.get(topic, []), current.get(topic, [])
+        if old == new:
+            same += 1
+            continue
+        print(f"  {topic}: {len(old)} -> {len(new)} messages")
+        lines = list(difflib.unified_diff(old, new, "baseline", "run", n=0, lineterm=""))
+        for line in lines[2:2 + context]:
+            print(f"    {line}")
+    print(f"  {same}/{len(set(baseline) | set(current))} output topics identical")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("log", help="Traffic log from python -m common.traffic capture")
+    parser.add_argument("--agent", required=True, help='Agent command line, e.g. "averaging_agent.py --zone kitchen --type temperature"')
+    parser.add_argument("--cwd", default="SensorNetwork", help="Agent directory, relative to the repository root")
+    parser.add_argument("--output", action="append", help="Output topic filter (repeatable, default /average/# and /alerts)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay time scale; 0 = max speed")
+    parser.add_argument("--drain", type=float, default=2.0,
+                        help="Seconds to wait for outputs after the replay; event-time windows still open "
+                             "fire after the agent's --window without input")
+    parser.add_argument("--save", help="Write the normalized outputs to this JSON file")
+    parser.add_argument("--baseline", help="Diff against outputs saved by an earlier --save")
+    args = parser.parse_args()
+    agent_args = shlex.split(args.agent)
+    event_time = "averaging_agent.py" in agent_args[0]
+    if event_time and "--event-time" not in agent_args:
+        agent_args.append("--event-time")  # Window on the rebased payload ts, not on replay timing
+    if args.baseline and not event_time and args.speed != 1.0:
+        parser.error("--baseline needs --speed 1 for agents that window on arrival time")
+
+    port = free_port()
+    env = dict(os.environ, MQTT_BROKER="localhost", MQTT_PORT=str(port))
+    quiet = {"stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL, "env": env}
+    broker = subprocess.Popen([sys.executable, "-m", "common.broker", "--port", str(port)], cwd=ROOT, **quiet)
+    time.sleep(0.5)
+    agent = subprocess.Popen([sys.executable, *agent_args], cwd=os.path.join(ROOT, args.cwd), **quiet)
+    probe = OutputProbe(port, args.output or ["/average/#", "/alerts"])
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv5)
+    client.connect("localhost", port, 60)
+    client.loop_start()
+    time.sleep(1.0)  # Let the agent subscribe
+
+    try:
+        cpu_start = cpu_seconds(agent.pid)
+        start = time.time()
+        inputs, replay_time, lag, shift = traffic.replay(client, args.log, args.speed, rebase=True)
+        replay_end = time.time()
+        time.sleep(args.drain)
+        cpu_end = cpu_seconds(agent.pid)
+        elapsed = time.time() - start
+    finally:
+        client.disconnect()
+        probe.client.disconnect()
+        for p in (agent, broker):
+            p.terminate()
+            p.wait()
+
+    with probe.lock:
+        outputs = list(probe.outputs)
+    during = [o for o in outputs if o[0] <= replay_end]
+    latency = sorted(t - data["ts"] for t, _, data in outputs if isinstance(data, dict) and "ts" in data)
+    print(f"Replay: {inputs} messages in {replay_time:.2f}s ({inputs / replay_time:.0f} msg/s, "
+          f"speed {'max' if not args.speed else f'{args.speed:g}x'}, worst lag {lag * 1e3:.1f}ms)")
+    print(f"Outputs: {len(outputs)} ({len(during) / replay_time:.1f}/s during replay)")
+    if outputs:
+        print(f"Drain: last output {max(outputs[-1][0] - replay_end, 0) * 1e3:.0f}ms after the last input")
+    print(f"Latency p50={percentile(latency, 0.5) * 1e3:.1f}ms p90={percentile(latency, 0.9) * 1e3:.1f}ms "
+          f"p99={percentile(latency, 0.99) * 1e3:.1f}ms")
+    if cpu_start is not None and cpu_end is not None:
+        print(f"Agent CPU: {(cpu_end - cpu_start) / elapsed * 100:.1f}%")
+
+    current = normalize(outputs, shift)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(current, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            print(f"Diff against {args.baseline}:")
+            diff(json.load(f), current)
+
+if __name__ == "__main__":
+    main()
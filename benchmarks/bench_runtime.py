@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Runtime benchmark - memory and CPU per agent, one process per agent vs `common/runtime.py`.
+
+Starts `common/broker.py` on a free port and brings up the same fleet twice:
+N sensors (one reading per --interval) and M machines, first as one
+`sensor_agent.py` / `machine_agent.py` process each, then hosted together by
+a single runtime process. Once every sensor is publishing and every machine
+has registered, it measures over --duration seconds:
+- CPU time (user + system, from /proc/{pid}/stat) of all agent processes;
+- total PSS (proportional set size) and thread count;
+- readings received, to check both modes do the same work.
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import paho.mqtt.client as mqtt
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from bench_pipeline import free_port
+from bench_startup import pss_kb
+
+TICK = os.sysconf("SC_CLK_TCK")
+CAPABILITIES = {"cut": 2.0, "drill": 3.0}
+
+def cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / TICK  # utime, stime
+
+def threads(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("Threads:"):
+                return int(line.split()[1])
+    return 0
+
+class Probe:
+    """Counts readings of the benchmark's sensors and retained machine registrations."""
+
+    def __init__(self, port, mode):
+        self.sensors = set()
+        self.machines = set()
+        self.readings = 0
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv5)
+        self.client.on_connect = lambda c, u, f, rc, p: c.subscribe([(f"/bench/{mode}/+", 0), ("/machines/+", 0)])
+        self.client.on_message = self._on_message
+        self.client.connect("localhost", port, 60)
+        self.client.loop_start()
+
+    def _on_message(self, client, userdata, msg):
+        sid = msg.topic.rsplit("/", 1)[1]
+        if msg.topic.startswith("/machines/"):
+            if msg.payload:
+                self.machines.add(sid)
+            return
+        self.sensors.add(sid)
+        self.readings += 1
+
+def start_processes(mode, args):
+    common = ["--metrics-interval", "0"]
+    procs = [subprocess.Popen([sys.executable, "sensor_agent.py", "--zone", "bench", "--type", mode, "--id",
+                               f"s{i}", "--interval", str(args.interval), *common],
+                              cwd=os.path.join(ROOT, "SensorNetwork"),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) for i in range(args.n)]
+    procs += [subprocess.Popen([sys.executable, "machine_agent.py", "--id", f"{mode}_m{i}", "--capabilities",
+                                json.dumps(CAPABILITIES), *common], cwd=os.path.join(ROOT, "ContractNet"),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) for i in range(args.machines)]
+    return procs
+
+def start_runtime(mode, args, config_path):
+    config = {"agents": [
+        {"agent": "sensor", "id": "s", "count": args.n, "zone": "bench", "measure_type": mode,
+         "interval": args.interval},
+        {"agent": "machine", "id": f"{mode}_m", "count": args.machines, "capabilities": CAPABILITIES},
+    ]}
+    with open(config_path, "w") as f:
+        json.dump(config, f)
+    return [subprocess.Popen([sys.executable, "-m", "common.runtime", config_path, "--metrics-interval", "0"],
+                             cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)]
+
+def run(mode, args, port, config_path):
+    probe = Probe(port, mode)
+    procs = start_processes(mode, args) if mode == "process" else start_runtime(mode, args, config_path)
+    deadline = time.time() + args.timeout
+    while (len(probe.sensors) < args.n or len(probe.machines) < args.machines) and time.time() < deadline:
+        time.sleep(0.2)
+    time.sleep(args.interval)  # Settle: every sensor past its first tick
+
+    pids = [p.pid for p in procs]
+    cpu, readings = sum(cpu_seconds(pid) for pid in pids), probe.readings
+    time.sleep(args.duration)
+    cpu, readings = sum(cpu_seconds(pid) for pid in pids) - cpu, probe.readings - readings
+    pss = [pss_kb(pid) for pid in pids]
+    n_threads = sum(threads(pid) for pid in pids)
+
+    for p in procs:
+        p.send_signal(signal.SIGINT)
+    for p in procs:
+        try:
+            p.wait(10)
+        except subprocess.TimeoutExpired:
+            p.kill()
+    probe.client.disconnect()
+
+    agents = args.n + args.machines
+    line = f"{mode:<8} {len(procs):>6} {n_threads:>8} {readings / args.duration:>9.0f}/s"
+    line += f" {cpu / args.duration * 100:>7.1f}% {cpu / args.duration / agents * 1e3:>8.2f}ms"
+    if None not in pss:
+        line += f" {sum(pss) / 1024:>9.1f} MB {sum(pss) / agents:>9.0f} kB"
+    print(line)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=100, help="Sensor agents")
+    parser.add_argument("--machines", type=int, default=10, help="Machine agents")
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between readings per sensor")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of steady state measured")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for the fleet to come up")
+    args = parser.parse_args()
+
+    port = free_port()
+    os.environ.update(MQTT_BROKER="localhost", MQTT_PORT=str(port))
+    broker = subprocess.Popen([sys.executable, "-m", "common.broker", "--port", str(port)], cwd=ROOT,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    config_dir = tempfile.TemporaryDirectory()
+    config_path = os.path.join(config_dir.name, "runtime.json")
+    try:
+        print(f"{args.n} sensors + {args.machines} machines, {args.duration:.0f}s steady state")
+        print(f"{'mode':<8} {'procs':>6} {'threads':>8} {'readings':>11} {'CPU':>8} {'CPU/agent':>9}"
+              f" {'total PSS':>12} {'PSS/agent':>12}   (CPU/agent: CPU ms per second)")
+        run("process", args, port, config_path)
+        run("runtime", args, port, config_path)
+    finally:
+        broker.terminate()
+        broker.wait()
+        config_dir.cleanup()
+
+if __name__ == "__main__":
+    main()
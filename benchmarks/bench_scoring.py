@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Scoring benchmark - anomaly scoring cost per tick for every detector, normalized per 10k sensors.
+
+Compares the vectorized engine (`AnomalyDetection/scoring.py`), fed one
+batch per group, with the original per-message z-score path
+(`WindowedStats` updated and scored for every reading).
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "AnomalyDetection"))
+from scoring import DETECTORS, ScoringEngine
+from window_stats import WindowedStats
+
+def bench_engine(detector, groups, ticks, depth):
+    engine = ScoringEngine(detector, depth)
+    rng = random.Random(1)
+    batches = [[20 + rng.uniform(-2, 2) for _ in ids] for _, ids in groups]
+    for _ in range(depth):  # Fill the ring buffers first
+        for (group, ids), values in zip(groups, batches):
+            engine.add_many(group, ids, values)
+        engine.score()
+    ingest = score = 0.0
+    for _ in range(ticks):
+        start = time.perf_counter()
+        for (group, ids), values in zip(groups, batches):
+            engine.add_many(group, ids, values)
+        mid = time.perf_counter()
+        engine.score()
+        ingest += mid - start
+        score += time.perf_counter() - mid
+    return ingest / ticks, score / ticks
+
+def bench_per_message(groups, ticks):
+    stats = {group: WindowedStats(30.0) for group, _ in groups}
+    rng = random.Random(1)
+    start = time.perf_counter()
+    for tick in range(ticks):
+        for group, ids in groups:
+            s = stats[group]
+            for sensor_id in ids:
+                value = 20 + rng.uniform(-2, 2)
+                s.add(tick, sensor_id, value)
+                s.evict(tick)
+                abs(value - s.mean) / (s.std() or 0.001) > 2.0
+    return (time.perf_counter() - start) / ticks
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sensors", type=int, default=10000)
+    parser.add_argument("--groups", type=int, default=6, help="Peer groups the sensors are split across")
+    parser.add_argument("--depth", type=int, default=32, help="Readings kept per sensor")
+    parser.add_argument("--ticks", type=int, default=20)
+    args = parser.parse_args()
+
+    per_group = args.sensors // args.groups
+    groups = [((f"zone{g}", "temperature"), [f"s{g}_{i}" for i in range(per_group)]) for g in range(args.groups)]
+    n = per_group * args.groups
+    scale = 10000 / n
+
+    print(f"{n} sensors in {args.groups} groups, depth {args.depth}; ms per tick per 10k sensors")
+    print(f"{'detector':<12} {'ingest':>8} {'score':>8} {'total':>8}")
+    for detector in DETECTORS:
+        ingest, score = bench_engine(detector, groups, args.ticks, args.depth)
+        print(f"{detector:<12} {ingest * scale * 1e3:>8.2f} {score * scale * 1e3:>8.2f} {(ingest + score) * scale * 1e3:>8.2f}")
+    total = bench_per_message(groups, args.ticks)
+    print(f"{'per-message':<12} {'':>8} {'':>8} {total * scale * 1e3:>8.2f}  (WindowedStats z-score, one reading per sensor)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Startup benchmark - time and memory to bring up N sensor agents, fresh interpreters vs prefork.
+
+Starts `common/broker.py` on a free port, then launches N `sensor_agent.py`
+processes twice: once as `python3` subprocesses (the old master behaviour)
+and once forked from a warm `common.launcher.Launcher`. A probe counts the
+retained presence births on `/sensors/bench/{mode}/+`, so both modes are
+timed to the same point: every agent connected and announced. Total PSS
+(proportional set size, shared pages split between sharers) is read from
+/proc where available.
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from bench_pipeline import free_port
+from common.launcher import Launcher
+
+SENSOR_DIR = os.path.join(ROOT, "SensorNetwork")
+SCRIPT = os.path.join(SENSOR_DIR, "sensor_agent.py")
+
+def pss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+class Births:
+    """Counts retained presence births of the benchmark's sensors."""
+
+    def __init__(self, port, mode):
+        self.count = 0
+        self.done = threading.Event()
+        self.target = None
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv5)
+        self.client.on_connect = lambda c, u, f, rc, p: c.subscribe(f"/sensors/bench/{mode}/+", qos=1)
+        self.client.on_message = self._on_message
+        self.client.connect("localhost", port, 60)
+        self.client.loop_start()
+
+    def _on_message(self, client, userdata, msg):
+        if msg.payload:
+            self.count += 1
+            if self.count >= self.target:
+                self.done.set()
+
+def sensor_args(mode, i):
+    return ["--zone", "bench", "--type", mode, "--id", f"s{i}", "--interval", "60"]
+
+def run(mode, n, port, timeout):
+    launcher = None
+    if mode == "prefork":
+        # Fork the warm server before the probe starts its network thread; silence the agents' output
+        sys.stdout.flush()
+        saved = os.dup(1)
+        with open(os.devnull, "w") as devnull:
+            os.dup2(devnull.fileno(), 1)
+        start = time.perf_counter()
+        launcher = Launcher([SCRIPT]).start()
+        os.dup2(saved, 1)
+        os.close(saved)
+        launcher.status()  # Returns once preloading is done
+        warmup = time.perf_counter() - start
+    births = Births(port, mode)
+    births.target = n
+    time.sleep(0.2)
+
+    start = time.perf_counter()
+    if launcher:
+        pids = [launcher.spawn(f"s{i}", SCRIPT, sensor_args(mode, i)) for i in range(n)]
+    else:
+        procs = [subprocess.Popen([sys.executable, SCRIPT, *sensor_args(mode, i)], cwd=SENSOR_DIR,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) for i in range(n)]
+        pids = [p.pid for p in procs]
+    spawned = time.perf_counter() - start
+    births.done.wait(timeout)
+    elapsed = time.perf_counter() - start
+    pss = [pss_kb(pid) for pid in pids]
+
+    if launcher:
+        launcher.shutdown()
+    else:
+        for p in procs:
+            p.send_signal(signal.SIGINT)
+        for p in procs:
+            p.wait()
+    births.client.disconnect()
+
+    line = f"{mode:<8} {spawned:>9.2f}s {elapsed:>9.2f}s {births.count:>6}/{n}"
+    line += f" {sum(pss) / 1024:>9.1f} MB" if None not in pss else f" {'n/a':>12}"
+    if launcher:
+        line += f"   (preload {warmup:.2f}s, once)"
+    print(line)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=50, help="Sensor agents to start")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    port = free_port()
+    os.environ.update(MQTT_BROKER="localhost", MQTT_PORT=str(port))
+    broker = subprocess.Popen([sys.executable, "-m", "common.broker", "--port", str(port)], cwd=ROOT,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    try:
+        print(f"{'mode':<8} {'spawn':>10} {'connected':>10} {'births':>7} {'total PSS':>12}")
+        run("prefork", args.n, port, args.timeout)
+        run("popen", args.n, port, args.timeout)
+    finally:
+        broker.terminate()
+        broker.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Shared building blocks used by the agents in every part of the lab."""
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""Local MQTT broker - asyncio stand-in for Mosquitto in tests and benchmarks.
+
+Supports the subset of MQTT 3.1.1 and 5 the lab agents use: clean sessions,
+QoS 0/1 (QoS 2 is acknowledged and delivered at most at QoS 1), retained
+messages, last-will, keepalive and `+`/`#` wildcards matched through a
+topic trie. MQTT v5 publish properties (e.g. content type) are forwarded
+to v5 subscribers unchanged. Shared subscriptions (`$share/{group}/{filter}`)
+deliver each matching message to one member of the group, round-robin.
+"""
+
+import argparse
+import asyncio
+import struct
+
+CONNECT, CONNACK, PUBLISH, PUBACK, PUBREC, PUBREL, PUBCOMP = 1, 2, 3, 4, 5, 6, 7
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 10, 11, 12, 13, 14
+MAX_QOS = 1
+MAX_WRITE_BUFFER = 8 * 1024 * 1024  # QoS 0 messages to a slower consumer are dropped past this
+
+def encode_varint(n):
+    out = bytearray()
+    while True:
+        n, digit = n >> 7, n & 0x7F
+        out.append(digit | 0x80 if n else digit)
+        if not n:
+            return bytes(out)
+
+def decode_varint(buf, pos):
+    value = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+def encode_str(s):
+    b = s.encode()
+    return struct.pack("!H", len(b)) + b
+
+def decode_str(buf, pos):
+    (n,) = struct.unpack_from("!H", buf, pos)
+    return bytes(buf[pos + 2:pos + 2 + n]).decode(), pos + 2 + n
+
+def packet(ptype, flags, body):
+    return bytes([ptype << 4 | flags]) + encode_varint(len(body)) + body
+
+class _Node:
+    __slots__ = ("children", "subscribers")
+
+    def __init__(self):
+        self.children = {}
+        self.subscribers = {}  # {session: qos}
+
+class TopicTrie:
+    """Subscription filters indexed level by level for wildcard matching."""
+
+    def __init__(self):
+        self.root = _Node()
+
+    def subscribe(self, topic_filter, session, qos):
+        node = self.root
+        for level in topic_filter.split("/"):
+            node = node.children.setdefault(level, _Node())
+        node.subscribers[session] = qos
+
+    def unsubscribe(self, topic_filter, session):
+        path = [self.root]
+        for level in topic_filter.split("/"):
+            node = path[-1].children.get(level)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].subscribers.pop(session, None)
+        # Prune branches that no longer hold subscribers
+        levels = topic_filter.split("/")
+        for i in range(len(levels), 0, -1):
+            node = path[i]
+            if node.subscribers or node.children:
+                break
+            del path[i - 1].children[levels[i - 1]]
+
+    def match(self, topic):
+        """Return {session: max granted qos} for every filter matching `topic`."""
+        levels = topic.split("/")
+        n = len(levels)
+        matched = {}
+        system = topic.startswith("$")  # Wildcards never match $-topics at the first level
+        stack = [(self.root, 0)]
+        while stack:
+            node, i = stack.pop()
+            children = node.children
+            hash_node = children.get("#")
+            if hash_node is not None and not (system and i == 0):
+                for s, q in hash_node.subscribers.items():
+                    if matched.get(s, -1) < q:
+                        matched[s] = q
+            if i == n:
+                for s, q in node.subscribers.items():
+                    if matched.get(s, -1) < q:
+                        matched[s] = q
+                continue
+            child = children.get(levels[i])
+            if child is not None:
+                stack.append((child, i + 1))
+            plus = children.get("+")
+            if plus is not None and not (system and i == 0):
+                stack.append((plus, i + 1))
+        return matched
+
+class SharedGroup:
+    """Members of one `$share/{group}/{filter}`; each message goes to the next member in turn."""
+
+    def __init__(self):
+        self.members = []  # [(session, qos)]
+        self.next = 0
+
+    def add(self, session, qos):
+        self.remove(session)
+        self.members.append((session, qos))
+
+    def remove(self, session):
+        self.members = [m for m in self.members if m[0] is not session]
+
+    def pick(self):
+        self.next = (self.next + 1) % len(self.members)
+        return self.members[self.next]
+
+def parse_shared(topic_filter):
+    """Split `$share/{group}/{filter}` into (group, filter), or None for a normal filter."""
+    parts = topic_filter.split("/", 2)
+    if parts[0] != "$share" or len(parts) < 3:
+        return None
+    return parts[1], parts[2]
+
+def filter_matches(topic_filter, topic):
+    fl, tl = topic_filter.split("/"), topic.split("/")
+    if topic.startswith("$") and fl[0] in ("+", "#"):
+        return False
+    for i, f in enumerate(fl):
+        if f == "#":
+            return True
+        if i >= len(tl) or (f != "+" and f != tl[i]):
+            return False
+    return len(fl) == len(tl)
+
+class Session:
+    def __init__(self, broker, reader, writer):
+        self.broker = broker
+        self.reader = reader
+        self.writer = writer
+        self.client_id = None
+        self.v5 = False
+        self.will = None  # (topic, payload, qos, retain, props)
+        self.filters = set()
+        self.next_mid = 0
+        self.keepalive = 0
+        self.last_seen = 0.0
+        self.closed = False
+
+    def send(self, data, droppable=False):
+        if self.closed:
+            return
+        if droppable and self.writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+            self.broker.dropped += 1
+            return
+        self.writer.write(data)
+
+    def send_publish(self, topic, payload, qos, retain, props):
+        body = encode_str(topic)
+        if qos:
+            self.next_mid = self.next_mid % 0xFFFF + 1
+            body += struct.pack("!H", self.next_mid)
+        if self.v5:
+            body += encode_varint(len(props)) + props
+        self.send(packet(PUBLISH, qos << 1 | retain, body + payload), droppable=not qos)
+
+class Broker:
+    def __init__(self, host="localhost", port=1883):
+        self.host = host
+        self.port = port
+        self.trie = TopicTrie()
+        self.shared = TopicTrie()  # Filter -> SharedGroup, matched like a subscriber
+        self.groups = {}  # {(group, filter): SharedGroup}
+        self.retained = {}  # {topic: (payload, qos, props)}
+        self.sessions = {}  # {client_id: Session}
+        self.server = None
+        self.expiry = None  # Keepalive expiry task; the loop only holds tasks weakly
+        self.received = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]  # Resolve port 0
+        self.expiry = asyncio.get_running_loop().create_task(self._expire_sessions())
+        return self
+
+    async def _expire_sessions(self):
+        """Close sessions silent for 1.5x their keepalive, so their will is published."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(1.0)
+            now = loop.time()
+            for session in list(self.sessions.values()):
+                if session.keepalive and now - session.last_seen > session.keepalive * 1.5:
+                    session.writer.close()
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        try:
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            self.expiry.cancel()
+
+    def publish(self, topic, payload, qos=0, retain=False, props=b""):
+        self.received += 1
+        if retain:
+            if payload:
+                self.retained[topic] = (payload, qos, props)
+            else:
+                self.retained.pop(topic, None)
+        for session, sub_qos in self.trie.match(topic).items():
+            session.send_publish(topic, payload, min(qos, sub_qos), 0, props)
+            self.delivered += 1
+        for group in self.shared.match(topic):
+            session, sub_qos = group.pick()
+            session.send_publish(topic, payload, min(qos, sub_qos), 0, props)
+            self.delivered += 1
+
+    async def _read_packet(self, reader):
+        header, byte = await reader.readexactly(2)
+        length, shift = byte & 0x7F, 7
+        while byte & 0x80:
+            byte = (await reader.readexactly(1))[0]
+            length |= (byte & 0x7F) << shift
+            shift += 7
+        body = await reader.readexactly(length) if length else b""
+        return header >> 4, header & 0x0F, body
+
+    async def _handle(self, reader, writer):
+        session = Session(self, reader, writer)
+        clean_exit = False
+        try:
+            ptype, _, body = await asyncio.wait_for(self._read_packet(reader), 10.0)
+            if ptype != CONNECT:
+                return
+            self._on_connect(session, body)
+            loop = asyncio.get_running_loop()
+            while True:
+                ptype, flags, body = await self._read_packet(reader)
+                session.last_seen = loop.time()
+                if ptype == DISCONNECT:
+                    clean_exit = True
+                    return
+                self._dispatch(session, ptype, flags, body)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError, IndexError, struct.error):
+            pass
+        finally:
+            self._on_close(session, clean_exit)
+            writer.close()
+
+    def _on_connect(self, session, body):
+        _, pos = decode_str(body, 0)  # Protocol name
+        level, flags = body[pos], body[pos + 1]
+        (session.keepalive,) = struct.unpack_from("!H", body, pos + 2)
+        session.last_seen = asyncio.get_running_loop().time()
+        pos += 4
+        session.v5 = level == 5
+        if session.v5:
+            n, pos = decode_varint(body, pos)
+            pos += n
+        session.client_id, pos = decode_str(body, pos)
+        if not session.client_id:
+            session.client_id = f"anon-{id(session):x}"
+        if flags & 0x04:  # Will flag
+            will_props = b""
+            if session.v5:
+                n, pos = decode_varint(body, pos)
+                will_props = bytes(body[pos:pos + n])
+                pos += n
+            will_topic, pos = decode_str(body, pos)
+            (n,) = struct.unpack_from("!H", body, pos)
+            will_payload = bytes(body[pos + 2:pos + 2 + n])
+            session.will = (will_topic, will_payload, min((flags >> 3) & 0x03, MAX_QOS), bool(flags & 0x20), will_props)
+        previous = self.sessions.get(session.client_id)
+        if previous is not None:  # Session takeover
+            previous.will = None
+            previous.closed = True
+            previous.writer.close()
+            self._drop_subscriptions(previous)
+        self.sessions[session.client_id] = session
+        session.send(packet(CONNACK, 0, b"\x00\x00\x00" if session.v5 else b"\x00\x00"))
+
+    def _dispatch(self, session, ptype, flags, body):
+        if ptype == PUBLISH:
+            qos, retain = (flags >> 1) & 0x03, flags & 0x01
+            topic, pos = decode_str(body, 0)
+            mid = None
+            if qos:
+                (mid,) = struct.unpack_from("!H", body, pos)
+                pos += 2
+            props = b""
+            if session.v5:
+                n, pos = decode_varint(body, pos)
+                props = bytes(body[pos:pos + n])
+                pos += n
+            self.publish(topic, bytes(body[pos:]), min(qos, MAX_QOS), retain, props)
+            if qos == 1:
+                session.send(packet(PUBACK, 0, struct.pack("!H", mid)))
+            elif qos == 2:
+                session.send(packet(PUBREC, 0, struct.pack("!H", mid)))
+        elif ptype == PUBREL:
+            session.send(packet(PUBCOMP, 0, body[:2]))
+        elif ptype == SUBSCRIBE:
+            self._on_subscribe(session, body)
+        elif ptype == UNSUBSCRIBE:
+            (mid,) = struct.unpack_from("!H", body, 0)
+            pos = 2
+            if session.v5:
+                n, pos = decode_varint(body, pos)
+                pos += n
+            count = 0
+            while pos < len(body):
+                topic_filter, pos = decode_str(body, pos)
+                self._unsubscribe(session, topic_filter)
+                session.filters.discard(topic_filter)
+                count += 1
+            reply = struct.pack("!H", mid) + (b"\x00" + b"\x00" * count if session.v5 else b"")
+            session.send(packet(UNSUBACK, 0, reply))
+        elif ptype == PINGREQ:
+            session.send(packet(PINGRESP, 0, b""))
+        # PUBACK/PUBREC/PUBCOMP from subscribers need no action: no redelivery
+
+    def _on_subscribe(self, session, body):
+        (mid,) = struct.unpack_from("!H", body, 0)
+        pos = 2
+        if session.v5:
+            n, pos = decode_varint(body, pos)
+            pos += n
+        granted, new_filters = [], []
+        while pos < len(body):
+            topic_filter, pos = decode_str(body, pos)
+            qos = min(body[pos] & 0x03, MAX_QOS)
+            pos += 1
+            session.filters.add(topic_filter)
+            granted.append(qos)
+            shared = parse_shared(topic_filter)
+            if shared is not None:
+                # Retained messages are not sent for shared subscriptions
+                group = self.groups.get(shared)
+                if group is None:
+                    group = self.groups[shared] = SharedGroup()
+                    self.shared.subscribe(shared[1], group, 0)
+                group.add(session, qos)
+                continue
+            self.trie.subscribe(topic_filter, session, qos)
+            new_filters.append((topic_filter, qos))
+        reply = struct.pack("!H", mid) + (b"\x00" if session.v5 else b"") + bytes(granted)
+        session.send(packet(SUBACK, 0, reply))
+        for topic, (payload, qos, props) in self.retained.items():
+            for topic_filter, sub_qos in new_filters:
+                if filter_matches(topic_filter, topic):
+                    session.send_publish(topic, payload, min(qos, sub_qos), 1, props)
+                    break
+
+    def _unsubscribe(self, session, topic_filter):
+        shared = parse_shared(topic_filter)
+        if shared is None:
+            self.trie.unsubscribe(topic_filter, session)
+            return
+        group = self.groups.get(shared)
+        if group is None:
+            return
+        group.remove(session)
+        if not group.members:
+            del self.groups[shared]
+            self.shared.unsubscribe(shared[1], group)
+
+    def _drop_subscriptions(self, session):
+        for topic_filter in session.filters:
+            self._unsubscribe(session, topic_filter)
+        session.filters.clear()
+
+    def _on_close(self, session, clean_exit):
+        session.closed = True
+        if self.sessions.get(session.client_id) is session:
+            del self.sessions[session.client_id]
+            self._drop_subscriptions(session)
+        if session.will and not clean_exit:
+            topic, payload, qos, retain, props = session.will
+            self.publish(topic, payload, qos, retain, props)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=1883)
+    args = parser.parse_args()
+
+    broker = Broker(args.host, args.port)
+    print(f"[BROKER] Listening on {args.host}:{args.port}")
+    try:
+        asyncio.run(broker.serve_forever())
+    except KeyboardInterrupt:
+        pass
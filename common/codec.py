@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Payload codecs - JSON, fixed-layout binary and msgpack, selected by MQTT v5 content type.
+
+Publishers attach the codec's content type to every non-JSON message; a
+message without one is JSON, so JSON and binary agents share topics freely.
+"""
+
+import json
+import math
+import struct
+
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
+
+try:
+    import msgpack
+except ImportError:  # Only needed for the msgpack format
+    msgpack = None
+
+class DecodeError(ValueError):
+    pass
+
+class JsonCodec:
+    content_type = "application/json"
+
+    def encode(self, data):
+        return json.dumps(data).encode()
+
+    def decode(self, payload):
+        return json.loads(payload)
+
+class StructCodec:
+    """Fixed-layout record; float fields missing on encode travel as NaN and are dropped on decode."""
+
+    def __init__(self, name, fields, fmt):
+        self.content_type = f"application/vnd.mqttlab.{name}"
+        self.fields = fields
+        self.packer = struct.Struct(fmt)
+        self.defaults = tuple(0 if code in "bBhHiIlLqQ" else math.nan for code in fmt.lstrip("<>!=@"))
+
+    def encode(self, data):
+        return self.packer.pack(*(data.get(f, d) for f, d in zip(self.fields, self.defaults)))
+
+    def decode(self, payload):
+        try:
+            values = self.packer.unpack(payload)
+        except struct.error as e:
+            raise DecodeError(str(e)) from e
+        return {f: v for f, v in zip(self.fields, values) if v == v}  # v != v only for NaN
+
+class MsgpackCodec:
+    content_type = "application/msgpack"
+
+    def encode(self, data):
+        if msgpack is None:
+            raise RuntimeError("The msgpack format requires msgpack (pip install msgpack)")
+        return msgpack.packb(data)
+
+    def decode(self, payload):
+        if msgpack is None:
+            # A peer's payload, not a local misconfiguration: handlers drop it like any bad message
+            raise DecodeError("msgpack payload received but msgpack is not installed")
+        try:
+            return msgpack.unpackb(payload)
+        except (ValueError, msgpack.UnpackException) as e:
+            raise DecodeError(str(e)) from e
+
+JSON = JsonCodec()
+READING = StructCodec("reading", ("value", "ts"), "<dd")
+AVERAGE = StructCodec("average", ("average", "count", "min", "max", "std", "ts"), "<dIdddd")
+PARTIAL = StructCodec("partial", ("sum", "count", "m2", "min", "max", "ts"), "<dIdddd")
+MSGPACK = MsgpackCodec()
+
+CODECS = {c.content_type: c for c in (JSON, READING, AVERAGE, PARTIAL, MSGPACK)}
+FORMATS = ("json", "binary", "msgpack")
+
+def get_codec(fmt, kind=None):
+    """Codec for a --format choice; "binary" picks the struct layout for `kind` ("reading", "average" or "partial")."""
+    if fmt == "json":
+        return JSON
+    if fmt == "binary" and kind in ("reading", "average", "partial"):
+        return {"reading": READING, "average": AVERAGE, "partial": PARTIAL}[kind]
+    if fmt not in ("msgpack", "binary"):
+        raise ValueError(f"Unknown format: {fmt}")
+    if msgpack is None:  # Fail at startup rather than on the first publish
+        raise RuntimeError(f"The {fmt} format{f' for {kind}' if kind else ''} requires msgpack (pip install msgpack)")
+    return MSGPACK
+
+_PROPERTIES = {}
+
+def properties_for(codec):
+    """PUBLISH properties announcing the codec, or None for JSON (the default)."""
+    if codec is JSON:
+        return None
+    if codec.content_type not in _PROPERTIES:
+        props = Properties(PacketTypes.PUBLISH)
+        props.ContentType = codec.content_type
+        _PROPERTIES[codec.content_type] = props
+    return _PROPERTIES[codec.content_type]
+
+def publish(client, topic, data, codec=JSON, **kwargs):
+    return client.publish(topic, codec.encode(data), properties=properties_for(codec), **kwargs)
+
+def decode(msg):
+    """Decode an incoming message using its content type, defaulting to JSON."""
+    props = msg.properties
+    content_type = getattr(props, "ContentType", None) if props is not None else None
+    codec = CODECS.get(content_type, JSON)
+    return codec.decode(msg.payload)
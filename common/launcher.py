@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""Agent launcher - forks agents from a warm parent that has already imported them.
+
+`Launcher.start()` forks a small server process that imports paho-mqtt and
+the agent scripts once. Every `spawn()` then forks that server and runs the
+script as __main__ with the given arguments, so an agent skips interpreter
+startup and its imports and shares those pages copy-on-write.
+
+The server also supervises what it forked:
+- an agent is healthy once its first MQTT `connect()` has returned; one that
+  is not healthy within `ready_timeout` seconds is killed and restarted;
+- an agent that dies with a non-zero status is restarted after an
+  exponential backoff (`backoff` doubling up to `max_backoff`), reset once
+  it has stayed up for STABLE seconds;
+- with `pin`, agents are pinned round-robin to the CPUs the launcher may use;
+- on `shutdown()`, SIGTERM or loss of the owner, agents are drained with
+  SIGINT so their KeyboardInterrupt cleanup runs (MQTT disconnect, presence
+  withdrawal), and killed if still alive after `grace` seconds.
+
+Requires os.fork (Unix). Start it before the owner starts any threads.
+"""
+
+import importlib
+import os
+import runpy
+import signal
+import struct
+import sys
+import time
+import traceback
+from multiprocessing import Pipe
+from multiprocessing.connection import wait
+
+import paho.mqtt.client as mqtt
+
+READY = struct.Struct("<i")  # Pid written by a child once it has connected
+TICK = 0.2  # Seconds between supervision passes
+STABLE = 30.0  # Seconds of uptime after which a restarted agent's backoff resets
+
+def preload(scripts):
+    """Import agent scripts (and through them their dependencies) without running their __main__ block."""
+    for script in scripts:
+        path = os.path.abspath(script)
+        if os.path.dirname(path) not in sys.path:
+            sys.path.insert(0, os.path.dirname(path))
+        importlib.import_module(os.path.splitext(os.path.basename(path))[0])
+
+class Child:
+    def __init__(self, name, script, args, restart, cpu):
+        self.name = name
+        self.script = os.path.abspath(script)
+        self.args = args
+        self.restart = restart
+        self.cpu = cpu
+        self.pid = None
+        self.started = self.ready_at = None
+        self.restart_at = None  # Pending restart time after a crash
+        self.kill_at = None  # SIGKILL deadline once asked to stop
+        self.failures = 0
+
+class Server:
+    def __init__(self, conn, scripts, pin, backoff, max_backoff, ready_timeout, grace):
+        self.conn = conn
+        self.backoff, self.max_backoff = backoff, max_backoff
+        self.ready_timeout, self.grace = ready_timeout, grace
+        self.children = {}  # {name: Child}
+        self.by_pid = {}
+        self.cpus = sorted(os.sched_getaffinity(0)) if pin and hasattr(os, "sched_getaffinity") else None
+        self.spawned = 0
+        self.ready_r, self.ready_w = os.pipe()
+        self.burst_start = None  # First spawn not yet covered by a wait_ready() report
+        self.last_ready = None
+        self.waiter = None  # wait_ready() deadline while the owner is blocked on it
+        self.draining = False
+        preload(scripts)
+
+    def serve(self):
+        signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C reaches the agents directly; the owner drains us
+        signal.signal(signal.SIGTERM, lambda sig, frame: setattr(self, "draining", True))
+        while not self.draining:
+            for ready in wait([self.conn, self.ready_r], TICK):
+                if ready is self.conn:
+                    try:
+                        self.command(*self.conn.recv())
+                    except EOFError:  # Owner is gone
+                        self.draining = True
+                        break
+                else:
+                    self.on_ready(os.read(self.ready_r, 4096))
+            self.reap()
+            self.check(time.time())
+        self.drain()
+
+    def command(self, op, *args):
+        if op == "spawn":
+            try:
+                self.conn.send(self.spawn(*args))
+            except (ValueError, OSError) as e:
+                self.conn.send(e)
+        elif op == "stop":
+            self.stop(*args)
+            self.conn.send(None)
+        elif op == "status":
+            self.conn.send({c.name: {"pid": c.pid, "ready": c.ready_at is not None, "failures": c.failures}
+                            for c in self.children.values()})
+        elif op == "wait":
+            self.waiter = time.time() + args[0] if args[0] is not None else float("inf")
+            self.check(time.time())
+        elif op == "drain":
+            self.draining = True
+
+    def spawn(self, name, script, args, restart):
+        if name in self.children:
+            raise ValueError(f"Agent {name!r} is already running")
+        cpu = self.cpus[self.spawned % len(self.cpus)] if self.cpus else None
+        self.spawned += 1
+        child = self.children[name] = Child(name, script, args, restart, cpu)
+        if self.burst_start is None:
+            self.burst_start = time.time()
+        return self.fork(child)
+
+    def fork(self, child):
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            self.run_child(child)
+        child.pid, child.started, child.ready_at, child.restart_at = pid, time.time(), None, None
+        self.by_pid[pid] = child
+        return pid
+
+    def run_child(self, child):
+        """Runs in the forked agent; never returns."""
+        code = 1
+        try:
+            self.conn.close()
+            os.close(self.ready_r)
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            if child.cpu is not None:
+                os.sched_setaffinity(0, {child.cpu})
+            report_ready(self.ready_w)
+            sys.argv = [child.script, *child.args]
+            sys.path.insert(0, os.path.dirname(child.script))
+            runpy.run_path(child.script, run_name="__main__")
+            code = 0
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                code = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+        except KeyboardInterrupt:
+            code = 0  # Drained
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(code)
+
+    def on_ready(self, data):
+        now = time.time()
+        for (pid,) in READY.iter_unpack(data):
+            child = self.by_pid.get(pid)
+            if child is not None:
+                child.ready_at = self.last_ready = now
+
+    def stop(self, name):
+        child = self.children.get(name)
+        if child is None:
+            return
+        child.restart = False
+        if child.pid is None:
+            del self.children[name]  # Was waiting to be restarted
+            return
+        signal_pid(child.pid, signal.SIGINT)
+        child.kill_at = time.time() + self.grace
+
+    def reap(self):
+        while self.by_pid:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                return
+            child = self.by_pid.pop(pid, None)
+            if child is None:
+                continue
+            child.pid = None
+            code = os.waitstatus_to_exitcode(status)
+            now = time.time()
+            if self.draining or not child.restart or code == 0:
+                del self.children[child.name]
+                if code != 0 and not self.draining and child.kill_at is None:
+                    print(f"[LAUNCHER] {child.name} exited ({code})")
+                continue
+            child.failures = child.failures + 1 if now - child.started < STABLE else 1
+            delay = min(self.backoff * 2 ** (child.failures - 1), self.max_backoff)
+            child.restart_at = now + delay
+            print(f"[LAUNCHER] {child.name} died ({code}), restarting in {delay:.1f}s")
+
+    def check(self, now):
+        for child in list(self.children.values()):
+            if child.pid is None:
+                if child.restart_at is not None and now >= child.restart_at:
+                    self.fork(child)
+            elif child.kill_at is not None:
+                if now >= child.kill_at:
+                    signal_pid(child.pid, signal.SIGKILL)
+            elif child.ready_at is None and now - child.started > self.ready_timeout:
+                print(f"[LAUNCHER] {child.name} not connected after {self.ready_timeout:.0f}s, killing")
+                signal_pid(child.pid, signal.SIGKILL)
+        if self.waiter is None:
+            return
+        start = self.burst_start or now
+        burst = [c for c in self.children.values() if c.started >= start]
+        pending = [c for c in burst if c.ready_at is None]
+        if pending and now < self.waiter:
+            return
+        starts = [c.ready_at - c.started for c in burst if c.ready_at is not None]
+        self.conn.send({
+            "ready": len(starts),
+            "pending": len(pending),
+            "elapsed": (now if pending or not burst else self.last_ready) - start,
+            "slowest": max(starts, default=0.0),
+        })
+        self.waiter = self.burst_start = None
+
+    def drain(self):
+        live = list(self.by_pid)
+        for pid in live:
+            signal_pid(pid, signal.SIGINT)
+        deadline = time.time() + self.grace
+        while self.by_pid and time.time() < deadline:
+            time.sleep(0.05)
+            self.reap()
+        killed = len(self.by_pid)
+        for pid in list(self.by_pid):
+            signal_pid(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        if live:
+            print(f"[LAUNCHER] Drained {len(live)} agents ({killed} killed after {self.grace:.0f}s)")
+
+def report_ready(fd):
+    """Make the agent's first successful MQTT connect() write its pid to `fd`."""
+    connect = mqtt.Client.connect
+
+    def connect_and_report(client, *args, **kwargs):
+        nonlocal fd
+        rc = connect(client, *args, **kwargs)
+        if fd is not None:
+            os.write(fd, READY.pack(os.getpid()))
+            os.close(fd)
+            fd = None
+        return rc
+
+    mqtt.Client.connect = connect_and_report
+
+def signal_pid(pid, sig):
+    try:
+        os.kill(pid, sig)
+    except ProcessLookupError:
+        pass
+
+class Launcher:
+    """Owner-side handle on the warm fork server; every call is one request/reply over a pipe."""
+
+    def __init__(self, scripts=(), pin=False, backoff=1.0, max_backoff=30.0, ready_timeout=30.0, grace=5.0):
+        self.settings = (list(scripts), pin, backoff, max_backoff, ready_timeout, grace)
+        self.conn = None
+        self.pid = None
+
+    def start(self):
+        parent, child = Pipe()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            parent.close()
+            code = 1
+            try:
+                Server(child, *self.settings).serve()
+                code = 0
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                os._exit(code)
+        child.close()
+        self.conn, self.pid = parent, pid
+        return self
+
+    def _call(self, *request):
+        self.conn.send(request)
+        reply = self.conn.recv()
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    def spawn(self, name, script, args=(), restart=True):
+        """Fork `script` with `args` under a unique `name`; returns its pid."""
+        return self._call("spawn", name, script, [str(a) for a in args], restart)
+
+    def stop(self, name):
+        """Stop an agent with SIGINT (SIGKILL after the grace period) without restarting it."""
+        self._call("stop", name)
+
+    def status(self):
+        return self._call("status")
+
+    def wait_ready(self, timeout=None):
+        """Block until every agent has connected, or `timeout` passes.
+
+        Returns {"ready", "pending", "elapsed", "slowest"}: `elapsed` runs from
+        the first spawn since the previous call to the last agent connecting,
+        `slowest` is the longest fork-to-connect time among ready agents.
+        """
+        return self._call("wait", timeout)
+
+    def shutdown(self):
+        """Drain every agent and stop the server."""
+        if self.pid is None:
+            return
+        try:
+            self.conn.send(("drain",))
+        except OSError:
+            pass
+        os.waitpid(self.pid, 0)
+        self.conn.close()
+        self.pid = None
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""Agent metrics - message counts, on_message latency, outgoing queue depth and lock contention.
+
+An agent creates one `Metrics(name)`, calls `instrument(client)` once its
+callbacks are set and takes its locks from `lock()`. Collection only bumps
+integers and log2-bucketed histograms on the calling thread (a few hundred
+nanoseconds per message, see `benchmarks/bench_metrics.py`); everything else
+happens in `start()`, which publishes a JSON snapshot on /metrics/{name}
+every interval and can serve the same data in the Prometheus text format.
+
+Lock timing costs about as much again per acquisition, so `lock()` returns a
+plain threading.Lock unless MQTT_METRICS_LOCKS=1.
+
+Counters bumped from several threads (publishes) are not locked and may
+lose the odd increment under contention.
+"""
+
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter_ns
+
+LOCK_TIMING = os.environ.get("MQTT_METRICS_LOCKS") == "1"
+BUCKETS = 64  # Bucket i counts durations in [2**(i-1), 2**i) ns, so int.bit_length() is the index
+
+class Histogram:
+    """Log2 duration histogram; hot paths update `counts` and `total` inline rather than calling a method."""
+
+    __slots__ = ("counts", "total")
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.total = 0  # ns
+
+    def observe(self, ns):
+        self.counts[ns.bit_length()] += 1
+        self.total += ns
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile, in ns."""
+        counts = list(self.counts)
+        rank, seen = q * sum(counts), 0
+        for i, c in enumerate(counts):
+            seen += c
+            if c and seen >= rank:
+                return 2 ** i
+        return 0
+
+    def summary(self):
+        n = sum(self.counts)
+        return {
+            "count": n,
+            "mean_us": round(self.total / n / 1e3, 2) if n else 0.0,
+            "p50_us": round(self.quantile(0.5) / 1e3, 2),
+            "p99_us": round(self.quantile(0.99) / 1e3, 2),
+            "max_us": round(self.quantile(1.0) / 1e3, 2),
+        }
+
+    def prometheus(self, name, labels):
+        lines = [f"# TYPE {name} histogram"]
+        cumulative = 0
+        for i, c in enumerate(self.counts[:36]):  # Up to 34 s; slower calls only show in +Inf
+            cumulative += c
+            lines.append(f'{name}_bucket{{{labels},le="{2 ** i / 1e9:.9g}"}} {cumulative}')
+        cumulative += sum(self.counts[36:])
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {self.total / 1e9:.9g}")
+        lines.append(f"{name}_count{{{labels}}} {cumulative}")
+        return lines
+
+class TimedLock:
+    """Drop-in threading.Lock that records contended waits and how long it is held.
+
+    `wait` only counts acquisitions that found the lock taken (an uncontended
+    one reads no clock); `hold` counts every acquisition.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.wait = Histogram()
+        self.hold = Histogram()  # Both are only updated while the lock is held
+        self._acquired = 0
+
+    def acquire(self, blocking=True, timeout=-1):
+        if not self._lock.acquire(False):
+            start = perf_counter_ns()
+            if not blocking or not self._lock.acquire(True, timeout):
+                return False
+            self.wait.observe(perf_counter_ns() - start)
+        self._acquired = perf_counter_ns()
+        return True
+
+    __enter__ = acquire
+
+    def release(self):
+        ns = perf_counter_ns() - self._acquired
+        hold = self.hold
+        hold.counts[ns.bit_length()] += 1
+        hold.total += ns
+        self._lock.release()
+
+    def __exit__(self, *exc):
+        ns = perf_counter_ns() - self._acquired
+        hold = self.hold
+        hold.counts[ns.bit_length()] += 1
+        hold.total += ns
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    def _is_owned(self):
+        # Used by threading.Condition; without it the condition probes with acquire/release, skewing the counts
+        return self._lock.locked()
+
+class Metrics:
+    def __init__(self, agent):
+        self.agent = agent
+        self.topic = f"/metrics/{agent}"
+        self.on_message = Histogram()
+        self.msgs_out = 0
+        self.locks = {}  # {name: TimedLock}
+        self.sources = {}  # {name: callable returning a dict of numbers}, e.g. FlowPublisher.stats
+        self.client = None
+        self._publish = None
+        self.started = time.time()
+
+    def lock(self, name="lock"):
+        if not LOCK_TIMING:
+            return threading.Lock()
+        lock = self.locks[name] = TimedLock()
+        return lock
+
+    def add_source(self, name, stats):
+        """Include `stats()` in every snapshot under `name`, and as {name}_{key} gauges for Prometheus."""
+        self.sources[name] = stats
+
+    def instrument(self, client):
+        """Time the client's on_message and count its publishes; call after on_message is set."""
+        handler, hist = client.on_message, self.on_message
+        counts = hist.counts
+
+        def on_message(client, userdata, msg):
+            start = perf_counter_ns()
+            try:
+                handler(client, userdata, msg)
+            finally:
+                ns = perf_counter_ns() - start
+                counts[ns.bit_length()] += 1
+                hist.total += ns
+
+        publish = client.publish
+
+        def counted_publish(*args, **kwargs):
+            self.msgs_out += 1
+            return publish(*args, **kwargs)
+
+        client.on_message = on_message
+        client.publish = counted_publish
+        self.client, self._publish = client, publish  # Snapshots themselves are not counted
+
+    def snapshot(self):
+        client = self.client
+        snap = {
+            "agent": self.agent,
+            "ts": time.time(),
+            "uptime": round(time.time() - self.started, 1),
+            "msgs_in": sum(self.on_message.counts),
+            "msgs_out": self.msgs_out,
+            "on_message": self.on_message.summary(),
+            # paho internals: packets not yet written to the socket, and QoS>0 messages awaiting their ack
+            "out_queue": len(getattr(client, "_out_packet", ())),
+            "inflight": len(getattr(client, "_out_messages", ())),
+            "locks": {name: {"wait": lock.wait.summary(), "hold": lock.hold.summary()}
+                      for name, lock in self.locks.items()},
+        }
+        for name, stats in self.sources.items():
+            snap[name] = stats()
+        return snap
+
+    def prometheus(self):
+        snap = self.snapshot()
+        labels = f'agent="{self.agent}"'
+        lines = []
+        for name, kind, value in (("mqtt_messages_in_total", "counter", snap["msgs_in"]),
+                                  ("mqtt_messages_out_total", "counter", snap["msgs_out"]),
+                                  ("mqtt_out_queue", "gauge", snap["out_queue"]),
+                                  ("mqtt_inflight", "gauge", snap["inflight"])):
+            lines += [f"# TYPE {name} {kind}", f"{name}{{{labels}}} {value}"]
+        for source in self.sources:
+            for key, value in snap[source].items():
+                lines += [f"# TYPE {source}_{key} gauge", f"{source}_{key}{{{labels}}} {value}"]
+        lines += self.on_message.prometheus("mqtt_on_message_seconds", labels)
+        for name, lock in self.locks.items():
+            lines += lock.wait.prometheus("lock_wait_seconds", f'{labels},lock="{name}"')
+            lines += lock.hold.prometheus("lock_hold_seconds", f'{labels},lock="{name}"')
+        return "\n".join(lines) + "\n"
+
+    def start(self, interval=10.0, port=None):
+        """Publish snapshots every `interval` seconds (0 disables) and serve /metrics on `port` if given."""
+        if interval > 0:
+            threading.Thread(target=self._report_loop, args=(interval,), daemon=True).start()
+        if port:
+            metrics = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    body = metrics.prometheus().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            server = ThreadingHTTPServer(("", port), Handler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def start_from_args(self, args):
+        """start() with the flags added by add_arguments()."""
+        self.start(args.metrics_interval, args.metrics_port)
+
+    def report(self):
+        """Publish one snapshot now; for owners that schedule reports on their own loop."""
+        if self._publish is not None:
+            self._publish(self.topic, json.dumps(self.snapshot()))
+
+    def _report_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            self.report()
+
+def add_arguments(parser):
+    """Add the --metrics-interval and --metrics-port flags every agent takes."""
+    parser.add_argument("--metrics-interval", type=float, default=10.0, help="Seconds between /metrics snapshots (0: off)")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus text metrics on this port")
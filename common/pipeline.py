@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Worker pipeline - ingest in the paho callback, process and emit on worker threads.
+
+An agent's on_message only calls `Pipeline.submit(msg)`, which timestamps
+the raw message and puts it on a bounded queue, so paho's network thread
+gets straight back to socket reads and keepalives. Worker threads decode
+and process the messages; whatever `process` returns is handed to `emit`
+on the same worker, outside the agent's lock (typically alerts to publish).
+
+Each worker owns one queue and a message always goes to the worker chosen by
+its key (by default the last topic level, i.e. the sensor id), so messages
+with the same key are processed in arrival order. When a queue is full the
+overload policy applies:
+- "block" waits for room, pushing back on paho and then the broker;
+- "drop" discards the new message;
+- "sample" keeps one message in `sample` once a queue is half full, and
+  drops when it is full.
+
+`stats()` reports depth, drops and the time messages spent queued, for
+`Metrics.add_source`.
+"""
+
+import queue
+import threading
+import traceback
+from time import perf_counter_ns
+
+from common.metrics import Histogram
+
+POLICIES = ("block", "drop", "sample")
+
+def sensor_key(msg):
+    return msg.topic.rsplit("/", 1)[-1]
+
+class Worker:
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize)
+        self.latency = Histogram()  # Enqueue to dequeue, ns
+        self.processed = 0
+        self.errors = 0
+
+class Pipeline:
+    def __init__(self, process, emit=None, workers=1, maxsize=10000, policy="block", sample=10, key=sensor_key,
+                 name="pipeline"):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overload policy {policy!r}, expected one of {POLICIES}")
+        self.process = process
+        self.emit = emit
+        self.policy = policy
+        self.sample = sample
+        self.key = key
+        self.name = name
+        self.workers = [Worker(max(maxsize // workers, 1)) for _ in range(workers)]
+        self.threads = []
+        self.dropped = self.sampled_out = 0  # Only touched by the submitting (network) thread
+        self.seen = 0
+
+    def start(self):
+        for i, worker in enumerate(self.workers):
+            thread = threading.Thread(target=self._work, args=(worker,), name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def submit(self, msg):
+        """Queue a raw message for its key's worker; called from on_message."""
+        workers = self.workers
+        worker = workers[hash(self.key(msg)) % len(workers)] if len(workers) > 1 else workers[0]
+        q = worker.queue
+        if self.policy == "sample" and q.qsize() * 2 >= q.maxsize:
+            self.seen += 1
+            if self.seen % self.sample:
+                self.sampled_out += 1
+                return
+        item = (perf_counter_ns(), msg)
+        if self.policy == "block":
+            q.put(item)
+            return
+        try:
+            q.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def _work(self, worker):
+        q, latency, process, emit = worker.queue, worker.latency, self.process, self.emit
+        while True:
+            item = q.get()
+            if item is None:
+                return
+            enqueued, msg = item
+            latency.observe(perf_counter_ns() - enqueued)
+            try:
+                out = process(msg)
+                if out is not None and emit is not None:
+                    emit(out)
+            except Exception:
+                worker.errors += 1
+                if worker.errors <= 3:  # Enough to diagnose without flooding the log
+                    traceback.print_exc()
+            worker.processed += 1
+
+    def stop(self, timeout=5.0):
+        """Let the workers finish what is queued, then stop them."""
+        for worker in self.workers:
+            worker.queue.put(None)
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def stats(self):
+        latency = Histogram()
+        for worker in self.workers:
+            latency.counts = [a + b for a, b in zip(latency.counts, worker.latency.counts)]
+            latency.total += worker.latency.total
+        summary = latency.summary()
+        return {
+            "depth": sum(w.queue.qsize() for w in self.workers),
+            "processed": sum(w.processed for w in self.workers),
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "errors": sum(w.errors for w in self.workers),
+            "queue_mean_us": summary["mean_us"],
+            "queue_p50_us": summary["p50_us"],
+            "queue_p99_us": summary["p99_us"],
+            "queue_max_us": summary["max_us"],
+        }
+
+def add_arguments(parser):
+    """Add the --threads/--queue/--overload/--sample flags; see options_from_args()."""
+    parser.add_argument("--threads", type=int, default=1, help="Pipeline worker threads")
+    parser.add_argument("--queue", type=int, default=10000, help="Messages queued for the workers before overload")
+    parser.add_argument("--overload", choices=POLICIES, default="block", help="What to do with messages when the queue is full")
+    parser.add_argument("--sample", type=int, default=10, help="With --overload sample, keep 1 in N messages under load")
+
+def options_from_args(args):
+    """Pipeline keyword arguments from the flags added by add_arguments()."""
+    return {"workers": args.threads, "maxsize": args.queue, "policy": args.overload, "sample": args.sample}
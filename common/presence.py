@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Presence registry - live sensors from retained birth messages and last-will clears.
+
+A standalone sensor publishes a retained birth on /sensors/{zone}/{type}/{id}
+and registers an empty retained payload on the same topic as its last will,
+so the broker withdraws it when the connection dies. A sensor host does the
+same on /hosts/{host_id} with the whole fleet in one birth, since an MQTT
+connection has a single will.
+"""
+
+import json
+
+SENSOR_TOPIC = "/sensors/{}/{}/{}"
+HOST_TOPIC = "/hosts/{}"
+
+def register(client, topic):
+    """Arrange for `topic` to be cleared if the client disconnects uncleanly; call before connect()."""
+    client.will_set(topic, b"", qos=1, retain=True)
+
+def announce(client, topic, data):
+    client.publish(topic, json.dumps(data), qos=1, retain=True)
+
+def withdraw(client, topic, timeout=1.0):
+    """Clear a registration on clean shutdown, waiting briefly so it is sent before disconnect()."""
+    info = client.publish(topic, b"", qos=1, retain=True)
+    try:
+        info.wait_for_publish(timeout)
+    except (RuntimeError, ValueError):
+        pass  # Not connected: the broker has already published the will
+
+class PresenceRegistry:
+    """Set of live (zone, type, sensor_id) keys, updated from presence messages."""
+
+    def __init__(self):
+        self.standalone = set()
+        self.fleets = {}  # {host_id: set of keys}
+
+    def __len__(self):
+        return len(self.standalone) + sum(len(f) for f in self.fleets.values())
+
+    def __contains__(self, key):
+        return key in self.standalone or any(key in f for f in self.fleets.values())
+
+    def live(self):
+        keys = set(self.standalone)
+        for fleet in self.fleets.values():
+            keys |= fleet
+        return keys
+
+    def subscribe(self, client, zone="+", measure_type="+"):
+        client.subscribe(SENSOR_TOPIC.format(zone, measure_type, "+"), qos=1)
+        client.subscribe("/hosts/+", qos=1)
+
+    def handle(self, topic, payload):
+        """Apply a presence message; returns (joined, left) lists of keys, or None for other topics."""
+        parts = topic.split("/")
+        if len(parts) == 5 and parts[1] == "sensors":
+            key = tuple(parts[2:])
+            if payload:
+                if key in self.standalone:
+                    return [], []
+                self.standalone.add(key)
+                return [key], []
+            if key not in self.standalone:
+                return [], []
+            self.standalone.discard(key)
+            return [], [key]
+        if len(parts) == 3 and parts[1] == "hosts":
+            old = self.fleets.pop(parts[2], set())
+            if not payload:
+                return [], list(old)
+            try:
+                groups = json.loads(payload)["sensors"]
+            except (ValueError, KeyError):
+                return [], list(old)
+            new = {(*group.split("/"), sid) for group, ids in groups.items() for sid in ids}
+            self.fleets[parts[2]] = new
+            return list(new - old), list(old - new)
+        return None
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Flow-controlled publisher - bounds what an agent hands to paho when the broker falls behind.
+
+paho's `publish()` queues without limit, so a slow broker turns into
+unbounded memory in the sender. `FlowPublisher.publish()` has the same
+signature but only buffers the message; `flush()`, called once per loop
+iteration, hands the buffer to paho while fewer than `inflight` messages are
+outstanding. A message stays outstanding until its `MQTTMessageInfo` reports
+it published: written to the socket at QoS 0, acknowledged at QoS 1.
+
+When the buffer holds `max_queue` messages, the policy decides what gives:
+- "drop-oldest" discards the oldest buffered message;
+- "coalesce" keeps only the latest message per topic, so a sensor that
+  falls behind sends its current reading instead of a backlog, and drops the
+  oldest topic if more than `max_queue` topics are waiting.
+
+Not thread-safe: publish and flush from the agent's own loop.
+"""
+
+import time
+from collections import deque
+
+import paho.mqtt.client as mqtt
+
+POLICIES = ("drop-oldest", "coalesce")
+
+class FlowPublisher:
+    def __init__(self, client, qos=0, inflight=100, max_queue=1000, policy="drop-oldest"):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy {policy!r}, expected one of {POLICIES}")
+        self.client = client
+        self.qos = qos
+        self.inflight = inflight
+        self.max_queue = max_queue
+        self.coalesce = policy == "coalesce"
+        self.pending = {} if self.coalesce else deque()  # Coalesce: {topic: (payload, qos, retain, properties)}
+        self.window = deque()  # MQTTMessageInfo of messages handed to paho, oldest first
+        self.sent = self.delivered = self.dropped = self.coalesced = self.failed = 0
+
+    def __len__(self):
+        return len(self.pending)
+
+    def publish(self, topic, payload=None, qos=None, retain=False, properties=None):
+        """Buffer a message for the next flush(); mirrors mqtt.Client.publish."""
+        message = (payload, self.qos if qos is None else qos, retain, properties)
+        pending = self.pending
+        if self.coalesce:
+            if topic in pending:
+                self.coalesced += 1
+            elif len(pending) >= self.max_queue:
+                del pending[next(iter(pending))]
+                self.dropped += 1
+            pending[topic] = message
+            return
+        if len(pending) >= self.max_queue:
+            pending.popleft()
+            self.dropped += 1
+        pending.append((topic, message))
+
+    def flush(self):
+        """Retire published messages and send buffered ones into the free window; returns how many were sent."""
+        window, pending = self.window, self.pending
+        if not self.client.is_connected():
+            # paho forgets unsent QoS 0 packets on reconnect; keep buffering (bounded) until it is back
+            self.failed += len(window)
+            window.clear()
+            return 0
+        self._retire()
+        sent = 0
+        while pending:
+            if len(window) >= self.inflight:
+                self._retire()  # paho's thread may have written some since
+                if len(window) >= self.inflight:
+                    break
+            if self.coalesce:
+                topic = next(iter(pending))
+                payload, qos, retain, properties = pending.pop(topic)
+            else:
+                topic, (payload, qos, retain, properties) = pending.popleft()
+            info = self.client.publish(topic, payload, qos, retain, properties)
+            if info.rc == mqtt.MQTT_ERR_SUCCESS:
+                window.append(info)
+                sent += 1
+            else:
+                self.failed += 1  # Connection lost since the check above
+        self.sent += sent
+        return sent
+
+    def _retire(self):
+        # Messages complete in order on one connection, so only the head needs checking
+        window = self.window
+        while window and window[0].is_published():
+            window.popleft()
+            self.delivered += 1
+
+    def drain(self, timeout=1.0):
+        """Flush until the buffer and window are empty or `timeout` passes; for shutdown."""
+        deadline = time.time() + timeout
+        while (self.pending or self.window) and time.time() < deadline:
+            self.flush()
+            time.sleep(0.01)
+
+    def stats(self):
+        return {
+            "pending": len(self.pending),
+            "inflight": len(self.window),
+            "sent": self.sent,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+        }
+
+def add_arguments(parser, inflight=100, max_queue=1000):
+    """Add the flow control flags, with defaults sized for the agent's fleet; see flow_from_args()."""
+    parser.add_argument("--qos", type=int, choices=(0, 1), default=0)
+    parser.add_argument("--inflight", type=int, default=inflight, help="Messages handed to paho and not yet published")
+    parser.add_argument("--max-queue", type=int, default=max_queue, help="Messages buffered beyond the in-flight window")
+    parser.add_argument("--policy", choices=POLICIES, default="drop-oldest", help="What gives when the buffer is full")
+
+def flow_from_args(args):
+    """FlowPublisher keyword arguments from the flags added by add_arguments()."""
+    return {"qos": args.qos, "inflight": args.inflight, "max_queue": args.max_queue, "policy": args.policy}
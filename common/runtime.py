@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""Agent runtime - many agents on one asyncio event loop and one MQTT connection.
+
+The agent scripts each own a paho client, a network thread and a sleep
+loop, so every agent costs a process and a few threads. An `Agent` hosted by
+a `Runtime` instead declares what it needs and the runtime provides it:
+- `subscribe(topic, handler)`: the runtime subscribes each filter once on
+  the broker and dispatches incoming messages through one topic trie, so a
+  message costs one lookup however many agents are hosted;
+- `every(interval, callback)` and `later(delay, callback)`: timers on the
+  event loop's single timer heap;
+- `publish(...)`: same signature as mqtt.Client.publish (so `codec.publish`
+  works on an agent), through one shared `FlowPublisher`.
+
+Handlers and timers run on the event loop thread and must not block. paho
+is driven from the loop through its socket callbacks, with no network
+thread. Hosted sensors are announced together on /hosts/{runtime}, as a
+sensor host does, since the connection has a single will.
+
+Agents are declared in a JSON config, for example:
+
+    {"agents": [
+        {"agent": "sensor", "id": "kitchen_t", "count": 50, "zone": "kitchen", "measure_type": "temperature"},
+        {"agent": "averager", "zone": "kitchen", "measure_type": "temperature"},
+        {"agent": "detector"},
+        {"agent": "machine", "id": "M1", "capabilities": {"cut": 2.0}}
+    ]}
+
+"agent" is a name from AGENTS or "path/to/module.py:Class" (relative to the
+config file); the other keys are constructor arguments. With "count", that
+many agents are built, with ids "{id}_0" to "{id}_{count-1}".
+
+Run with `python -m common.runtime config.json` from the repository root.
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import random
+import signal
+import sys
+import time
+import traceback
+
+import paho.mqtt.client as mqtt
+
+from common import metrics, presence, publisher
+from common.metrics import Metrics
+from common.publisher import FlowPublisher
+
+BROKER, PORT = os.environ.get("MQTT_BROKER", "localhost"), int(os.environ.get("MQTT_PORT", 1883))
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+RECONNECT_DELAY = 1.0  # Seconds between reconnection attempts
+SUBSCRIBE_BATCH = 100  # Filters per SUBSCRIBE packet
+
+AGENTS = {
+    "sensor": "SensorNetwork/hosted_agents.py:Sensor",
+    "averager": "SensorNetwork/hosted_agents.py:Averager",
+    "detector": "AnomalyDetection/hosted_detector.py:Detector",
+    "machine": "ContractNet/hosted_machine.py:Machine",
+}
+
+class Agent:
+    """Base class of runtime-hosted agents: set up subscriptions and timers in `start()`."""
+
+    presence_key = None  # (zone, type, sensor_id) for sensors, announced in the runtime's fleet
+
+    def __init__(self, id):
+        self.id = id
+        self.runtime = None
+
+    def start(self):
+        """Called once the event loop is running: subscribe and set up timers here."""
+
+    def stop(self):
+        """Called on shutdown, before the publisher is drained."""
+
+    def on_connect(self):
+        """Called after every (re)connection, once the runtime has subscribed."""
+
+    def subscribe(self, topic, handler, qos=0):
+        self.runtime.subscribe(topic, handler, qos)
+
+    def publish(self, topic, payload=None, qos=None, retain=False, properties=None):
+        self.runtime.publish(topic, payload, qos, retain, properties)
+
+    def every(self, interval, callback, jitter=True):
+        return self.runtime.every(interval, callback, jitter)
+
+    def later(self, delay, callback, *args):
+        return self.runtime.loop.call_later(delay, callback, *args)
+
+class Node:
+    __slots__ = ("children", "handlers")
+
+    def __init__(self):
+        self.children = {}  # {level: Node}, including "+" and "#"
+        self.handlers = []
+
+class Subscriptions:
+    """Trie of topic filters; `match()` walks one path per wildcard branch, not every filter."""
+
+    def __init__(self):
+        self.root = Node()
+
+    def add(self, topic_filter, handler):
+        node = self.root
+        for level in topic_filter.split("/"):
+            node = node.children.setdefault(level, Node())
+        node.handlers.append(handler)
+
+    def match(self, topic):
+        handlers = []
+        nodes = [self.root]
+        for level in topic.split("/"):
+            deeper = []
+            for node in nodes:
+                children = node.children
+                if "#" in children:
+                    handlers += children["#"].handlers
+                if level in children:
+                    deeper.append(children[level])
+                if "+" in children:
+                    deeper.append(children["+"])
+            nodes = deeper
+            if not nodes:
+                return handlers
+        for node in nodes:
+            handlers += node.handlers
+            if "#" in node.children:  # "a/#" also matches "a"
+                handlers += node.children["#"].handlers
+        return handlers
+
+class Timer:
+    """Repeating callback; rescheduled from its due time so it does not drift, skipping missed runs."""
+
+    def __init__(self, loop, interval, callback, first):
+        self.loop = loop
+        self.interval = interval
+        self.callback = callback
+        self.due = first
+        self.handle = loop.call_at(first, self._fire)
+
+    def _fire(self):
+        self.due = max(self.due + self.interval, self.loop.time())
+        self.handle = self.loop.call_at(self.due, self._fire)
+        self.callback()
+
+    def cancel(self):
+        self.handle.cancel()
+
+class Runtime:
+    def __init__(self, agents=(), name=None, flow=None, metrics_interval=10.0):
+        self.name = name or f"runtime-{os.getpid()}"
+        self.agents = {}  # {id: Agent}
+        self.subscriptions = Subscriptions()
+        self.filters = {}  # {topic filter: qos}, each subscribed once on the broker
+        self.timers = 0
+        self.errors = 0
+        self.metrics_interval = metrics_interval
+        self.loop = None
+        self.flushing = False
+        self.stopping = False
+
+        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=self.name, protocol=mqtt.MQTTv5)
+        self.client.on_connect = self._on_connect
+        self.client.on_disconnect = self._on_disconnect
+        self.client.on_message = self._on_message
+        self.client.on_socket_open = self._on_socket_open
+        self.client.on_socket_close = self._on_socket_close
+        self.client.on_socket_register_write = self._on_socket_register_write
+        self.client.on_socket_unregister_write = self._on_socket_unregister_write
+        self.presence_topic = presence.HOST_TOPIC.format(self.name)
+        presence.register(self.client, self.presence_topic)
+        self.publisher = FlowPublisher(self.client, **(flow or {"inflight": 1000, "max_queue": 10000}))
+        self.metrics = Metrics(self.name)
+        self.metrics.instrument(self.client)
+        self.metrics.add_source("publisher", self.publisher.stats)
+        self.metrics.add_source("runtime", self.stats)
+
+        for agent in agents:
+            self.add(agent)
+
+    def add(self, agent):
+        if agent.id in self.agents:
+            raise ValueError(f"Duplicate agent id {agent.id!r}")
+        agent.runtime = self
+        self.agents[agent.id] = agent
+        if self.loop is not None:
+            agent.start()
+
+    # Services used by agents
+
+    def subscribe(self, topic, handler, qos=0):
+        self.subscriptions.add(topic, handler)
+        if topic not in self.filters:
+            self.filters[topic] = qos
+            if self.client.is_connected():
+                self.client.subscribe(topic, qos)
+
+    def publish(self, topic, payload=None, qos=None, retain=False, properties=None):
+        self.publisher.publish(topic, payload, qos, retain, properties)
+        self._schedule_flush()
+
+    def every(self, interval, callback, jitter=True):
+        """Call `callback` every `interval` seconds, first after a random fraction of it with `jitter`."""
+        self.timers += 1
+        first = self.loop.time() + (random.uniform(0, interval) if jitter else interval)
+        return Timer(self.loop, interval, callback, first)
+
+    def _schedule_flush(self):
+        if not self.flushing:
+            self.flushing = True
+            self.loop.call_soon(self._flush)
+
+    def _flush(self):
+        self.publisher.flush()
+        if len(self.publisher) and self.client.is_connected():
+            self.loop.call_later(0.001, self._flush)  # Window full: retry once paho has written some
+            return
+        self.flushing = False
+
+    # paho on the event loop: the socket callbacks replace loop_forever()'s select
+
+    def _on_socket_open(self, client, userdata, sock):
+        self.loop.add_reader(sock, client.loop_read)
+
+    def _on_socket_close(self, client, userdata, sock):
+        self.loop.remove_reader(sock)
+
+    def _on_socket_register_write(self, client, userdata, sock):
+        self.loop.add_writer(sock, client.loop_write)
+
+    def _on_socket_unregister_write(self, client, userdata, sock):
+        self.loop.remove_writer(sock)
+
+    def _misc(self):
+        # Keepalive pings and retries that loop_forever() would do
+        self.client.loop_misc()
+
+    def _on_connect(self, client, userdata, flags, rc, props):
+        filters = list(self.filters.items())
+        for i in range(0, len(filters), SUBSCRIBE_BATCH):
+            client.subscribe(filters[i:i + SUBSCRIBE_BATCH])
+        fleet = {}
+        for agent in self.agents.values():
+            if agent.presence_key:
+                zone, mtype, sensor_id = agent.presence_key
+                fleet.setdefault(f"{zone}/{mtype}", []).append(sensor_id)
+        presence.announce(client, self.presence_topic, {"sensors": fleet})
+        for agent in self.agents.values():
+            agent.on_connect()
+        if len(self.publisher):
+            self._schedule_flush()  # Buffered while disconnected
+        print(f"[RUNTIME] Connected, hosting {len(self.agents)} agents on {len(self.filters)} subscriptions")
+
+    def _on_disconnect(self, client, userdata, flags, rc, props):
+        if not self.stopping:
+            print(f"[RUNTIME] Disconnected ({rc}), reconnecting")
+            self.loop.call_later(RECONNECT_DELAY, self._reconnect)
+
+    def _reconnect(self):
+        try:
+            self.client.reconnect()
+        except OSError:
+            self.loop.call_later(RECONNECT_DELAY, self._reconnect)
+
+    def _on_message(self, client, userdata, msg):
+        for handler in self.subscriptions.match(msg.topic):
+            try:
+                handler(msg)
+            except Exception:
+                self.errors += 1
+                if self.errors <= 3:  # Enough to diagnose without flooding the log
+                    traceback.print_exc()
+
+    def stats(self):
+        return {"agents": len(self.agents), "subscriptions": len(self.filters), "timers": self.timers,
+                "errors": self.errors}
+
+    # Lifecycle
+
+    def run(self):
+        asyncio.run(self._main())
+
+    async def _main(self):
+        self.loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            self.loop.add_signal_handler(sig, stop.set)
+
+        self.client.connect(BROKER, PORT, 60)
+        self.every(1.0, self._misc, jitter=False)
+        if self.metrics_interval > 0:
+            self.every(self.metrics_interval, self.metrics.report, jitter=False)
+        for agent in self.agents.values():
+            agent.start()
+        await stop.wait()
+
+        self.stopping = True
+        for agent in self.agents.values():
+            agent.stop()
+        withdrawn = self.client.publish(self.presence_topic, b"", qos=1, retain=True)
+        deadline = time.time() + 1.0
+        while (len(self.publisher) or self.publisher.window or not withdrawn.is_published()) and time.time() < deadline:
+            self.publisher.flush()
+            await asyncio.sleep(0.01)
+        self.client.disconnect()
+        while self.client.want_write() and time.time() < deadline + 1.0:
+            await asyncio.sleep(0.01)
+
+def agent_class(kind, base=ROOT):
+    """Resolve an AGENTS name or a "path/to/module.py:Class" spec to a class."""
+    path, _, name = AGENTS.get(kind, kind).rpartition(":")
+    path = os.path.join(ROOT if kind in AGENTS else base, path)
+    if os.path.dirname(path) not in sys.path:
+        sys.path.insert(0, os.path.dirname(path))  # Agent modules import their siblings, as the scripts do
+    module = importlib.import_module(os.path.splitext(os.path.basename(path))[0])
+    return getattr(module, name)
+
+def load(path):
+    """Build the agents declared in a JSON config file; returns (config, agents)."""
+    with open(path) as f:
+        config = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    agents = []
+    for spec in config["agents"]:
+        spec = dict(spec)
+        cls = agent_class(spec.pop("agent"), base)
+        count = spec.pop("count", None)
+        if count is None:
+            agents.append(cls(**spec))
+            continue
+        prefix = spec.pop("id")
+        agents += [cls(f"{prefix}_{i}", **spec) for i in range(count)]
+    return config, agents
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("config", help="JSON file declaring the agents to host")
+    parser.add_argument("--name", help="Runtime id for presence and metrics (default: runtime-{pid})")
+    publisher.add_arguments(parser, inflight=1000, max_queue=10000)
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+
+    config, agents = load(args.config)
+    runtime = Runtime(agents, args.name or config.get("name"), publisher.flow_from_args(args),
+                      args.metrics_interval)
+    runtime.metrics.start(0, args.metrics_port)  # Snapshots are published from the event loop instead
+    runtime.run()
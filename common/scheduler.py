@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Timer scheduler - one heap and one thread per process for delayed callbacks.
+
+Instead of parking a thread in time.sleep() for every pending action, an
+agent hands the action to a `Scheduler`: `call_later(delay, fn, *args)`
+pushes (due, seq, timer) on a heap and a single thread sleeps until the
+earliest due time, so 10k pending timers cost 10k heap entries, not 10k
+threads. Callbacks run on that thread in due order and must not block.
+
+Time comes from a `Clock`:
+- `Clock(speed)` is wall time, sped up by `speed`: at speed 10 a 5 s timer
+  fires after 0.5 s and `time()` reports 5 s as having passed;
+- `Clock(None)` is virtual: no thread is started and `run()` jumps from one
+  due time to the next without sleeping (discrete-event fast-forward), for
+  broker-free simulations.
+
+`shared()` returns the process-wide real-time scheduler; its thread only
+starts with the first timer, so it is safe to import before forking.
+"""
+
+import argparse
+import heapq
+import itertools
+import threading
+import time
+import traceback
+
+class Clock:
+    def __init__(self, speed=1.0, start=None):
+        if speed is not None and speed <= 0:
+            # 0 would stall the scheduler thread and a negative speed runs time backwards
+            raise ValueError(f"Clock speed must be positive (None for virtual time), got {speed!r}")
+        self.speed = speed  # Simulated seconds per wall second, or None for virtual time
+        self.origin = time.time() if start is None else start
+        self.wall = time.monotonic()
+        self.now = self.origin  # Virtual time, advanced by Scheduler.run()
+
+    @property
+    def virtual(self):
+        return self.speed is None
+
+    def time(self):
+        if self.speed is None:
+            return self.now
+        return self.origin + (time.monotonic() - self.wall) * self.speed
+
+def positive_speed(value):
+    """argparse type for --speed flags: a positive float."""
+    speed = float(value)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError(f"must be positive, got {speed:g}")
+    return speed
+
+class Timer:
+    __slots__ = ("when", "callback", "args")
+
+    def __init__(self, when, callback, args):
+        self.when = when
+        self.callback = callback
+        self.args = args
+
+    def cancel(self):
+        self.callback = None  # Left on the heap and skipped when due
+
+class Scheduler:
+    def __init__(self, clock=None):
+        self.clock = clock or Clock()
+        self.heap = []  # (due, seq, Timer)
+        self.seq = itertools.count()  # Ties fire in scheduling order
+        self.cond = threading.Condition()
+        self.thread = None
+        self.fired = self.errors = 0
+
+    def time(self):
+        return self.clock.time()
+
+    def call_at(self, when, callback, *args):
+        timer = Timer(when, callback, args)
+        with self.cond:
+            heapq.heappush(self.heap, (when, next(self.seq), timer))
+            if self.clock.virtual:
+                return timer
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._loop, name="scheduler", daemon=True)
+                self.thread.start()
+            elif self.heap[0][2] is timer:
+                self.cond.notify()  # New earliest timer: shorten the current wait
+        return timer
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(self.time() + delay, callback, *args)
+
+    def _loop(self):
+        heap, cond, clock = self.heap, self.cond, self.clock
+        while True:
+            with cond:
+                while True:
+                    if not heap:
+                        cond.wait()
+                        continue
+                    delay = heap[0][0] - clock.time()
+                    if delay <= 0:
+                        break
+                    cond.wait(delay / clock.speed)
+                timer = heapq.heappop(heap)[2]
+            self._fire(timer)
+
+    def _fire(self, timer):
+        if timer.callback is None:
+            return
+        self.fired += 1
+        try:
+            timer.callback(*timer.args)
+        except Exception:
+            self.errors += 1
+            if self.errors <= 3:  # Enough to diagnose without flooding the log
+                traceback.print_exc()
+
+    def run(self, until=None):
+        """Virtual clocks only: fire due timers in order, advancing the clock to each; returns the clock time."""
+        heap, clock = self.heap, self.clock
+        while heap and (until is None or heap[0][0] <= until):
+            when, _, timer = heapq.heappop(heap)
+            clock.now = max(clock.now, when)
+            self._fire(timer)
+        if until is not None:
+            clock.now = max(clock.now, until)
+        return clock.now
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def shared():
+    """The process-wide real-time scheduler, created on first use."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = Scheduler()
+        return _shared
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Traffic capture and replay - records MQTT messages with timing and publishes them again.
+
+A log is the magic bytes MQTTLOG1 followed by one record per message: a
+fixed header (offset in seconds from the first message, topic, content type
+and payload lengths) and the raw bytes, so payloads in every format replay
+byte for byte with their MQTT v5 content type. With --rebase the payload
+`ts` is moved by whole hours up to the replay time instead, so event-time
+agents see the log's timing at the current clock with unchanged window
+boundaries.
+
+    python -m common.traffic capture run.log --duration 60
+    python -m common.traffic replay run.log --speed 10   # --speed 0 replays as fast as possible
+"""
+
+import argparse
+import math
+import os
+import struct
+import time
+
+import paho.mqtt.client as mqtt
+
+from common import codec
+from common.broker import filter_matches
+
+BROKER, PORT = os.environ.get("MQTT_BROKER", "localhost"), int(os.environ.get("MQTT_PORT", 1883))
+MAGIC = b"MQTTLOG1"
+RECORD = struct.Struct("<dHBI")  # offset, topic length, content type length, payload length
+SKIP = ("/average/#", "/partial/#", "/rollup/#", "/alerts", "/metrics/#")  # Agent outputs, not workload
+SHIFT_STEP = 3600.0  # Rebased payload ts move by whole hours, so windows keep their boundaries
+
+class LogWriter:
+    def __init__(self, path):
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.start = None
+        self.count = 0
+
+    def write(self, ts, topic, content_type, payload):
+        if self.start is None:
+            self.start = ts
+        topic, content_type = topic.encode(), (content_type or "").encode()
+        self.file.write(RECORD.pack(ts - self.start, len(topic), len(content_type), len(payload)))
+        self.file.write(topic + content_type + payload)
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+def read_log(path):
+    """Yield (offset, topic, content_type, payload) for every record of a log."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a traffic log")
+        while True:
+            header = f.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+            offset, topic_len, ct_len, payload_len = RECORD.unpack(header)
+            body = f.read(topic_len + ct_len + payload_len)
+            topic = body[:topic_len].decode()
+            content_type = body[topic_len:topic_len + ct_len].decode() or None
+            yield offset, topic, content_type, body[topic_len + ct_len:]
+
+def capture(path, topics=("#",), skip=SKIP, duration=None):
+    """Record messages matching `topics` (minus `skip`) until the duration elapses or Ctrl+C."""
+    writer = LogWriter(path)
+
+    def on_message(client, userdata, msg):
+        if any(filter_matches(f, msg.topic) for f in skip):
+            return
+        props = msg.properties
+        content_type = getattr(props, "ContentType", None) if props is not None else None
+        writer.write(time.time(), msg.topic, content_type, msg.payload)
+
+    def on_connect(client, userdata, flags, rc, props):
+        for topic in topics:
+            client.subscribe(topic)
+
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv5)
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.connect(BROKER, PORT, 60)
+    client.loop_start()
+    try:
+        time.sleep(duration or 1e9)
+    except KeyboardInterrupt:
+        pass
+    client.disconnect()
+    client.loop_stop()
+    writer.close()
+    return writer.count
+
+def rebase_ts(payload_codec, payload, shift):
+    """Payload with its `ts` moved by `shift` seconds, or None if it has no ts."""
+    try:
+        data = payload_codec.decode(payload)
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or "ts" not in data:
+        return None
+    data["ts"] += shift
+    return payload_codec.encode(data)
+
+def replay(client, path, speed=1.0, rebase=False):
+    """Publish a log preserving its timing scaled by `speed` (0 = no pacing).
+
+    With `rebase`, every payload `ts` is moved by the same whole number of
+    hours, chosen so the first one lands within the hour before the replay
+    started. The shift is not scaled by `speed`: event time keeps the log's
+    spacing, so event-time windows hold the same readings at any speed.
+
+    Returns (messages, elapsed seconds, worst lag behind schedule in seconds,
+    ts shift in seconds).
+    """
+    start = time.time()
+    count, worst_lag, shift = 0, 0.0, None
+    for offset, topic, content_type, payload in read_log(path):
+        if speed:
+            delay = start + offset / speed - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                worst_lag = max(worst_lag, -delay)
+        props = codec.properties_for(codec.CODECS[content_type]) if content_type in codec.CODECS else None
+        if rebase:
+            payload_codec = codec.CODECS.get(content_type, codec.JSON)
+            if shift is None:
+                try:
+                    first = payload_codec.decode(payload)
+                    shift = math.floor((start - first["ts"]) / SHIFT_STEP) * SHIFT_STEP
+                except (ValueError, KeyError, TypeError):
+                    pass  # No ts to anchor on yet
+            if shift is not None:
+                payload = rebase_ts(payload_codec, payload, shift) or payload
+        client.publish(topic, payload, properties=props)
+        count += 1
+    return count, time.time() - start, worst_lag, shift or 0.0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    cap = sub.add_parser("capture")
+    cap.add_argument("log")
+    cap.add_argument("--topic", action="append", help="Filter to record (repeatable, default #)")
+    cap.add_argument("--duration", type=float, help="Seconds to record (default: until Ctrl+C)")
+    rep = sub.add_parser("replay")
+    rep.add_argument("log")
+    rep.add_argument("--speed", type=float, default=1.0, help="Time scale, e.g. 10 for 10x; 0 = max speed")
+    rep.add_argument("--rebase", action="store_true", help="Move payload ts by whole hours up to the replay time")
+    args = parser.parse_args()
+
+    if args.command == "capture":
+        print(f"[TRAFFIC] Capturing to {args.log}")
+        n = capture(args.log, args.topic or ("#",), duration=args.duration)
+        print(f"[TRAFFIC] Captured {n} messages")
+    else:
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, protocol=mqtt.MQTTv5)
+        client.connect(BROKER, PORT, 60)
+        client.loop_start()
+        n, elapsed, lag, shift = replay(client, args.log, args.speed, args.rebase)
+        client.disconnect()
+        client.loop_stop()
+        print(f"[TRAFFIC] Replayed {n} messages in {elapsed:.2f}s ({n / elapsed:.0f} msg/s, worst lag {lag * 1e3:.1f}ms)")